@@ -0,0 +1,400 @@
+"""
+Офлайн-бенчмарк хендлеров и сервисов.
+
+Собирает настоящий Dispatcher, подменяет сессию Bot заглушкой и прогоняет
+через feed_update сценарии пользователей на базе с тестовыми данными:
+    python -m benchmarks.bench --users 200 --transactions 500 --output bench.json
+Сравнение с прошлым запуском (код выхода 1 при регрессии):
+    python -m benchmarks.bench --output new.json --compare bench.json
+База для бенчмарка (по умолчанию POSTGRES_DB с суффиксом _bench)
+создается, мигрируется и очищается перед заполнением.
+Тот же сценарий на встроенной базе SQLite (файл, по умолчанию bench.sqlite3),
+сравнение задержек с запуском на PostgreSQL:
+    python -m benchmarks.bench --backend sqlite --output sqlite.json --compare bench.json
+"""
+import argparse
+import asyncio
+import copy
+import datetime
+import decimal
+import functools
+import inspect
+import json
+import logging
+import platform
+import random
+import sys
+import time
+from collections import defaultdict
+from typing import Any, Awaitable, Callable
+from aerich import Command
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from tortoise import Tortoise, connections
+import settings
+from src.bot_utils.callbacks import DeleteCallback, EditCallback, PageCallback, parse_callback
+from src.bot_utils.dispatcher import build_dispatcher
+from src.bot_utils.digests import DigestScheduler
+from src.bot_utils.handlers import routers
+from src.bot_utils.handlers.transactions import build_transactions_page
+from src.bot_utils.keyboards.main_inline_kb import transactions_page_inline_kb
+from src.bot_utils.outbox import Outbox
+from src.bot_utils.webhook import KeyedSerializer
+from src.database import services
+from src.database.db_con import init_db_connection, close_db_connection
+from src.database.rollups import rebuild_rollups
+from src.database.partitions import ensure_partitions
+from src.utils.helpers import get_current_month
+from src.utils.ids import uuid7
+from benchmarks.fake_telegram import StubSession, make_message_update, make_callback_update
+
+
+FIRST_USER_ID = 1_000_000
+TRUNCATE_SQL = 'TRUNCATE "Users", "Transactions", "TransactionsArchive", "DailySpendings", "Budgets", "FSMStates"'
+CLEAR_SQLITE_SQL = """
+DELETE FROM "Transactions";
+DELETE FROM "DailySpendings";
+DELETE FROM "Budgets";
+DELETE FROM "FSMStates";
+DELETE FROM "Users";
+"""
+BACKENDS = ("postgres", "sqlite")
+USER_COLUMNS = ("telegram_id", "name", "created_at")
+TRANSACTION_COLUMNS = ("id", "user_telegram_id_id", "name", "price", "created_at")
+NAMES = ("кофе", "обед", "такси", "продукты", "кино", "аптека", "связь", "подарок")
+
+
+class LatencyRecorder:
+    """Собирает длительности по именам операций."""
+
+    def __init__(self) -> None:
+        self.samples: dict[str, list[float]] = defaultdict(list)
+
+    def add(self, name: str, seconds: float) -> None:
+        self.samples[name].append(seconds)
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        """Возвращает количество и перцентили в миллисекундах для каждой операции."""
+        result = {}
+        for name, samples in sorted(self.samples.items()):
+            ordered = sorted(samples)
+            result[name] = {"count": len(ordered),
+                            "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3),
+                            **{f"p{q}_ms": round(percentile(ordered, q / 100) * 1000, 3)
+                               for q in (50, 95, 99)}}
+        return result
+
+
+def percentile(ordered: list[float], q: float) -> float:
+    """Перцентиль отсортированной выборки по ближайшему рангу."""
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+def bench_config(database: str, backend: str = "postgres") -> dict[str, Any]:
+    """Конфигурация Tortoise из настроек, направленная на отдельную базу PostgreSQL или файл SQLite."""
+    config = copy.deepcopy(settings.TORTOISE_ORM)
+    if backend == "sqlite":
+        connection = copy.deepcopy(settings.SQLITE_CONNECTION)
+        connection["credentials"]["file_path"] = database
+    else:
+        connection = copy.deepcopy(settings.POSTGRES_CONNECTION)
+        connection["credentials"]["database"] = database
+    config["connections"]["default"] = connection
+    return config
+
+
+def default_database(backend: str) -> str:
+    """База бенчмарка по умолчанию для backend."""
+    if backend == "sqlite":
+        return "bench.sqlite3"
+    return f"{settings.POSTGRES_CONNECTION['credentials']['database']}_bench"
+
+
+async def prepare_database(config: dict[str, Any]) -> None:
+    """
+    Создает базу, если ее нет, и применяет миграции aerich.
+    Схему SQLite создает подключение, поэтому для нее ничего не делается.
+    """
+    if config["connections"]["default"]["engine"] == settings.SQLITE_CONNECTION["engine"]:
+        return
+    try:
+        await Tortoise.init(config=config, _create_db=True)
+    except Exception:
+        # База уже существует.
+        pass
+    finally:
+        await Tortoise.close_connections()
+    command = Command(tortoise_config=config, app="models")
+    await command.init()
+    await command.upgrade(run_in_transaction=True)
+    await command.close()
+
+
+def insert_sql(table: str, columns: tuple[str, ...]) -> str:
+    """Запрос вставки одной строки в table."""
+    return 'INSERT INTO "{}" ({}) VALUES ({})'.format(
+        table, ", ".join(f'"{column}"' for column in columns),
+        ", ".join(f"${number}" for number in range(1, len(columns) + 1)))
+
+async def seed(users: int, transactions: int, days: int) -> None:
+    """
+    Заполняет базу users пользователями по transactions трат за последние days дней.
+    Строки передаются через COPY (в SQLite - через executemany),
+    дневные итоги пересчитываются целиком.
+    """
+    rng = random.Random(42)
+    today = datetime.date.today()
+    registered = today - datetime.timedelta(days=days)
+    client = connections.get("default")
+    users_records = [(FIRST_USER_ID + index, f"user{index}", registered) for index in range(users)]
+
+    def transaction_records(index: int) -> list[tuple[Any, ...]]:
+        return [(uuid7(), FIRST_USER_ID + index, rng.choice(NAMES),
+                 decimal.Decimal(rng.randrange(5_000, 500_000)) / 100,
+                 today - datetime.timedelta(days=rng.randrange(days)))
+                for _ in range(transactions)]
+
+    if client.capabilities.dialect == "sqlite":
+        await client.execute_script(CLEAR_SQLITE_SQL)
+        await client.execute_many(insert_sql("Users", USER_COLUMNS), users_records)
+        for index in range(users):
+            await client.execute_many(insert_sql("Transactions", TRANSACTION_COLUMNS), transaction_records(index))
+    else:
+        await client.execute_script(TRUNCATE_SQL)
+        await ensure_partitions(months_back=days // 28 + 1, today=today)
+        async with client.acquire_connection() as connection:
+            await connection.copy_records_to_table("Users", columns=USER_COLUMNS, records=users_records)
+            for index in range(users):
+                await connection.copy_records_to_table("Transactions", columns=TRANSACTION_COLUMNS,
+                                                       records=transaction_records(index))
+    await rebuild_rollups(batch_size=500)
+
+
+
+def instrument_services(recorder: LatencyRecorder) -> Callable[[], None]:
+    """
+    Оборачивает корутины из src.database.services замером времени.
+    Хендлеры импортируют функции по имени, поэтому обертка подставляется
+    и в их модули. Возвращает функцию, которая снимает обертки.
+    """
+    patched = []
+    handler_modules = [module for name, module in sys.modules.items()
+                       if name.startswith("src.bot_utils") and module is not None]
+    for name, function in inspect.getmembers(services, inspect.iscoroutinefunction):
+        if function.__module__ != services.__name__:
+            continue
+
+        @functools.wraps(function)
+        async def timed(*args, _function=function, _name=name, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await _function(*args, **kwargs)
+            finally:
+                recorder.add(_name, time.perf_counter() - started)
+
+        for module in [services, *handler_modules]:
+            if getattr(module, name, None) is function:
+                setattr(module, name, timed)
+                patched.append((module, name, function))
+
+    def restore() -> None:
+        for module, name, function in patched:
+            setattr(module, name, function)
+
+    return restore
+
+
+def instrument_handlers(recorder: LatencyRecorder) -> None:
+    """Замеряет время каждого хендлера по имени его функции."""
+
+    async def timer(handler: Callable[..., Awaitable[Any]], event: Any, data: dict[str, Any]) -> Any:
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            recorder.add(data["handler"].callback.__name__, time.perf_counter() - started)
+
+    for router in routers:
+        router.message.middleware(timer)
+        router.callback_query.middleware(timer)
+
+
+def find_callbacks(kb: Any, kind: type) -> list[str]:
+    """Возвращает callback_data всех кнопок клавиатуры, данные которых разбираются в kind."""
+    if kb is None:
+        return []
+    return [button.callback_data for row in kb.inline_keyboard for button in row
+            if button.callback_data and isinstance(parse_callback(button.callback_data), kind)]
+
+
+async def user_script(user_id: int, rounds: int) -> list[dict[str, Any]]:
+    """
+    Сценарий одного пользователя: старт, поиск, добавление траты через FSM,
+    списки за месяц и сегодня, следующая страница, изменение и удаление траты.
+    Данные кнопок берутся из настоящих клавиатур, как у живого пользователя.
+    """
+    _, first_page = await build_transactions_page(user_id=user_id, period="m")
+    page = next(iter(find_callbacks(first_page, PageCallback)), None)
+    start_date, end_date = get_current_month()
+    report = await services.get_period_report(user_telegram_id=user_id, start_date=start_date,
+                                              end_date=end_date, limit=2 * rounds)
+    targets = transactions_page_inline_kb(transactions=report.transactions, first_index=1, period="m",
+                                          page=1, has_prev=False, has_next=False)
+    edits = find_callbacks(targets, EditCallback)
+    deletes = find_callbacks(targets, DeleteCallback)
+    updates = [("text", "/start"), ("text", "/search такси")]
+    for index in range(rounds):
+        updates += [("text", "Добавить трату"), ("text", "кофе"), ("text", "120.50"), ("data", "today"),
+                    ("text", "Показать траты за месяц"), ("text", "Показать траты за сегодня")]
+        if page:
+            updates.append(("data", page))
+        if 2 * index < len(edits):
+            updates += [("data", edits[2 * index]), ("text", "обед"), ("text", "450.00")]
+        if 2 * index + 1 < len(deletes):
+            updates.append(("data", deletes[2 * index + 1]))
+    return [{"kind": kind, "value": value} for kind, value in updates]
+
+
+def build_updates(bot: Bot, scripts: dict[int, list[dict[str, Any]]]) -> list[tuple[int, Update]]:
+    """Перемешивает сценарии пользователей в один поток, сохраняя порядок внутри сценария."""
+    positions = {user_id: 0 for user_id in scripts}
+    updates = []
+    update_id = 0
+    while positions:
+        for user_id in list(positions):
+            step = scripts[user_id][positions[user_id]]
+            update_id += 1
+            if step["kind"] == "text":
+                raw = make_message_update(update_id, user_id, step["value"])
+            else:
+                raw = make_callback_update(update_id, user_id, step["value"])
+            updates.append((user_id, Update.model_validate(raw, context={"bot": bot})))
+            positions[user_id] += 1
+            if positions[user_id] == len(scripts[user_id]):
+                del positions[user_id]
+    return updates
+
+
+async def run_benchmark(args: argparse.Namespace) -> dict[str, Any]:
+    """Готовит базу, прогоняет сценарии и возвращает отчет."""
+    args.database = args.database or default_database(args.backend)
+    config = bench_config(args.database, args.backend)
+    await prepare_database(config)
+    await init_db_connection(db_config=config, timeout=settings.DB_STARTUP_TIMEOUT)
+    try:
+        seed_started = time.perf_counter()
+        await seed(args.users, args.transactions, args.days)
+        seed_seconds = time.perf_counter() - seed_started
+
+        session = StubSession()
+        bot = Bot(token="1:bench", session=session)
+        outbox = Outbox(bot, global_rate=1e9, chat_rate=1e9, chat_burst=1e9, max_concurrency=1000)
+        # Рассылка итогов отключена, чтобы не смешивать ее сообщения с замерами.
+        dispatcher: Dispatcher = build_dispatcher(outbox, digests=DigestScheduler(outbox, kinds=()))
+        user_ids = [FIRST_USER_ID + index for index in range(args.users)]
+        scripts = {user_id: await user_script(user_id, args.rounds) for user_id in user_ids}
+        updates = build_updates(bot, scripts)
+
+        handlers, service_calls, update_times = LatencyRecorder(), LatencyRecorder(), LatencyRecorder()
+        instrument_handlers(handlers)
+        restore = instrument_services(service_calls)
+
+        async def feed(update: Update) -> None:
+            started = time.perf_counter()
+            await dispatcher.feed_update(bot, update)
+            update_times.add("update", time.perf_counter() - started)
+
+        await outbox.start()
+        await dispatcher.emit_startup(bot=bot)
+        await dispatcher["charts"].wait_started()
+        serializer = KeyedSerializer(args.concurrency)
+        started = time.perf_counter()
+        for user_id, update in updates:
+            serializer.submit(user_id, feed(update))
+        await serializer.join()
+        elapsed = time.perf_counter() - started
+        await dispatcher.emit_shutdown(bot=bot)
+        await outbox.stop()
+        restore()
+    finally:
+        await close_db_connection()
+
+    return {
+        "meta": {"users": args.users,
+                 "transactions_per_user": args.transactions,
+                 "rounds": args.rounds,
+                 "concurrency": args.concurrency,
+                 "backend": args.backend,
+                 "database": args.database,
+                 "seed_seconds": round(seed_seconds, 3),
+                 "python": platform.python_version(),
+                 "finished_at": datetime.datetime.now().isoformat(timespec="seconds")},
+        "total": {"updates": len(updates),
+                  "seconds": round(elapsed, 3),
+                  "updates_per_sec": round(len(updates) / elapsed, 1),
+                  **update_times.summary()["update"]},
+        "handlers": handlers.summary(),
+        "services": service_calls.summary(),
+        "api_calls": dict(session.fake.calls),
+        "outbox": outbox.metrics(),
+    }
+
+
+def compare(current: dict[str, Any], baseline: dict[str, Any], tolerance: float) -> list[str]:
+    """
+    Сравнивает отчет с прошлым. Регрессия - падение updates/sec или рост p95
+    любого хендлера или сервиса больше чем на tolerance.
+    """
+    regressions = []
+    old_rate, new_rate = baseline["total"]["updates_per_sec"], current["total"]["updates_per_sec"]
+    print(f"updates/sec: {old_rate} -> {new_rate}")
+    if new_rate < old_rate * (1 - tolerance):
+        regressions.append(f"updates/sec: {old_rate} -> {new_rate}")
+    for section in ("handlers", "services"):
+        for name, stats in current[section].items():
+            old = baseline.get(section, {}).get(name)
+            if old is None:
+                continue
+            print(f"{section}.{name} p95: {old['p95_ms']} -> {stats['p95_ms']} мс")
+            if stats["p95_ms"] > old["p95_ms"] * (1 + tolerance):
+                regressions.append(f"{section}.{name} p95: {old['p95_ms']} -> {stats['p95_ms']} мс")
+    return regressions
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Создает парсер аргументов командной строки."""
+    parser = argparse.ArgumentParser(description="Офлайн-бенчмарк хендлеров и сервисов бота.")
+    parser.add_argument("--backend", choices=BACKENDS, default=settings.DB_ENGINE)
+    parser.add_argument("--database", help="База PostgreSQL или файл SQLite, по умолчанию зависит от --backend.")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--transactions", type=int, default=200, help="Трат на пользователя.")
+    parser.add_argument("--days", type=int, default=60, help="За сколько дней распределить траты.")
+    parser.add_argument("--rounds", type=int, default=3, help="Повторов сценария на пользователя.")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--output", help="Куда сохранить отчет в JSON.")
+    parser.add_argument("--compare", help="Отчет прошлого запуска для поиска регрессий.")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--log-level", default="WARNING", help="Уровень логов бота во время замеров.")
+    return parser
+
+
+async def main(args: argparse.Namespace) -> int:
+    for name in list(logging.root.manager.loggerDict):
+        if name.startswith("src."):
+            logging.getLogger(name).setLevel(args.log_level)
+    report = await run_benchmark(args)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            regressions = compare(report, json.load(file), args.tolerance)
+        for regression in regressions:
+            print(f"Регрессия: {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(build_parser().parse_args())))
@@ -0,0 +1,235 @@
+"""
+Локальная заглушка Bot API и генератор нагрузки на webhook.
+
+Запуск бота против заглушки:
+    TELEGRAM_API_URL=http://127.0.0.1:8081 BOT_MODE=webhook python bot.py
+Нагрузка:
+    python -m benchmarks.fake_telegram --ingress http://127.0.0.1:8080/webhook --users 100 --updates 5000
+StubSession подменяет HTTP-сессию Bot и отвечает той же заглушкой без сети.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import statistics
+import time
+from collections import Counter
+from typing import Any, AsyncGenerator
+import aiofiles
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import TelegramMethod
+from aiohttp import ClientSession, web
+
+
+# Bot API принимает от ботов файлы до 50 МБ.
+MAX_UPLOAD_SIZE = 50 * 1024 * 1024
+FAKE_BOT_USER = {"id": 1, "is_bot": True, "first_name": "FakeBot", "username": "fake_bot"}
+
+
+def make_message_update(update_id: int, user_id: int, text: str) -> dict[str, Any]:
+    """Создает обновление с текстовым сообщением от пользователя."""
+    return {"update_id": update_id,
+            "message": {"message_id": update_id,
+                        "date": int(time.time()),
+                        "chat": {"id": user_id, "type": "private"},
+                        "from": {"id": user_id, "is_bot": False, "first_name": f"user{user_id}"},
+                        "text": text}}
+
+
+def make_callback_update(update_id: int, user_id: int, data: str) -> dict[str, Any]:
+    """Создает обновление с нажатием inline-кнопки."""
+    return {"update_id": update_id,
+            "callback_query": {"id": str(update_id),
+                               "chat_instance": str(user_id),
+                               "from": {"id": user_id, "is_bot": False, "first_name": f"user{user_id}"},
+                               "data": data,
+                               "message": {"message_id": update_id,
+                                           "date": int(time.time()),
+                                           "chat": {"id": user_id, "type": "private"},
+                                           "from": FAKE_BOT_USER,
+                                           "text": "..."}}}
+
+
+def make_document_update(update_id: int, user_id: int, file_id: str, file_name: str) -> dict[str, Any]:
+    """Создает обновление с документом, зарегистрированным в FakeTelegram.files."""
+    return {"update_id": update_id,
+            "message": {"message_id": update_id,
+                        "date": int(time.time()),
+                        "chat": {"id": user_id, "type": "private"},
+                        "from": {"id": user_id, "is_bot": False, "first_name": f"user{user_id}"},
+                        "document": {"file_id": file_id,
+                                     "file_unique_id": file_id,
+                                     "file_name": file_name}}}
+
+
+class FakeTelegram:
+    """
+    Заглушка Bot API: отвечает успехом на любой метод и считает вызовы.
+    Файлы из files (file_id -> локальный путь) отдаются через getFile и скачивание.
+    """
+
+    def __init__(self, flood_every: int = 0) -> None:
+        self.flood_every = flood_every
+        self.calls: Counter[str] = Counter()
+        self.first_call_at: float|None = None
+        self.last_call_at: float|None = None
+        self._message_ids = itertools.count(1)
+        self.files: dict[str, str] = {}
+
+    def _message(self, params: dict[str, Any]) -> dict[str, Any]:
+        return {"message_id": next(self._message_ids),
+                "date": int(time.time()),
+                "chat": {"id": int(params.get("chat_id", 0)), "type": "private"},
+                "from": FAKE_BOT_USER,
+                "text": params.get("text", "")}
+
+    def result_for(self, method: str, params: dict[str, Any]) -> Any:
+        """Возвращает правдоподобный результат метода Bot API."""
+        method = method.lower()
+        if method == "getme":
+            return FAKE_BOT_USER
+        if method == "getfile":
+            file_id = params["file_id"]
+            return {"file_id": file_id, "file_unique_id": file_id, "file_path": file_id}
+        if method == "sendphoto":
+            file_id = f"photo{next(self._message_ids)}"
+            return {**self._message(params),
+                    "photo": [{"file_id": file_id, "file_unique_id": file_id, "width": 800, "height": 500}]}
+        if method.startswith("send") or method.startswith("edit"):
+            return self._message(params)
+        return True
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        params = dict(await request.post())
+        now = time.monotonic()
+        self.first_call_at = self.first_call_at or now
+        self.last_call_at = now
+        self.calls[method] += 1
+        if self.flood_every and sum(self.calls.values()) % self.flood_every == 0:
+            return web.json_response({"ok": False, "error_code": 429,
+                                      "description": "Too Many Requests: retry after 1",
+                                      "parameters": {"retry_after": 1}}, status=429)
+        return web.json_response({"ok": True, "result": self.result_for(method, params)})
+
+    async def download(self, request: web.Request) -> web.StreamResponse:
+        path = self.files.get(request.match_info["file_id"])
+        if path is None:
+            return web.Response(status=404)
+        return web.FileResponse(path)
+
+    def create_app(self) -> web.Application:
+        app = web.Application(client_max_size=MAX_UPLOAD_SIZE)
+        app.router.add_post("/bot{token}/{method}", self.handle)
+        app.router.add_get("/file/bot{token}/{file_id}", self.download)
+        return app
+
+    async def start(self, host: str, port: int) -> web.AppRunner:
+        """Запускает заглушку и возвращает runner для остановки."""
+        runner = web.AppRunner(self.create_app())
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        return runner
+
+
+class StubSession(BaseSession):
+    """Сессия Bot, которая отвечает на методы через FakeTelegram в том же процессе."""
+
+    def __init__(self, fake: FakeTelegram|None = None) -> None:
+        super().__init__()
+        self.fake = fake or FakeTelegram()
+
+    async def make_request(self, bot: Bot, method: TelegramMethod, timeout: int|None = None) -> Any:
+        name = method.__api_method__
+        self.fake.calls[name] += 1
+        result = self.fake.result_for(name, method.model_dump())
+        response = self.check_response(bot=bot, method=method, status_code=200,
+                                       content=json.dumps({"ok": True, "result": result}))
+        return response.result
+
+    async def stream_content(self,
+                             url: str,
+                             headers: dict[str, Any]|None = None,
+                             timeout: int = 30,
+                             chunk_size: int = 65536,
+                             raise_for_status: bool = True) -> AsyncGenerator[bytes, None]:
+        async with aiofiles.open(self.fake.files[url.rsplit("/", 1)[-1]], "rb") as file:
+            while chunk := await file.read(chunk_size):
+                yield chunk
+
+    async def close(self) -> None:
+        pass
+
+
+def synthetic_updates(users: int, count: int) -> list[dict[str, Any]]:
+    """Генерирует поток обновлений, не требующих данных в БД."""
+    texts = ["/help", "Добавить трату", "кофе", "120.00"]
+    updates = []
+    for update_id in range(1, count + 1):
+        user_id = 1_000_000 + update_id % users
+        text = texts[(update_id // users) % len(texts)]
+        updates.append(make_message_update(update_id, user_id, text))
+    return updates
+
+
+async def run_load(ingress: str,
+                   updates: list[dict[str, Any]],
+                   concurrency: int,
+                   secret: str|None = None) -> list[float]:
+    """Отправляет обновления на webhook и возвращает задержки подтверждения."""
+    headers = {"X-Telegram-Bot-Api-Secret-Token": secret} if secret else {}
+    latencies = []
+    pending = iter(updates)
+
+    async def sender(session: ClientSession) -> None:
+        for update in pending:
+            started = time.monotonic()
+            async with session.post(ingress, json=update, headers=headers) as response:
+                response.raise_for_status()
+            latencies.append(time.monotonic() - started)
+
+    async with ClientSession() as session:
+        await asyncio.gather(*(sender(session) for _ in range(concurrency)))
+    return latencies
+
+
+async def main(args: argparse.Namespace) -> None:
+    fake = FakeTelegram(flood_every=args.flood_every)
+    runner = await fake.start(args.api_host, args.api_port)
+    updates = synthetic_updates(args.users, args.updates)
+    started = time.monotonic()
+    latencies = await run_load(args.ingress, updates, args.concurrency, args.secret)
+    acked = time.monotonic()
+    calls = -1
+    while calls != sum(fake.calls.values()):
+        calls = sum(fake.calls.values())
+        await asyncio.sleep(args.idle)
+    await runner.cleanup()
+    latencies.sort()
+    report = {
+        "updates": len(updates),
+        "ingress_seconds": round(acked - started, 3),
+        "ingress_updates_per_sec": round(len(updates) / (acked - started), 1),
+        "ack_p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "ack_p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 2),
+        "api_calls": dict(fake.calls),
+        "end_to_end_seconds": round((fake.last_call_at or acked) - started, 3),
+    }
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Нагрузочный тест webhook-режима против заглушки Bot API.")
+    parser.add_argument("--ingress", default="http://127.0.0.1:8080/webhook")
+    parser.add_argument("--secret")
+    parser.add_argument("--api-host", default="127.0.0.1")
+    parser.add_argument("--api-port", type=int, default=8081)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--updates", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--flood-every", type=int, default=0,
+                        help="Отвечать 429 на каждый N-й вызов Bot API.")
+    parser.add_argument("--idle", type=float, default=2.0,
+                        help="Сколько секунд без вызовов Bot API считать окончанием обработки.")
+    asyncio.run(main(parser.parse_args()))
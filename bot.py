@@ -1,27 +1,52 @@
 """Основной код бота."""
 import asyncio
+import sys
+import time
 import settings
-from aiogram import Bot, Dispatcher
-from aiogram.filters import CommandStart, Command
-from aiogram.types import Message
-from src.database.db_con import init_db_connection, close_db_connection
-from src.database.services import get_or_create_user, create_transaction, get_month_transactions, get_month_transactions_price
-from src.bot_utils.handlers import routers
+from src.database.db_con import init_db_connection, close_db_connection, DatabaseNotReady
+from src.bot_utils.dispatcher import build_bot, build_dispatcher
+from src.bot_utils.outbox import Outbox
+from src.bot_utils.webhook import run_webhook
+from src.utils.logger import setup_module_logger
+from src.utils.metrics import GaugeGroup, registry, start_metrics_server
 
 
+logger = setup_module_logger(__name__)
 
-bot = Bot(token=settings.BOT_TOKEN)
-dp = Dispatcher()
+
+async def run_polling():
+    """Запускает бота в режиме long polling в одном процессе."""
+    started = time.perf_counter()
+    await init_db_connection(db_config=settings.TORTOISE_ORM, timeout=settings.DB_STARTUP_TIMEOUT)
+    bot = build_bot(token=settings.BOT_TOKEN, api_url=settings.TELEGRAM_API_URL)
+    outbox = Outbox(bot)
+    dp = build_dispatcher(outbox)
+    registry.register(GaugeGroup("bot_outbox", "Очередь исходящих сообщений", outbox.metrics))
+    metrics_runner = None
+    try:
+        metrics_runner = await start_metrics_server(settings.METRICS_HOST, settings.METRICS_PORT)
+        await outbox.start()
+        await bot.delete_webhook()
+        logger.info("Бот запущен за %.3f с.", time.perf_counter() - started)
+        await dp.start_polling(bot)
+    finally:
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
+        await outbox.stop()
+        await close_db_connection()
 
 
 async def main():
-    await init_db_connection(db_config=settings.TORTOISE_ORM)
-    dp.include_routers(*routers)
-    await dp.start_polling(bot)
-    await close_db_connection()
+    if settings.BOT_MODE == "webhook":
+        await run_webhook()
+    else:
+        await run_polling()
 
 if __name__ == "__main__":
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
         print("Бот остановлен.")
+    except DatabaseNotReady as e:
+        logger.error("Бот не запущен: %s", e)
+        sys.exit(1)
@@ -0,0 +1,105 @@
+"""Служебные команды для обслуживания бота и базы данных."""
+import argparse
+import asyncio
+import sys
+import settings
+from src.database.db_con import init_db_connection, close_db_connection, DatabaseNotReady
+from src.database.diagnostics import check_transaction_query_plans, QueryPlanRegression
+from src.database.rollups import rebuild_rollups, verify_rollups
+from src.database.partitions import list_partitions, ensure_partitions, archive_partitions, detach_partitions
+from src.utils.helpers import parse_date
+
+
+async def cmd_check_plans(args: argparse.Namespace) -> int:
+    """Проверяет планы горячих запросов к транзакциям."""
+    try:
+        results = await check_transaction_query_plans(user_telegram_id=args.user_id)
+    except QueryPlanRegression as e:
+        print(e, file=sys.stderr)
+        return 1
+    for name, scan in results.items():
+        print(f"{name}: {scan}")
+    return 0
+
+
+async def cmd_rollups(args: argparse.Namespace) -> int:
+    """Пересчитывает или проверяет дневные итоги трат."""
+    if args.action == "rebuild":
+        processed = await rebuild_rollups(batch_size=args.batch_size)
+        print(f"Пересчитано пользователей: {processed}")
+        return 0
+    drifts = await verify_rollups(batch_size=args.batch_size)
+    for drift in drifts:
+        print(f"{drift.user_id} {drift.day}: ожидалось {drift.expected_count} / {drift.expected_total}, "
+              f"в итогах {drift.actual_count} / {drift.actual_total}")
+    return 1 if drifts else 0
+
+
+async def cmd_partitions(args: argparse.Namespace) -> int:
+    """Показывает, создает, архивирует или отсоединяет секции таблицы трат."""
+    if settings.DB_ENGINE != "postgres":
+        print("Секции таблицы трат есть только в PostgreSQL.", file=sys.stderr)
+        return 2
+    if args.action == "list":
+        for partition in await list_partitions():
+            bounds = f"{partition.start} - {partition.end}" if partition.start else "по умолчанию"
+            print(f"{partition.name}: {bounds}, строк ~{partition.rows}")
+        return 0
+    if args.action == "ensure":
+        created = await ensure_partitions(months_ahead=args.months_ahead, months_back=args.months_back)
+        print(f"Создано секций: {len(created)}")
+        return 0
+    if args.before is None:
+        print("Укажите --before: секции раньше этой даты будут обработаны.", file=sys.stderr)
+        return 2
+    before = parse_date(args.before)
+    if args.action == "archive":
+        names = await archive_partitions(before)
+    else:
+        names = await detach_partitions(before)
+    for name in names:
+        print(name)
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Создает парсер аргументов командной строки."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    check_plans = subparsers.add_parser("check-plans",
+                                        help="Проверить, что запросы к транзакциям используют индексы.")
+    check_plans.add_argument("--user-id", type=int, default=0)
+    check_plans.set_defaults(handler=cmd_check_plans)
+
+    rollups = subparsers.add_parser("rollups", help="Пересчитать или проверить дневные итоги трат.")
+    rollups.add_argument("action", choices=["rebuild", "verify"])
+    rollups.add_argument("--batch-size", type=int, default=500)
+    rollups.set_defaults(handler=cmd_rollups)
+
+    partitions = subparsers.add_parser("partitions", help="Обслужить секции таблицы трат по месяцам.")
+    partitions.add_argument("action", choices=["list", "ensure", "archive", "detach"])
+    partitions.add_argument("--months-ahead", type=int, default=settings.PARTITION_MONTHS_AHEAD)
+    partitions.add_argument("--months-back", type=int, default=0)
+    partitions.add_argument("--before", help="Дата, раньше которой секции архивируются или отсоединяются.")
+    partitions.set_defaults(handler=cmd_partitions)
+
+    return parser
+
+
+async def run(args: argparse.Namespace) -> int:
+    """Выполняет команду с подключением к базе данных."""
+    try:
+        await init_db_connection(db_config=settings.TORTOISE_ORM, timeout=settings.DB_STARTUP_TIMEOUT)
+    except DatabaseNotReady as e:
+        print(e, file=sys.stderr)
+        return 2
+    try:
+        return await args.handler(args)
+    finally:
+        await close_db_connection()
+
+
+if __name__ == "__main__":
+    arguments = build_parser().parse_args()
+    sys.exit(asyncio.run(run(arguments)))
@@ -0,0 +1,13 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP INDEX IF EXISTS "idx_transactions_user_created";
+        CREATE INDEX IF NOT EXISTS "idx_transactions_user_created" ON "Transactions" ("user_telegram_id_id", "created_at", "id") INCLUDE ("price");"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP INDEX IF EXISTS "idx_transactions_user_created";
+        CREATE INDEX IF NOT EXISTS "idx_transactions_user_created" ON "Transactions" ("user_telegram_id_id", "created_at") INCLUDE ("price");"""
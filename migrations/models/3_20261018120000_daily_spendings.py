@@ -0,0 +1,23 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        CREATE TABLE IF NOT EXISTS "DailySpendings" (
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "day" DATE NOT NULL,
+    "count" INT NOT NULL DEFAULT 0,
+    "total" DECIMAL(14,2) NOT NULL DEFAULT 0,
+    "user_telegram_id_id" INT NOT NULL REFERENCES "Users" ("telegram_id") ON DELETE CASCADE,
+    CONSTRAINT "uid_DailySpendi_user_te_9931d5" UNIQUE ("user_telegram_id_id", "day")
+);
+COMMENT ON TABLE "DailySpendings" IS 'Модель для количества и суммы трат пользователя за день.';
+        INSERT INTO "DailySpendings" ("user_telegram_id_id", "day", "count", "total")
+    SELECT "user_telegram_id_id", "created_at", COUNT(*), SUM("price")
+    FROM "Transactions"
+    GROUP BY "user_telegram_id_id", "created_at";"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP TABLE IF EXISTS "DailySpendings";"""
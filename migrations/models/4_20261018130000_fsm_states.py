@@ -0,0 +1,18 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        CREATE TABLE IF NOT EXISTS "FSMStates" (
+    "key" VARCHAR(255) NOT NULL PRIMARY KEY,
+    "state" VARCHAR(255),
+    "data" JSONB NOT NULL,
+    "expires_at" TIMESTAMPTZ
+);
+CREATE INDEX IF NOT EXISTS "idx_FSMStates_expires_7fb2b5" ON "FSMStates" ("expires_at");
+COMMENT ON TABLE "FSMStates" IS 'Модель для состояния и данных FSM по ключу чата и пользователя.';"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP TABLE IF EXISTS "FSMStates";"""
@@ -0,0 +1,71 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        CREATE TABLE "Transactions_partitioned" (
+    "id" UUID NOT NULL,
+    "name" TEXT NOT NULL,
+    "price" DECIMAL(10,2) NOT NULL,
+    "created_at" DATE NOT NULL,
+    "user_telegram_id_id" INT NOT NULL
+) PARTITION BY RANGE ("created_at");
+DO $$
+DECLARE
+    "month" DATE;
+BEGIN
+    FOR "month" IN
+        SELECT DISTINCT date_trunc('month', "created_at")::date FROM "Transactions"
+        UNION
+        SELECT generate_series(date_trunc('month', now()) - interval '1 month',
+                               date_trunc('month', now()) + interval '3 months',
+                               interval '1 month')::date
+    LOOP
+        EXECUTE format('CREATE TABLE %I PARTITION OF "Transactions_partitioned" FOR VALUES FROM (%L) TO (%L)',
+                       'Transactions_' || to_char("month", '"y"YYYY"m"MM'), "month", "month" + interval '1 month');
+    END LOOP;
+END $$;
+CREATE TABLE "Transactions_default" PARTITION OF "Transactions_partitioned" DEFAULT;
+INSERT INTO "Transactions_partitioned" ("id", "name", "price", "created_at", "user_telegram_id_id")
+    SELECT "id", "name", "price", "created_at", "user_telegram_id_id" FROM "Transactions";
+DROP TABLE "Transactions";
+ALTER TABLE "Transactions_partitioned" RENAME TO "Transactions";
+ALTER TABLE "Transactions" ADD CONSTRAINT "Transactions_pkey" PRIMARY KEY ("id", "created_at");
+ALTER TABLE "Transactions" ADD CONSTRAINT "Transactions_user_telegram_id_id_fkey"
+    FOREIGN KEY ("user_telegram_id_id") REFERENCES "Users" ("telegram_id") ON DELETE CASCADE;
+CREATE INDEX IF NOT EXISTS "idx_transactions_user_created" ON "Transactions" ("user_telegram_id_id", "created_at", "id") INCLUDE ("price");
+COMMENT ON TABLE "Transactions" IS 'Модель для транзакции.';
+CREATE TABLE IF NOT EXISTS "TransactionsArchive" (
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "month" DATE NOT NULL,
+    "ids" UUID[] NOT NULL,
+    "names" TEXT[] NOT NULL,
+    "prices" DECIMAL(10,2)[] NOT NULL,
+    "days" DATE[] NOT NULL,
+    "user_telegram_id_id" INT NOT NULL REFERENCES "Users" ("telegram_id") ON DELETE CASCADE,
+    CONSTRAINT "uid_Transaction_user_te_5b8d3e" UNIQUE ("user_telegram_id_id", "month")
+);
+COMMENT ON TABLE "TransactionsArchive" IS 'Модель для архива трат пользователя за месяц.';"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        CREATE TABLE "Transactions_plain" (
+    "id" UUID NOT NULL PRIMARY KEY,
+    "name" TEXT NOT NULL,
+    "price" DECIMAL(10,2) NOT NULL,
+    "created_at" DATE NOT NULL,
+    "user_telegram_id_id" INT NOT NULL REFERENCES "Users" ("telegram_id") ON DELETE CASCADE
+);
+INSERT INTO "Transactions_plain" ("id", "name", "price", "created_at", "user_telegram_id_id")
+    SELECT "id", "name", "price", "created_at", "user_telegram_id_id" FROM "Transactions";
+INSERT INTO "Transactions_plain" ("id", "name", "price", "created_at", "user_telegram_id_id")
+    SELECT r."id", r."name", r."price", r."created_at", a."user_telegram_id_id"
+    FROM "TransactionsArchive" a
+    CROSS JOIN LATERAL unnest(a."ids", a."names", a."prices", a."days") AS r("id", "name", "price", "created_at");
+DROP TABLE "TransactionsArchive";
+DROP TABLE "Transactions";
+ALTER TABLE "Transactions_plain" RENAME TO "Transactions";
+ALTER INDEX "Transactions_plain_pkey" RENAME TO "Transactions_pkey";
+CREATE INDEX IF NOT EXISTS "idx_transactions_user_created" ON "Transactions" ("user_telegram_id_id", "created_at", "id") INCLUDE ("price");
+COMMENT ON TABLE "Transactions" IS 'Модель для транзакции.';"""
@@ -0,0 +1,23 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        CREATE TABLE IF NOT EXISTS "DigestRuns" (
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "kind" VARCHAR(16) NOT NULL,
+    "period_start" DATE NOT NULL,
+    "last_user_id" INT NOT NULL DEFAULT 0,
+    "sent" INT NOT NULL DEFAULT 0,
+    "failed" INT NOT NULL DEFAULT 0,
+    "owner" VARCHAR(64),
+    "lease_until" TIMESTAMPTZ,
+    "finished_at" TIMESTAMPTZ,
+    CONSTRAINT "uid_DigestRuns_kind_2f4e1a" UNIQUE ("kind", "period_start")
+);
+COMMENT ON TABLE "DigestRuns" IS 'Модель для рассылки итогов за период и ее контрольной точки.';"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP TABLE IF EXISTS "DigestRuns";"""
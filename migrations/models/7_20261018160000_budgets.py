@@ -0,0 +1,18 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        CREATE TABLE IF NOT EXISTS "Budgets" (
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "category" VARCHAR(300) NOT NULL DEFAULT '',
+    "amount" DECIMAL(12,2) NOT NULL,
+    "user_telegram_id_id" INT NOT NULL REFERENCES "Users" ("telegram_id") ON DELETE CASCADE,
+    CONSTRAINT "uid_Budgets_user_te_6c1f2b" UNIQUE ("user_telegram_id_id", "category")
+);
+COMMENT ON TABLE "Budgets" IS 'Модель для бюджета пользователя на месяц: общего или по названию траты.';"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP TABLE IF EXISTS "Budgets";"""
@@ -0,0 +1,11 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        CREATE INDEX IF NOT EXISTS "idx_transactions_search" ON "Transactions" USING GIN ((to_tsvector('simple', 'u' || "user_telegram_id_id"::text) || to_tsvector('russian', "name")));"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP INDEX IF EXISTS "idx_transactions_search";"""
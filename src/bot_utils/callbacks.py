@@ -0,0 +1,150 @@
+"""
+Компактные данные inline-кнопок.
+Telegram ограничивает callback_data 64 байтами, поэтому данные кнопок трат
+упаковываются в байты и кодируются base64url. Первый символ - версия формата,
+второй - действие. Данные кнопок старого текстового формата ('edit_<id>')
+разбираются как версия 0, чтобы кнопки в уже отправленных сообщениях продолжали работать.
+"""
+import base64
+import datetime
+import struct
+import uuid
+from dataclasses import dataclass
+from typing import Any
+from aiogram.filters import Filter
+from aiogram.types import CallbackQuery
+
+
+VERSION = "1"
+EDIT, DELETE, PAGE, SEARCH = "e", "d", "p", "s"
+# Период (1 символ), номер страницы, направление (1 символ), дата курсора (порядковый номер), id курсора.
+PAGE_FORMAT = struct.Struct(">cHcI16s")
+# Метка поиска, номер страницы, направление (1 символ), дата курсора (порядковый номер), id курсора.
+SEARCH_FORMAT = struct.Struct(">IHcI16s")
+
+
+class CallbackDataError(ValueError):
+    """Данные кнопки не удалось разобрать."""
+
+
+@dataclass(frozen=True)
+class EditCallback:
+    """Кнопка изменения траты."""
+    transaction_id: uuid.UUID
+
+
+@dataclass(frozen=True)
+class DeleteCallback:
+    """Кнопка удаления траты."""
+    transaction_id: uuid.UUID
+
+
+@dataclass(frozen=True)
+class PageCallback:
+    """Кнопка перехода на страницу трат с курсором (дата, id) соседней траты."""
+    period: str
+    page: int
+    direction: str
+    cursor: tuple[datetime.date, uuid.UUID]
+
+
+@dataclass(frozen=True)
+class SearchCallback:
+    """
+    Кнопка перехода на страницу результатов поиска. Сам запрос в данные кнопки не помещается
+    и хранится в FSM, метка tag отличает его от более позднего поиска.
+    """
+    tag: int
+    page: int
+    direction: str
+    cursor: tuple[datetime.date, uuid.UUID]
+
+
+Callback = EditCallback|DeleteCallback|PageCallback|SearchCallback
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def encode_callback(callback: Callback) -> str:
+    """Упаковывает данные кнопки в строку текущей версии."""
+    if isinstance(callback, EditCallback):
+        return VERSION + EDIT + _b64encode(callback.transaction_id.bytes)
+    if isinstance(callback, DeleteCallback):
+        return VERSION + DELETE + _b64encode(callback.transaction_id.bytes)
+    day, transaction_id = callback.cursor
+    if isinstance(callback, SearchCallback):
+        payload = SEARCH_FORMAT.pack(callback.tag, callback.page, callback.direction.encode(),
+                                     day.toordinal(), transaction_id.bytes)
+        return VERSION + SEARCH + _b64encode(payload)
+    payload = PAGE_FORMAT.pack(callback.period.encode(), callback.page, callback.direction.encode(),
+                               day.toordinal(), transaction_id.bytes)
+    return VERSION + PAGE + _b64encode(payload)
+
+
+def _parse_v0(data: str) -> Callback:
+    """Разбирает текстовый формат 'edit_<id>', 'delete_<id>', 'page_<период>_<стр>_<n|p>_<дата>_<id>'."""
+    action, _, rest = data.partition("_")
+    if action == "edit":
+        return EditCallback(uuid.UUID(rest))
+    if action == "delete":
+        return DeleteCallback(uuid.UUID(rest))
+    if action == "page":
+        period, page, direction, day, transaction_id = rest.split("_")
+        return PageCallback(period, int(page), direction,
+                            (datetime.date.fromisoformat(day), uuid.UUID(transaction_id)))
+    raise CallbackDataError(f"Неизвестное действие: {action!r}")
+
+
+def _parse_v1(data: str) -> Callback:
+    action, payload = data[:1], _b64decode(data[1:])
+    if action == EDIT:
+        return EditCallback(uuid.UUID(bytes=payload))
+    if action == DELETE:
+        return DeleteCallback(uuid.UUID(bytes=payload))
+    if action == PAGE:
+        period, page, direction, ordinal, transaction_id = PAGE_FORMAT.unpack(payload)
+        return PageCallback(period.decode(), page, direction.decode(),
+                            (datetime.date.fromordinal(ordinal), uuid.UUID(bytes=transaction_id)))
+    if action == SEARCH:
+        tag, page, direction, ordinal, transaction_id = SEARCH_FORMAT.unpack(payload)
+        return SearchCallback(tag, page, direction.decode(),
+                              (datetime.date.fromordinal(ordinal), uuid.UUID(bytes=transaction_id)))
+    raise CallbackDataError(f"Неизвестное действие: {action!r}")
+
+
+PARSERS = {VERSION: _parse_v1}
+
+
+def parse_callback(data: str) -> Callback:
+    """Разбирает данные кнопки любой поддерживаемой версии. Вызывает CallbackDataError."""
+    try:
+        parser = PARSERS.get(data[:1])
+        if parser is not None:
+            return parser(data[1:])
+        return _parse_v0(data)
+    except CallbackDataError:
+        raise
+    except (ValueError, TypeError, struct.error) as e:
+        raise CallbackDataError(f"Не удалось разобрать данные кнопки {data!r}: {e}") from e
+
+
+class CallbackOf(Filter):
+    """Фильтр кнопок одного вида, передает разобранные данные хендлеру аргументом payload."""
+
+    def __init__(self, kind: type) -> None:
+        self.kind = kind
+
+    async def __call__(self, callback: CallbackQuery) -> bool|dict[str, Any]:
+        if not callback.data:
+            return False
+        try:
+            payload = parse_callback(callback.data)
+        except CallbackDataError:
+            return False
+        return {"payload": payload} if isinstance(payload, self.kind) else False
@@ -0,0 +1,174 @@
+"""
+Отрисовка графиков трат в пуле процессов.
+matplotlib занимает процессор на сотни миллисекунд, поэтому графики рисуются
+в отдельных процессах, а event loop только ждет готовый PNG.
+"""
+import asyncio
+import concurrent.futures
+import datetime
+import io
+import multiprocessing
+from typing import Any, Callable
+import settings
+from src.utils.cache import TTLCache
+from src.utils.logger import setup_module_logger
+
+
+logger = setup_module_logger(__name__)
+
+
+IMAGE_CACHE_SIZE = 200
+FILE_ID_CACHE_SIZE = 10_000
+CHART_CACHE_TTL = 24 * 60 * 60
+CHART_DPI = 100
+CHART_SIZE = (8, 5)
+
+ChartKey = tuple[int, str, datetime.date, datetime.date, int]
+
+
+class ChartBusy(Exception):
+    """Слишком много графиков ждут отрисовки."""
+
+
+def _init_worker() -> None:
+    """Импортирует matplotlib заранее, чтобы первый график не ждал загрузки модулей и шрифтов."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import matplotlib.dates  # noqa: F401
+    figure = plt.figure()
+    figure.canvas.draw()
+    plt.close(figure)
+
+
+def _ping() -> bool:
+    return True
+
+
+def _to_png(figure: Any) -> bytes:
+    import matplotlib.pyplot as plt
+    buffer = io.BytesIO()
+    figure.tight_layout()
+    figure.savefig(buffer, format="png", dpi=CHART_DPI)
+    plt.close(figure)
+    return buffer.getvalue()
+
+
+def render_pie(title: str, labels: list[str], values: list[float]) -> bytes:
+    """Рисует круговую диаграмму трат по названиям и возвращает PNG."""
+    import matplotlib.pyplot as plt
+    figure, axes = plt.subplots(figsize=CHART_SIZE)
+    axes.pie(values, labels=labels, autopct="%1.1f%%", startangle=90, counterclock=False)
+    axes.axis("equal")
+    axes.set_title(title)
+    return _to_png(figure)
+
+
+def render_line(title: str, days: list[str], values: list[float]) -> bytes:
+    """Рисует график трат по датам в ISO-формате и возвращает PNG."""
+    import matplotlib.pyplot as plt
+    import matplotlib.dates as mdates
+    figure, axes = plt.subplots(figsize=CHART_SIZE)
+    x = [datetime.date.fromisoformat(day) for day in days]
+    axes.plot(x, values, marker="o" if len(x) <= 31 else None, linewidth=1.5)
+    axes.fill_between(x, values, alpha=0.15)
+    axes.xaxis.set_major_formatter(mdates.DateFormatter("%d.%m.%y"))
+    axes.set_ylim(bottom=0)
+    axes.set_ylabel("рубли")
+    axes.set_title(title)
+    axes.grid(alpha=0.3)
+    figure.autofmt_xdate()
+    return _to_png(figure)
+
+
+class ChartRenderer:
+    """
+    Ограниченный пул процессов для графиков с кэшем PNG и file_id Telegram.
+    Одновременно в пуле ждут не больше max_pending графиков, остальные получают ChartBusy.
+    """
+
+    def __init__(self,
+                 workers: int = settings.CHART_WORKERS,
+                 max_pending: int = settings.CHART_MAX_PENDING,
+                 timeout: float = settings.CHART_TIMEOUT) -> None:
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.pending = 0
+        self.rendered = 0
+        self._executor: concurrent.futures.ProcessPoolExecutor|None = None
+        self._warm_up: asyncio.Task|None = None
+        self._images = TTLCache(maxsize=IMAGE_CACHE_SIZE, ttl=CHART_CACHE_TTL)
+        self._file_ids = TTLCache(maxsize=FILE_ID_CACHE_SIZE, ttl=CHART_CACHE_TTL)
+
+    def _get_executor(self) -> concurrent.futures.ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker)
+        return self._executor
+
+    async def start(self) -> None:
+        """
+        Запускает процессы пула в фоне, чтобы первые графики не ждали их старта,
+        а запуск бота не ждал импорта matplotlib.
+        """
+        self._warm_up = asyncio.create_task(self._start_workers())
+
+    async def _start_workers(self) -> None:
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        try:
+            await asyncio.gather(*(loop.run_in_executor(executor, _ping) for _ in range(self.workers)))
+            logger.info("Пул отрисовки графиков запущен, процессов: %s.", self.workers)
+        except Exception as e:
+            logger.error("Ошибка при запуске пула отрисовки графиков: %s", e, exc_info=True)
+
+    async def wait_started(self) -> None:
+        """Дожидается запуска процессов пула."""
+        if self._warm_up is not None:
+            await asyncio.wait([self._warm_up])
+
+    async def stop(self) -> None:
+        """Останавливает процессы пула."""
+        if self._warm_up is not None:
+            await asyncio.wait([self._warm_up])
+            self._warm_up = None
+        if self._executor is not None:
+            executor, self._executor = self._executor, None
+            await asyncio.to_thread(executor.shutdown, wait=True, cancel_futures=True)
+            logger.info("Пул отрисовки графиков остановлен.")
+
+    def get_file_id(self, key: ChartKey) -> str|None:
+        """Возвращает file_id уже отправленного графика."""
+        return self._file_ids.get(key)
+
+    def remember_file_id(self, key: ChartKey, file_id: str) -> None:
+        """Запоминает file_id отправленного графика, чтобы не загружать его повторно."""
+        self._file_ids.set(key, file_id)
+
+    async def render(self, key: ChartKey, func: Callable[..., bytes], *args: Any) -> bytes:
+        """Возвращает PNG из кэша или рисует его в пуле процессов."""
+        image = self._images.get(key)
+        if image is not None:
+            return image
+        if self.pending >= self.max_pending:
+            raise ChartBusy(f"В очереди уже {self.pending} графиков.")
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            image = await asyncio.wait_for(loop.run_in_executor(self._get_executor(), func, *args),
+                                           self.timeout)
+        finally:
+            self.pending -= 1
+        self.rendered += 1
+        self._images.set(key, image)
+        return image
+
+    def metrics(self) -> dict[str, float]:
+        """Возвращает метрики пула и кэшей."""
+        return {"pending": self.pending,
+                "rendered": self.rendered,
+                "image_cache_hits": self._images.hits,
+                "file_id_cache_hits": self._file_ids.hits}
@@ -0,0 +1,202 @@
+"""
+Рассылка итогов трат за день и за месяц всем пользователям.
+Пользователи перебираются пачками по возрастанию id, итоги пачки считаются одним запросом.
+Сообщения ставятся в очередь Outbox с собственным ограничением частоты, чтобы рассылка
+не вытесняла ответы на команды. Контрольная точка сдвигается только после доставки,
+поэтому после перезапуска рассылка продолжается с того же пользователя.
+"""
+import asyncio
+import contextlib
+import datetime
+import decimal
+import os
+import socket
+import time
+from collections import deque
+import settings
+from src.database.digests import (DigestCheckpoint, DigestRow, LeaseLost, claim_run, finish_run,
+                                  get_digest_batch, release_run, save_checkpoint)
+from src.bot_utils.outbox import Outbox, TokenBucket
+from src.utils.helpers import shift_month
+from src.utils.logger import setup_module_logger
+
+
+logger = setup_module_logger(__name__)
+
+
+DAILY, MONTHLY = "daily", "monthly"
+DIGEST_KINDS = (DAILY, MONTHLY)
+MONTH_NAMES = ("январь", "февраль", "март", "апрель", "май", "июнь",
+               "июль", "август", "сентябрь", "октябрь", "ноябрь", "декабрь")
+# Рассылку, которая не началась в течение суток после срока, уже не отправляем.
+MAX_DELAY = datetime.timedelta(days=1)
+LEASE = datetime.timedelta(seconds=120)
+STOP_TIMEOUT = 10
+
+
+def parse_kinds(value: str) -> tuple[str, ...]:
+    """Разбирает список рассылок вида 'daily,monthly'."""
+    kinds = tuple(kind.strip() for kind in value.split(",") if kind.strip())
+    unknown = set(kinds) - set(DIGEST_KINDS)
+    if unknown:
+        raise ValueError(f"Неизвестные рассылки: {', '.join(sorted(unknown))}")
+    return kinds
+
+
+def digest_period(kind: str, day: datetime.date) -> tuple[datetime.date, datetime.date, datetime.date]:
+    """
+    Возвращает период рассылки, которая отправляется в день day: (начало предыдущего периода, начало, конец).
+    Ежедневная рассылка подводит итоги вчерашнего дня, ежемесячная - прошлого месяца.
+    """
+    if kind == DAILY:
+        return day - datetime.timedelta(days=2), day - datetime.timedelta(days=1), day
+    end_date = shift_month(day, 0)
+    return shift_month(day, -2), shift_month(day, -1), end_date
+
+
+def _date(day: datetime.date) -> str:
+    return day.strftime("%d.%m.%Y")
+
+
+def format_digest(kind: str, start_date: datetime.date, row: DigestRow) -> str:
+    """Формирует текст итогов пользователя за период."""
+    if kind == DAILY:
+        title, previous = f"Итоги за {_date(start_date)}", "днем раньше"
+    else:
+        title, previous = f"Итоги за {MONTH_NAMES[start_date.month - 1]} {start_date.year}", "месяцем раньше"
+    lines = [f"{title}: {row.total} рублей, трат: {row.count}."]
+    delta = row.total - row.previous_total
+    if row.previous_total and delta:
+        percent = (delta / row.previous_total * 100).quantize(decimal.Decimal("0.1"))
+        direction = "больше" if delta > 0 else "меньше"
+        lines.append(f"Это на {abs(delta)} рублей ({abs(percent)}%) {direction}, чем {previous}.")
+    return "\n".join(lines)
+
+
+class DigestScheduler:
+    """
+    Планировщик рассылок: раз в check_interval секунд проверяет, не пора ли отправить
+    итоги, и ведет рассылку, если взял ее аренду. В нескольких процессах рассылку
+    ведет один, остальные пропускают ее или продолжают после истечения аренды.
+    """
+
+    def __init__(self,
+                 outbox: Outbox,
+                 kinds: tuple[str, ...] = parse_kinds(settings.DIGEST_KINDS),
+                 send_time: datetime.time = datetime.time.fromisoformat(settings.DIGEST_TIME),
+                 rate: float = settings.DIGEST_RATE,
+                 batch_size: int = settings.DIGEST_BATCH_SIZE,
+                 window: int = 30,
+                 check_interval: float = 60) -> None:
+        self.outbox = outbox
+        self.kinds = kinds
+        self.send_time = send_time
+        self.rate = rate
+        self.batch_size = batch_size
+        self.window = window
+        self.check_interval = check_interval
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{id(self):x}"[:64]
+        self._task: asyncio.Task|None = None
+
+    async def start(self) -> None:
+        """Запускает проверку расписания в фоне."""
+        if self.kinds and self._task is None:
+            self._task = asyncio.create_task(self._run_forever())
+
+    async def stop(self) -> None:
+        """Останавливает рассылку, ее аренда освобождается для следующего запуска."""
+        if self._task is not None:
+            task, self._task = self._task, None
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+
+    async def _run_forever(self) -> None:
+        while True:
+            try:
+                await self.run_due(datetime.datetime.now())
+            except Exception as e:
+                logger.error("Ошибка при рассылке итогов: %s", e, exc_info=True)
+            await asyncio.sleep(self.check_interval)
+
+    async def run_due(self, now: datetime.datetime) -> None:
+        """
+        Ведет рассылки, срок которых наступил не раньше чем MAX_DELAY назад.
+        Проверяются периоды всех дней этого окна, поэтому вчерашняя рассылка, прерванная
+        вечером или пропущенная во время остановки бота, продолжается и после полуночи.
+        """
+        first_day = (now - MAX_DELAY).date()
+        for kind in self.kinds:
+            periods = {digest_period(kind, first_day + datetime.timedelta(days=shift))
+                       for shift in range((now.date() - first_day).days + 1)}
+            for previous_start, start_date, end_date in sorted(periods):
+                due_at = datetime.datetime.combine(end_date, self.send_time)
+                if due_at <= now < due_at + MAX_DELAY:
+                    await self.run(kind, previous_start, start_date, end_date)
+
+    async def run(self,
+                  kind: str,
+                  previous_start: datetime.date,
+                  start_date: datetime.date,
+                  end_date: datetime.date) -> DigestCheckpoint|None:
+        """
+        Рассылает итоги за [start_date, end_date) всем пользователям с тратами за период,
+        продолжая с контрольной точки. Возвращает итоговую контрольную точку или None,
+        если рассылку ведет другой процесс или она уже завершена.
+        """
+        checkpoint = await claim_run(kind, start_date, self.owner, LEASE)
+        if checkpoint is None:
+            return None
+        logger.info("Рассылка %s за %s начата с пользователя %s.", kind, start_date, checkpoint.last_user_id)
+        started = time.perf_counter()
+        bucket = TokenBucket(self.rate, 1)
+        pending: deque[tuple[int, asyncio.Future]] = deque()
+        try:
+            while True:
+                rows = await get_digest_batch(checkpoint.last_user_id, self.batch_size,
+                                              previous_start, start_date, end_date)
+                if not rows:
+                    break
+                for row in rows:
+                    if not row.count:
+                        continue
+                    delay = bucket.delay(time.monotonic())
+                    if delay:
+                        await asyncio.sleep(delay)
+                    bucket.consume(time.monotonic())
+                    pending.append((row.user_id, self.outbox.send(row.user_id, format_digest(kind, start_date, row),
+                                                                  coalesce=False)))
+                    if len(pending) >= self.window:
+                        await self._confirm(checkpoint, *pending.popleft())
+                while pending:
+                    await self._confirm(checkpoint, *pending.popleft())
+                checkpoint.last_user_id = rows[-1].user_id
+                await save_checkpoint(checkpoint, self.owner, LEASE)
+            await finish_run(checkpoint, self.owner)
+            logger.info("Рассылка %s за %s завершена за %.1f с: доставлено %s, ошибок %s.",
+                        kind, start_date, time.perf_counter() - started, checkpoint.sent, checkpoint.failed)
+            return checkpoint
+        except LeaseLost:
+            logger.warning("Рассылку %s за %s продолжил другой процесс.", kind, start_date)
+            return None
+        except BaseException:
+            # Поставленные в очередь сообщения еще могут быть доставлены: дожидаемся их,
+            # чтобы контрольная точка их учла и после перезапуска они не ушли повторно.
+            with contextlib.suppress(Exception):
+                if pending:
+                    await asyncio.wait([future for _, future in pending], timeout=STOP_TIMEOUT)
+                while pending and pending[0][1].done():
+                    await self._confirm(checkpoint, *pending.popleft())
+            with contextlib.suppress(Exception):
+                await release_run(checkpoint, self.owner)
+            raise
+
+    async def _confirm(self, checkpoint: DigestCheckpoint, user_id: int, future: asyncio.Future) -> None:
+        """Дожидается доставки итогов пользователю и сдвигает на него контрольную точку."""
+        await asyncio.wait([future])
+        if not future.cancelled() and future.exception() is None:
+            checkpoint.sent += 1
+        else:
+            checkpoint.failed += 1
+        checkpoint.last_user_id = user_id
+        await save_checkpoint(checkpoint, self.owner, LEASE)
@@ -0,0 +1,59 @@
+"""Создание бота и диспетчера."""
+import datetime
+from aiogram import Bot, Dispatcher
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.fsm.storage.base import BaseStorage
+from aiogram.fsm.storage.memory import MemoryStorage
+import settings
+from src.bot_utils.handlers import routers
+from src.bot_utils.outbox import Outbox
+from src.bot_utils.charts import ChartRenderer
+from src.bot_utils.digests import DigestScheduler
+from src.bot_utils.fsm_storage import DatabaseStorage
+from src.database.budgets import BudgetReconciler
+from src.database.partitions import PartitionMaintainer
+from src.bot_utils.middlewares import UpdateMetricsMiddleware, register_handler_names
+
+
+for router in routers:
+    register_handler_names(router)
+
+
+def build_bot(token: str, api_url: str|None = None) -> Bot:
+    """Создает бота, при необходимости с другим адресом Bot API."""
+    if api_url:
+        session = AiohttpSession(api=TelegramAPIServer.from_base(api_url))
+        return Bot(token=token, session=session)
+    return Bot(token=token)
+
+
+def build_storage(kind: str = settings.FSM_STORAGE) -> BaseStorage:
+    """Создает хранилище состояний FSM."""
+    if kind == "memory":
+        return MemoryStorage()
+    return DatabaseStorage(state_ttl=datetime.timedelta(seconds=settings.FSM_STATE_TTL))
+
+
+def build_dispatcher(outbox: Outbox,
+                     storage: BaseStorage|None = None,
+                     charts: ChartRenderer|None = None,
+                     partitions: PartitionMaintainer|None = None,
+                     digests: DigestScheduler|None = None,
+                     budgets: BudgetReconciler|None = None) -> Dispatcher:
+    """
+    Создает диспетчер со всеми роутерами бота.
+    Пул графиков, обслуживание секций таблицы трат, рассылка итогов
+    и сверка бюджетов запускаются и останавливаются вместе с диспетчером.
+    """
+    charts = charts or ChartRenderer()
+    partitions = partitions or PartitionMaintainer()
+    digests = digests or DigestScheduler(outbox)
+    budgets = budgets or BudgetReconciler()
+    dp = Dispatcher(storage=storage or build_storage(), outbox=outbox, charts=charts)
+    for service in (charts, partitions, digests, budgets):
+        dp.startup.register(service.start)
+        dp.shutdown.register(service.stop)
+    dp.update.outer_middleware(UpdateMetricsMiddleware())
+    dp.include_routers(*routers)
+    return dp
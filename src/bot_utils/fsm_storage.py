@@ -0,0 +1,116 @@
+"""Хранилище FSM в базе данных бота: PostgreSQL или SQLite."""
+import asyncio
+import datetime
+import json
+from typing import Any, Mapping
+from aiogram.exceptions import DataNotDictLikeError
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+from tortoise import connections
+from src.database.fsm_states import QUERIES, Queries
+from src.utils.cache import TTLCache
+from src.utils.logger import setup_module_logger
+
+
+logger = setup_module_logger(__name__)
+
+
+class DatabaseStorage(BaseStorage):
+    """
+    Хранилище состояний FSM: одна строка (state, data) на ключ чата и пользователя.
+    Каждое чтение или запись - один запрос. Запись возвращает всю строку,
+    которая сохраняется в локальном кэше, поэтому последовательные шаги
+    диалога не перечитывают ее из БД. Кэш корректен, пока все обновления
+    пользователя обрабатывает один процесс (polling или webhook с шардированием).
+    """
+
+    def __init__(self,
+                 state_ttl: datetime.timedelta = datetime.timedelta(days=1),
+                 sweep_interval: float = 600,
+                 cache_size: int = 10_000,
+                 cache_ttl: float = 300,
+                 key_builder: KeyBuilder|None = None,
+                 connection_name: str = "default") -> None:
+        self.state_ttl = state_ttl
+        self.sweep_interval = sweep_interval
+        self.key_builder = key_builder or DefaultKeyBuilder(with_bot_id=True, with_destiny=True)
+        self.connection_name = connection_name
+        self._cache = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+        self._sweeper: asyncio.Task|None = None
+
+    @property
+    def _db(self):
+        return connections.get(self.connection_name)
+
+    @property
+    def _queries(self) -> Queries:
+        return QUERIES[self._db.capabilities.dialect]
+
+    def _ensure_sweeper(self) -> None:
+        if self._sweeper is None and self.sweep_interval:
+            self._sweeper = asyncio.create_task(self._sweep_forever())
+
+    async def _sweep_forever(self) -> None:
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.error("Ошибка при удалении устаревших состояний FSM: %s", e, exc_info=True)
+
+    async def sweep(self) -> int:
+        """Удаляет устаревшие и пустые записи, возвращает их количество."""
+        deleted, _ = await self._db.execute_query(self._queries.sweep)
+        if deleted:
+            logger.info("Удалено устаревших состояний FSM: %s.", deleted)
+        return deleted
+
+    async def _load(self, key: str) -> tuple[str|None, dict[str, Any]]:
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+        self._ensure_sweeper()
+        rows = await self._db.execute_query_dict(self._queries.get, [key])
+        return self._remember(key, rows)
+
+    def _remember(self, key: str, rows: list[dict[str, Any]]) -> tuple[str|None, dict[str, Any]]:
+        """Кэширует строку, прочитанную или возвращенную записью."""
+        if rows:
+            data = rows[0]["data"]
+            cached = (rows[0]["state"], json.loads(data) if isinstance(data, str) else data)
+        else:
+            cached = (None, {})
+        self._cache.set(key, cached)
+        return cached
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        storage_key = self.key_builder.build(key)
+        state = state.state if isinstance(state, State) else state
+        self._ensure_sweeper()
+        rows = await self._db.execute_query_dict(self._queries.set_state,
+                                                 [storage_key, state, self.state_ttl.total_seconds()])
+        self._remember(storage_key, rows)
+
+    async def get_state(self, key: StorageKey) -> str|None:
+        state, _ = await self._load(self.key_builder.build(key))
+        return state
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        if not isinstance(data, dict):
+            raise DataNotDictLikeError(f"Data must be a dict or dict-like object, got {type(data).__name__}")
+        storage_key = self.key_builder.build(key)
+        self._ensure_sweeper()
+        rows = await self._db.execute_query_dict(self._queries.set_data,
+                                                 [storage_key, json.dumps(data), self.state_ttl.total_seconds()])
+        self._remember(storage_key, rows)
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        _, data = await self._load(self.key_builder.build(key))
+        return data.copy()
+
+    async def close(self) -> None:
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            await asyncio.gather(self._sweeper, return_exceptions=True)
+            self._sweeper = None
+        self._cache.clear()
@@ -1,6 +1,16 @@
 """Хендлеры для бота."""
 from .start import start_router
 from .transactions import transactions_router
+from .imports import imports_router
+from .exports import exports_router
+from .stats import stats_router
+from .charts import charts_router
+from .budgets import budgets_router
+from .search import search_router
+from .quick_entry import quick_entry_router
 
 
-routers = [start_router, transactions_router]
\ No newline at end of file
+# Быстрый ввод принимает любой текст, поэтому его роутер последний.
+routers = [start_router, transactions_router, imports_router, exports_router,
+           stats_router, charts_router, budgets_router, search_router,
+           quick_entry_router]
\ No newline at end of file
@@ -0,0 +1,59 @@
+"""Хендлеры для бюджетов на месяц."""
+from aiogram import Router
+from aiogram.filters import Command, CommandObject
+from aiogram.types import Message
+from src.database.budgets import TOTAL, get_budget_statuses, set_budget, take_budget_alerts
+from src.bot_utils.outbox import Outbox
+from src.utils.helpers import parse_price
+from src.utils.logger import setup_module_logger
+
+
+logger = setup_module_logger(__name__)
+
+budgets_router = Router()
+
+
+BUDGET_HINT = ("Задайте бюджет на месяц: /budget 30000, бюджет на траты с одним названием: "
+               "/budget кофе 3000. Сумма 0 удаляет бюджет.")
+
+
+def send_budget_alerts(outbox: Outbox, chat_id: int, user_id: int) -> None:
+    """Отправляет предупреждения о бюджетах, накопленные последней записью трат."""
+    for alert in take_budget_alerts(user_id):
+        outbox.send(chat_id, alert)
+
+
+@budgets_router.message(Command("budget"))
+async def cmd_budget(message: Message, command: CommandObject, outbox: Outbox):
+    """
+    Обрабатывает команду /budget [категория] [сумма].
+    Без аргументов показывает бюджеты и траты по ним с начала месяца.
+    """
+    user_id = message.from_user.id
+    args = (command.args or "").split()
+    if args:
+        try:
+            amount = parse_price(args[-1])
+        except ValueError:
+            outbox.send(message.chat.id, BUDGET_HINT)
+            return
+    try:
+        if args:
+            await set_budget(user_id, " ".join(args[:-1]), amount)
+        statuses = await get_budget_statuses(user_id)
+    except ValueError as e:
+        outbox.send(message.chat.id, f"{e}.")
+        return
+    except Exception as e:
+        logger.error("Ошибка при работе с бюджетами: %s", e, exc_info=True)
+        outbox.send(message.chat.id, "Не удалось обработать бюджеты. Используйте команду /start и попробуйте снова.")
+        return
+    if not statuses:
+        outbox.send(message.chat.id, f"Бюджеты не заданы.\n{BUDGET_HINT}")
+        return
+    lines = ["Бюджеты на месяц:"]
+    for status in statuses:
+        title = "Все траты" if status.category == TOTAL else status.category
+        percent = status.spent / status.amount * 100
+        lines.append(f"{title}: {status.spent} из {status.amount} рублей ({percent:.0f}%)")
+    outbox.send(message.chat.id, "\n".join(lines))
@@ -0,0 +1,108 @@
+"""Хендлеры для графиков трат."""
+import datetime
+from aiogram import Router
+from aiogram.filters import Command, CommandObject
+from aiogram.types import Message, BufferedInputFile
+from src.database.analytics import SpendingStats, get_spending_stats
+from src.database.versions import get_data_version
+from src.bot_utils.charts import ChartBusy, ChartKey, ChartRenderer, render_line, render_pie
+from src.bot_utils.outbox import Outbox
+from src.utils.helpers import parse_period
+from src.utils.logger import setup_module_logger
+
+
+logger = setup_module_logger(__name__)
+
+charts_router = Router()
+
+
+PIE_SLICES = 8
+DAILY_POINTS_DAYS = 92
+WEEKLY_POINTS_DAYS = 731
+CHART_KINDS = ("pie", "line")
+CHART_HINT = ("Укажите вид графика и период: /chart pie, /chart line год "
+              "или /chart pie 01.09.2025 30.09.2025.")
+
+
+def _date(day: datetime.date) -> str:
+    return day.strftime("%d.%m.%Y")
+
+
+def pie_args(stats: SpendingStats) -> tuple[str, list[str], list[float]]:
+    """Готовит данные круговой диаграммы: самые крупные траты и остальные одним сектором."""
+    labels = [item.name for item in stats.top]
+    values = [float(item.total) for item in stats.top]
+    rest = float(stats.total) - sum(values)
+    if rest > 0.005:
+        labels.append("остальное")
+        values.append(rest)
+    last_day = stats.end_date - datetime.timedelta(days=1)
+    return f"Траты за {_date(stats.start_date)} - {_date(last_day)}: {stats.total} рублей", labels, values
+
+
+def line_args(stats: SpendingStats) -> tuple[str, list[str], list[float]]:
+    """Готовит данные графика: по дням, для длинных периодов - по неделям или месяцам."""
+    if stats.days <= DAILY_POINTS_DAYS:
+        unit, points = "дням", stats.daily
+    elif stats.days <= WEEKLY_POINTS_DAYS:
+        unit, points = "неделям", stats.weekly
+    else:
+        unit, points = "месяцам", [(month.month, month.total) for month in stats.monthly]
+    last_day = stats.end_date - datetime.timedelta(days=1)
+    return (f"Траты по {unit} за {_date(stats.start_date)} - {_date(last_day)}",
+            [day.isoformat() for day, _ in points],
+            [float(total) for _, total in points])
+
+
+@charts_router.message(Command("chart"))
+async def cmd_chart(message: Message, command: CommandObject, outbox: Outbox, charts: ChartRenderer):
+    """
+    Обрабатывает команду /chart [pie|line] [период].
+    Отправляет круговую диаграмму крупнейших трат или график трат по датам.
+    Уже отправленный график с теми же данными пересылается по file_id без загрузки.
+    """
+    kind, _, period = (command.args or "").strip().partition(" ")
+    if kind.lower() not in CHART_KINDS:
+        kind, period = "pie", command.args
+    kind = kind.lower()
+    try:
+        start_date, end_date = parse_period(period)
+    except ValueError:
+        outbox.send(message.chat.id, CHART_HINT)
+        return
+    user_id = message.from_user.id
+    key: ChartKey = (user_id, kind, start_date, end_date, get_data_version(user_id))
+    file_id = charts.get_file_id(key)
+    if file_id is not None:
+        outbox.send_photo(message.chat.id, file_id)
+        return
+    stats = await get_spending_stats(user_telegram_id=user_id,
+                                     start_date=start_date,
+                                     end_date=end_date,
+                                     top_n=PIE_SLICES)
+    if stats is None:
+        outbox.send(message.chat.id, "Не удалось построить график. Используйте команду /start и попробуйте снова.")
+        return
+    if not stats.count:
+        outbox.send(message.chat.id, "За этот период нет трат.")
+        return
+    try:
+        if kind == "pie":
+            image = await charts.render(key, render_pie, *pie_args(stats))
+        else:
+            image = await charts.render(key, render_line, *line_args(stats))
+    except ChartBusy:
+        outbox.send(message.chat.id, "Сейчас строится слишком много графиков, попробуйте через минуту.")
+        return
+    except Exception as e:
+        logger.error("Ошибка при построении графика: %s", e, exc_info=True)
+        outbox.send(message.chat.id, "Не удалось построить график, попробуйте позже.")
+        return
+    try:
+        sent = await outbox.send_photo(message.chat.id, BufferedInputFile(image, filename=f"{kind}.png"))
+    except Exception as e:
+        logger.error("Ошибка при отправке графика: %s", e, exc_info=True)
+        outbox.send(message.chat.id, "Не удалось отправить график, попробуйте позже.")
+        return
+    if sent.photo:
+        charts.remember_file_id(key, sent.photo[-1].file_id)
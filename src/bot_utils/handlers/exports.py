@@ -0,0 +1,48 @@
+"""Хендлеры для выгрузки истории трат."""
+import datetime
+import os
+import tempfile
+from aiogram import Router
+from aiogram.filters import Command, CommandObject
+from aiogram.types import Message, FSInputFile
+from tortoise.exceptions import DoesNotExist
+from src.database.exports import EXPORT_FORMATS, export_transactions
+from src.bot_utils.outbox import Outbox
+from src.utils.logger import setup_module_logger
+
+
+logger = setup_module_logger(__name__)
+
+exports_router = Router()
+
+
+@exports_router.message(Command("export"))
+async def cmd_export(message: Message, command: CommandObject, outbox: Outbox):
+    """
+    Обрабатывает команду /export [csv|xlsx].
+    Выгружает все траты пользователя в файл и отправляет его одним документом.
+    """
+    file_format = (command.args or "csv").strip().lower()
+    if file_format not in EXPORT_FORMATS:
+        outbox.send(message.chat.id, f"Поддерживаемые форматы: {', '.join(EXPORT_FORMATS)}.")
+        return
+    fd, path = tempfile.mkstemp(suffix=f".{file_format}")
+    os.close(fd)
+    try:
+        count = await export_transactions(user_telegram_id=message.from_user.id,
+                                          path=path,
+                                          file_format=file_format)
+        if not count:
+            outbox.send(message.chat.id, "Вы пока не добавляли никаких трат.")
+            return
+        filename = f"transactions_{datetime.date.today().isoformat()}.{file_format}"
+        await outbox.send_document(message.chat.id,
+                                   FSInputFile(path, filename=filename),
+                                   caption=f"Все ваши траты: {count} шт.")
+    except DoesNotExist:
+        outbox.send(message.chat.id, "Не удалось выгрузить траты. Используйте команду /start и попробуйте снова.")
+    except Exception as e:
+        logger.error("Ошибка при выгрузке трат: %s", e, exc_info=True)
+        outbox.send(message.chat.id, "Не удалось выгрузить траты, попробуйте позже.")
+    finally:
+        os.remove(path)
@@ -0,0 +1,108 @@
+"""Хендлеры для импорта трат из файлов."""
+import os
+import tempfile
+import time
+from aiogram import Bot, F, Router
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.filters import Command
+from aiogram.fsm.context import FSMContext
+from aiogram.types import Message
+from tortoise.exceptions import DoesNotExist
+from src.database.imports import ImportFormatError, ImportResult, import_transactions
+from src.bot_utils.outbox import Outbox
+from src.utils.logger import setup_module_logger
+from .states import ImportTransactions
+
+
+logger = setup_module_logger(__name__)
+
+imports_router = Router()
+
+
+# Бот не может скачать через Bot API файл больше 20 МБ.
+MAX_FILE_SIZE = 20 * 1024 * 1024
+PROGRESS_INTERVAL = 3
+
+
+def format_import_result(result: ImportResult, finished: bool) -> str:
+    """Формирует текст сообщения о ходе импорта."""
+    title = "Импорт завершен." if finished else "Импорт выполняется..."
+    lines = [title,
+             f"Обработано строк: {result.processed}.",
+             f"Добавлено трат: {result.imported}.",
+             f"Отклонено строк: {result.rejected}."]
+    if result.skipped:
+        lines.append(f"Пропущено поступлений: {result.skipped}.")
+    if finished and result.errors:
+        lines.append("")
+        lines.extend(result.errors)
+        if result.rejected > len(result.errors):
+            lines.append(f"...и еще {result.rejected - len(result.errors)}.")
+    return "\n".join(lines)
+
+
+async def edit_status(status: Message, text: str) -> None:
+    """Редактирует сообщение о ходе импорта, не прерывая импорт из-за ошибок Telegram."""
+    try:
+        await status.edit_text(text)
+    except TelegramBadRequest as e:
+        logger.warning("Не удалось обновить сообщение о ходе импорта: %s", e)
+
+
+@imports_router.message(Command("import"))
+async def start_import(message: Message, state: FSMContext, outbox: Outbox):
+    """
+    Начинает импорт трат из файла.
+    Устанавливает состояние ожидания файла.
+    """
+    await state.set_state(ImportTransactions.file)
+    outbox.send(message.chat.id, "Пришлите файл CSV с колонками 'Дата', 'Название' и 'Сумма' " \
+                                 "или выписку из банка в формате CSV. Из выписки добавляются только списания.")
+
+
+@imports_router.message(ImportTransactions.file, F.document)
+async def process_import_file(message: Message, state: FSMContext, bot: Bot, outbox: Outbox):
+    """
+    Скачивает файл во временный файл и импортирует траты пачками.
+    Ход импорта показывается в одном сообщении, которое редактируется.
+    """
+    await state.clear()
+    document = message.document
+    if document.file_size and document.file_size > MAX_FILE_SIZE:
+        outbox.send(message.chat.id, "Файл слишком большой: бот принимает файлы до 20 МБ.")
+        return
+    status = await outbox.send(message.chat.id, "Импорт выполняется...", coalesce=False)
+    last_update = time.monotonic()
+
+    async def on_progress(result: ImportResult) -> None:
+        nonlocal last_update
+        if time.monotonic() - last_update >= PROGRESS_INTERVAL:
+            last_update = time.monotonic()
+            await edit_status(status, format_import_result(result, finished=False))
+
+    fd, path = tempfile.mkstemp(suffix=".csv")
+    os.close(fd)
+    try:
+        await bot.download(document, destination=path)
+        result = await import_transactions(user_telegram_id=message.from_user.id,
+                                           path=path,
+                                           on_progress=on_progress)
+    except DoesNotExist:
+        await edit_status(status, "Не удалось импортировать траты. " \
+                                  "Используйте команду /start и попробуйте снова.")
+    except ImportFormatError as e:
+        await edit_status(status, f"Не удалось прочитать файл. {e}")
+    except Exception as e:
+        logger.error("Ошибка при импорте трат: %s", e, exc_info=True)
+        await edit_status(status, "Во время импорта произошла ошибка, часть трат могла не добавиться.")
+    else:
+        await edit_status(status, format_import_result(result, finished=True))
+    finally:
+        os.remove(path)
+
+
+@imports_router.message(ImportTransactions.file)
+async def process_import_not_file(message: Message, state: FSMContext, outbox: Outbox):
+    """Отменяет импорт, если вместо файла пришло обычное сообщение."""
+    await state.clear()
+    outbox.send(message.chat.id, "Импорт отменен: ожидался файл. Используйте /import, чтобы начать заново.")
@@ -0,0 +1,85 @@
+"""Хендлер быстрого ввода: несколько трат одним сообщением."""
+import datetime
+import decimal
+from aiogram import F, Router
+from aiogram.filters import StateFilter
+from aiogram.types import Message
+from src.database.services import create_transactions
+from src.bot_utils.outbox import Outbox
+from src.utils.helpers import CURRENCY_SUFFIXES, parse_date, parse_price
+from .budgets import send_budget_alerts
+
+
+quick_entry_router = Router()
+
+
+MAX_LINES = 50
+QUICK_ENTRY_HINT = ("Чтобы добавить траты одним сообщением, отправьте по строке на трату: "
+                    "'кофе 120' или 'обед 450.50 12.10.2026'. "
+                    "Можно и по шагам - кнопкой 'Добавить трату'.")
+
+Row = tuple[str, decimal.Decimal, datetime.date]
+
+
+def parse_line(line: str, today: datetime.date) -> Row:
+    """Разбирает строку '<название> <цена> [дата]'. Вызывает ValueError с описанием ошибки."""
+    tokens = line.split()
+    if tokens and tokens[-1].lower() in CURRENCY_SUFFIXES:
+        tokens.pop()
+    created_at = today
+    if len(tokens) >= 3:
+        try:
+            created_at = parse_date(tokens[-1])
+            tokens.pop()
+        except ValueError:
+            pass
+    if len(tokens) < 2:
+        raise ValueError("Нужны название и цена, например 'кофе 120'")
+    if tokens[-1].lower() in CURRENCY_SUFFIXES:
+        tokens.pop()
+    return " ".join(tokens[:-1]), parse_price(tokens[-1]), created_at
+
+
+def parse_quick_entry(text: str, today: datetime.date) -> tuple[list[tuple[int, Row]], dict[int, str]]:
+    """
+    Разбирает сообщение быстрого ввода.
+    Возвращает разобранные строки с их номерами в сообщении и ошибки по номерам строк.
+    """
+    rows, errors = [], {}
+    for number, line in enumerate(text.splitlines(), 1):
+        if not line.strip():
+            continue
+        try:
+            rows.append((number, parse_line(line, today)))
+        except ValueError as e:
+            errors[number] = str(e)
+    return rows, errors
+
+
+@quick_entry_router.message(StateFilter(None), F.text, ~F.text.startswith("/"))
+async def process_quick_entry(message: Message, outbox: Outbox):
+    """
+    Обрабатывает сообщение вида 'кофе 120\\nобед 450.50 12.10.2026'.
+    Добавляет все правильные строки одной транзакцией и сообщает об ошибках в остальных.
+    """
+    lines = [line for line in message.text.splitlines() if line.strip()]
+    if len(lines) > MAX_LINES:
+        outbox.send(message.chat.id, f"За один раз можно добавить не больше {MAX_LINES} трат.")
+        return
+    rows, errors = parse_quick_entry(message.text, datetime.date.today())
+    if not rows:
+        outbox.send(message.chat.id, QUICK_ENTRY_HINT)
+        return
+    result = await create_transactions(user_telegram_id=message.from_user.id,
+                                       rows=[row for _, row in rows])
+    if result is None:
+        outbox.send(message.chat.id, "Не удалось добавить траты. Используйте команду /start и попробуйте снова.")
+        return
+    added, rejected = result
+    for index, error in rejected.items():
+        errors[rows[index][0]] = error
+    total = sum(price for index, (_, (_, price, _)) in enumerate(rows) if index not in rejected)
+    text = [f"Добавлено трат: {added} на сумму {total:.2f} рублей."]
+    text += [f"Строка {number}: {errors[number]}." for number in sorted(errors)]
+    outbox.send(message.chat.id, "\n".join(text))
+    send_budget_alerts(outbox, message.chat.id, message.from_user.id)
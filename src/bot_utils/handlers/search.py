@@ -0,0 +1,137 @@
+"""Хендлеры для поиска трат по названию."""
+import dataclasses
+import datetime
+import math
+import uuid
+import zlib
+from typing import Any
+from aiogram import Router
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.filters import Command, CommandObject
+from aiogram.fsm.context import FSMContext
+from aiogram.types import CallbackQuery, InlineKeyboardMarkup, Message
+from src.database.services import search_terms, search_transactions
+from src.utils.helpers import parse_period
+from src.bot_utils.keyboards.main_inline_kb import search_page_inline_kb
+from src.bot_utils.outbox import Outbox
+from src.bot_utils.callbacks import CallbackOf, SearchCallback
+from src.utils.logger import setup_module_logger
+
+
+logger = setup_module_logger(__name__)
+
+search_router = Router()
+
+
+PAGE_SIZE = 10
+# Запрос хранится в FSM под отдельным ключом, чтобы диалоги добавления трат его не стирали.
+SEARCH_DESTINY = "search"
+ALL_TIME = (datetime.date.min, datetime.date.max)
+SEARCH_HINT = ("Найдите траты по названию: /search такси. Можно указать период: "
+               "/search такси год или /search такси 01.09.2025 30.09.2025.")
+
+
+def parse_search(text: str) -> tuple[str, tuple[datetime.date, datetime.date]]:
+    """
+    Разбирает '<запрос> [период]'. Период - последнее слово ('неделя', 'месяц', 'год')
+    или две последние даты, без периода поиск идет по всем тратам.
+    """
+    words = text.split()
+    for size in (2, 1):
+        if len(words) > size:
+            try:
+                return " ".join(words[:-size]), parse_period(" ".join(words[-size:]))
+            except ValueError:
+                continue
+    return " ".join(words), ALL_TIME
+
+
+def search_context(state: FSMContext) -> FSMContext:
+    """Возвращает FSM-контекст пользователя для данных поиска."""
+    return FSMContext(storage=state.storage, key=dataclasses.replace(state.key, destiny=SEARCH_DESTINY))
+
+
+def _date(day: datetime.date) -> str:
+    return day.strftime("%d.%m.%Y")
+
+
+def _period_name(start_date: datetime.date, end_date: datetime.date) -> str:
+    if (start_date, end_date) == ALL_TIME:
+        return "за все время"
+    return f"за {_date(start_date)} - {_date(end_date - datetime.timedelta(days=1))}"
+
+
+async def build_search_page(user_id: int,
+                            search: dict[str, Any],
+                            page: int = 1,
+                            after: tuple[datetime.date, uuid.UUID]|None = None,
+                            before: tuple[datetime.date, uuid.UUID]|None = None
+                            ) -> tuple[str, InlineKeyboardMarkup|None]:
+    """Формирует текст и клавиатуру одной страницы результатов поиска."""
+    terms = search_terms(search["query"])
+    start_date = datetime.date.fromisoformat(search["start"])
+    end_date = datetime.date.fromisoformat(search["end"])
+    report = await search_transactions(user_telegram_id=user_id, terms=terms, start_date=start_date,
+                                       end_date=end_date, limit=PAGE_SIZE, after=after, before=before)
+    if report is not None and not report.transactions and report.count:
+        page = 1
+        report = await search_transactions(user_telegram_id=user_id, terms=terms, start_date=start_date,
+                                           end_date=end_date, limit=PAGE_SIZE)
+    if report is None:
+        return "Не удалось выполнить поиск. Используйте команду /start и попробуйте снова.", None
+    period_name = _period_name(start_date, end_date)
+    if not report.transactions:
+        return f"Траты по запросу '{search['query']}' {period_name} не найдены.", None
+    first_index = (page - 1) * PAGE_SIZE + 1
+    pages = math.ceil(report.count / PAGE_SIZE)
+    lines = [f"Траты по запросу '{search['query']}' {period_name} - {report.total:.2f} рублей ({report.count} шт.).",
+             f"Страница {page} из {pages}.",
+             ""]
+    for idx, transaction in enumerate(report.transactions, first_index):
+        lines.append(f"{idx}. Трата: {transaction['name']}. Цена: {transaction['price']} рублей. "
+                     f"Дата: {transaction['created_at']}")
+    kb = search_page_inline_kb(transactions=report.transactions,
+                               first_index=first_index,
+                               tag=search["tag"],
+                               page=page,
+                               has_prev=report.has_prev,
+                               has_next=report.has_next)
+    return "\n".join(lines), kb
+
+
+@search_router.message(Command("search"))
+async def cmd_search(message: Message, command: CommandObject, state: FSMContext, outbox: Outbox):
+    """
+    Обрабатывает команду /search <запрос> [период].
+    Выводит первую страницу найденных трат, их количество и сумму.
+    """
+    query, (start_date, end_date) = parse_search(command.args or "")
+    if not search_terms(query):
+        outbox.send(message.chat.id, SEARCH_HINT)
+        return
+    search = {"query": query, "start": start_date.isoformat(), "end": end_date.isoformat()}
+    search["tag"] = zlib.crc32(f"{query}|{search['start']}|{search['end']}".encode())
+    await search_context(state).set_data(search)
+    text, kb = await build_search_page(user_id=message.from_user.id, search=search)
+    outbox.send(message.chat.id, text, reply_markup=kb)
+
+
+@search_router.callback_query(CallbackOf(SearchCallback))
+async def show_search_page(callback: CallbackQuery, payload: SearchCallback, state: FSMContext):
+    """Переключает страницу результатов поиска, редактируя то же сообщение."""
+    search = await search_context(state).get_data()
+    if search.get("tag") != payload.tag:
+        await callback.answer("Результаты поиска устарели, повторите /search.", show_alert=True)
+        return
+    text, kb = await build_search_page(user_id=callback.from_user.id,
+                                       search=search,
+                                       page=payload.page,
+                                       after=payload.cursor if payload.direction == "n" else None,
+                                       before=payload.cursor if payload.direction == "p" else None)
+    try:
+        await callback.message.edit_text(text, reply_markup=kb)
+    except TelegramBadRequest as e:
+        # Повторное нажатие перерисовывает то же содержимое, и Telegram отвечает ошибкой.
+        if "message is not modified" not in str(e):
+            logger.warning("Не удалось обновить страницу поиска: %s", e)
+    await callback.answer()
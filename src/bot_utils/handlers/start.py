@@ -4,6 +4,7 @@ from aiogram.filters import CommandStart, Command
 from aiogram.types import Message
 
 from src.database.services import get_or_create_user
+from src.bot_utils.outbox import Outbox
 import src.bot_utils.keyboards.main_reply_kb as kb
 
 
@@ -11,23 +12,32 @@ start_router = Router()
 
 
 @start_router.message(CommandStart())
-async def cmd_start(message: Message):
+async def cmd_start(message: Message, outbox: Outbox):
     """Обрабатывает команду /start"""
     user_id = message.from_user.id
     user_name = message.from_user.first_name
     user, created = await get_or_create_user(telegram_id=user_id, name=user_name)
     if created:    
-        await message.answer(f"Привет, {user_name}! Я бот для учета финансов." \
-                              "Для помощи в моей работе используй команду: /help.",
-                             reply_markup=kb.reply_kb)
+        outbox.send(message.chat.id, f"Привет, {user_name}! Я бот для учета финансов." \
+                                     "Для помощи в моей работе используй команду: /help.",
+                    reply_markup=kb.reply_kb)
     else:
-        await message.answer(f"Привет, {user_name}! Мы уже знакомы!",
-                             reply_markup=kb.reply_kb)
+        outbox.send(message.chat.id, f"Привет, {user_name}! Мы уже знакомы!",
+                    reply_markup=kb.reply_kb)
 
 
 @start_router.message(Command("help"))
-async def cmd_help(message: Message):
+async def cmd_help(message: Message, outbox: Outbox):
     """Обрабатывает команду /help"""
-    await message.answer("Я бот для учета личных расходов. \n" \
-                         "Ты можешь добавлять новые траты за день" \
-                         "и получить список трат за текущий месяц.")
\ No newline at end of file
+    outbox.send(message.chat.id, "Я бот для учета личных расходов. \n" \
+                                 "Ты можешь добавлять новые траты за день" \
+                                 "и получить список трат за текущий месяц.\n" \
+                                 "Историю трат можно загрузить из CSV-файла командой /import " \
+                                 "и выгрузить командой /export (или /export xlsx).\n" \
+                                 "Статистика за любой период: /stats, /stats год или /stats 01.09.2025 30.09.2025.\n" \
+                                 "Графики трат: /chart pie или /chart line с тем же периодом.\n" \
+                                 "Поиск трат по названию: /search такси или /search такси год.\n" \
+                                 "Бюджет на месяц: /budget 30000, на траты с одним названием: /budget кофе 3000. " \
+                                 "Бот предупредит, когда потрачено 80% и 100% бюджета.\n" \
+                                 "Несколько трат можно добавить одним сообщением, по строке на трату: " \
+                                 "'кофе 120' или 'обед 450.50 12.10.2026'.")
\ No newline at end of file
@@ -12,4 +12,9 @@ class EditTransaction(StatesGroup):
     """Состояние FSM для изменения траты."""
     id = State()
     name = State()
-    price = State()
\ No newline at end of file
+    price = State()
+
+
+class ImportTransactions(StatesGroup):
+    """Состояние FSM для импорта трат из файла."""
+    file = State()
\ No newline at end of file
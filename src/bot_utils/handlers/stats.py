@@ -0,0 +1,76 @@
+"""Хендлеры для статистики трат."""
+import datetime
+from aiogram import Router
+from aiogram.filters import Command, CommandObject
+from aiogram.types import Message
+from src.database.analytics import SpendingStats, get_spending_stats
+from src.bot_utils.outbox import Outbox
+from src.utils.helpers import parse_period
+
+
+stats_router = Router()
+
+
+MAX_DAILY_LINES = 31
+MAX_WEEKLY_LINES = 14
+MAX_MONTHLY_LINES = 24
+PERIOD_HINT = ("Укажите период: /stats, /stats неделя, /stats год "
+               "или /stats 01.09.2025 30.09.2025.")
+
+
+def _date(day: datetime.date) -> str:
+    return day.strftime("%d.%m.%Y")
+
+
+def format_stats(stats: SpendingStats) -> str:
+    """Формирует текст статистики за период."""
+    last_day = stats.end_date - datetime.timedelta(days=1)
+    lines = [f"Статистика за {_date(stats.start_date)} - {_date(last_day)}.",
+             f"Всего: {stats.total} рублей ({stats.count} шт.), дней с тратами: {stats.active_days} из {stats.days}."]
+    if not stats.count:
+        return "\n".join(lines)
+    lines += [f"В среднем: {stats.avg_per_day} в день, {stats.avg_per_active_day} в день с тратами, "
+              f"{stats.avg_per_transaction} за трату.",
+              f"Медиана по дням: {stats.median_per_day}."]
+    if stats.max_day:
+        day, total = stats.max_day
+        lines.append(f"Самый затратный день: {_date(day)} - {total} рублей.")
+    if stats.days <= MAX_DAILY_LINES:
+        lines += ["", "По дням:"]
+        lines += [f"{_date(day)} - {total}" for day, total in stats.daily if total]
+    if len(stats.weekly) <= MAX_WEEKLY_LINES:
+        lines += ["", "По неделям:"]
+        lines += [f"с {_date(week)} - {total}" for week, total in stats.weekly]
+    lines += ["", "По месяцам (изменение к предыдущему месяцу):"]
+    for month in stats.monthly[-MAX_MONTHLY_LINES:]:
+        line = f"{month.month.strftime('%m.%Y')} - {month.total}"
+        if month.delta is not None:
+            percent = f", {month.delta_percent:+.1f}%" if month.delta_percent is not None else ""
+            line += f" ({month.delta:+}{percent})"
+        lines.append(line)
+    if stats.top:
+        lines += ["", f"Топ-{len(stats.top)} трат:"]
+        lines += [f"{idx}. {item.name} - {item.total} рублей ({item.count} шт.)"
+                  for idx, item in enumerate(stats.top, 1)]
+    return "\n".join(lines)
+
+
+@stats_router.message(Command("stats"))
+async def cmd_stats(message: Message, command: CommandObject, outbox: Outbox):
+    """
+    Обрабатывает команду /stats [период].
+    Выводит итоги, средние и самые крупные траты за период, по умолчанию за текущий месяц.
+    """
+    try:
+        start_date, end_date = parse_period(command.args)
+    except ValueError:
+        outbox.send(message.chat.id, PERIOD_HINT)
+        return
+    stats = await get_spending_stats(user_telegram_id=message.from_user.id,
+                                     start_date=start_date,
+                                     end_date=end_date)
+    if stats is None:
+        outbox.send(message.chat.id, "Не удалось посчитать статистику. Используйте команду /start "
+                                     "и проверьте период: он не может быть длиннее 10 лет.")
+        return
+    outbox.send(message.chat.id, format_stats(stats))
@@ -1,115 +1,174 @@
 """Хендлеры для работы с транзакциями."""
 import decimal
 import datetime
+import math
+import uuid
 from aiogram import F, Router
-from aiogram.types import Message, CallbackQuery
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup
 from aiogram.fsm.context import FSMContext
-from src.database.services import (create_transaction, get_month_transactions, get_month_transactions_price,
-                                   get_today_transactions, get_today_transactions_price, edit_transaction, delete_transaction)
-from src.bot_utils.keyboards.main_inline_kb import edit_delete_inline_kb, date_inline_kb
+from src.database.services import create_transaction, get_period_report, edit_transaction, delete_transaction
+from src.utils.helpers import get_current_month, get_today_range
+from src.bot_utils.keyboards.main_inline_kb import date_inline_kb, transactions_page_inline_kb
+from src.bot_utils.outbox import Outbox
+from src.bot_utils.callbacks import CallbackOf, DeleteCallback, EditCallback, PageCallback
+from src.utils.logger import setup_module_logger
+from .budgets import send_budget_alerts
 from .states import NewTransaction, EditTransaction
 
+
+logger = setup_module_logger(__name__)
+
 transactions_router = Router()
 
 
+PAGE_SIZE = 10
+
+PERIODS = {
+    "m": ("месяц", get_current_month),
+    "t": ("сегодня", get_today_range),
+}
+
+
+async def build_transactions_page(user_id: int,
+                                  period: str,
+                                  page: int = 1,
+                                  after: tuple[datetime.date, uuid.UUID]|None = None,
+                                  before: tuple[datetime.date, uuid.UUID]|None = None
+                                  ) -> tuple[str, InlineKeyboardMarkup|None]:
+    """Формирует текст и клавиатуру одной страницы трат за период."""
+    period_name, get_range = PERIODS[period]
+    start_date, end_date = get_range()
+    report = await get_period_report(user_telegram_id=user_id,
+                                     start_date=start_date,
+                                     end_date=end_date,
+                                     limit=PAGE_SIZE,
+                                     after=after,
+                                     before=before)
+    if report is not None and not report.transactions and report.count:
+        page = 1
+        report = await get_period_report(user_telegram_id=user_id,
+                                         start_date=start_date,
+                                         end_date=end_date,
+                                         limit=PAGE_SIZE)
+    if report is None:
+        return "Не удалось получить траты. Используйте команду /start и попробуйте снова.", None
+    if not report.transactions:
+        return f"Вы пока не добавляли никаких трат за {period_name}.", None
+    first_index = (page - 1) * PAGE_SIZE + 1
+    pages = math.ceil(report.count / PAGE_SIZE)
+    lines = [f"Общие траты за {period_name} - {report.total:.2f} рублей ({report.count} шт.).",
+             f"Страница {page} из {pages}.",
+             ""]
+    for idx, transaction in enumerate(report.transactions, first_index):
+        name = transaction["name"]
+        price = transaction["price"]
+        date = transaction["created_at"]
+        lines.append(f"{idx}. Трата: {name}. Цена: {price} рублей. Дата: {date}")
+    kb = transactions_page_inline_kb(transactions=report.transactions,
+                                     first_index=first_index,
+                                     period=period,
+                                     page=page,
+                                     has_prev=report.has_prev,
+                                     has_next=report.has_next)
+    return "\n".join(lines), kb
+
+
 @transactions_router.message(F.text == "Показать траты за месяц")
-async def show_month_transactions(message: Message):
+async def show_month_transactions(message: Message, outbox: Outbox):
     """
     Обрабатывает команду 'Показать траты за месяц'.
-    Выводит траты за месяц и общую их стоимость.
+    Выводит первую страницу трат за месяц и общую их стоимость.
     """
-    user_id = message.from_user.id
-    transactions = await get_month_transactions(user_telegram_id=user_id)
-    total_price = await get_month_transactions_price(user_telegram_id=user_id)
-    if transactions:    
-        for i, transaction in enumerate(transactions, 1):
-            idx = i
-            name = transaction["name"]
-            price = transaction["price"]
-            date = transaction["created_at"]
-            kb = edit_delete_inline_kb(transaction_id=transaction["id"])
-            await message.answer(f"{idx}. Трата: {name}. Цена: {price} рублей. Дата: {date}", reply_markup=kb)
-        await message.answer(f"Общие траты за месяц - {total_price:.2f} рублей.")
-    else:
-        await message.answer("Вы пока не добавляли никаких трат в этом месяце.")
+    text, kb = await build_transactions_page(user_id=message.from_user.id, period="m")
+    outbox.send(message.chat.id, text, reply_markup=kb)
 
 
 @transactions_router.message(F.text == "Показать траты за сегодня")
-async def show_today_transactions(message: Message):
+async def show_today_transactions(message: Message, outbox: Outbox):
     """
     Обрабатывает команду 'Показать траты за сегодня'.
-    Выводит траты за сегодняшний день и общую их стоимость.
+    Выводит первую страницу трат за сегодняшний день и общую их стоимость.
     """
-    user_id = message.from_user.id
-    transactions = await get_today_transactions(user_telegram_id=user_id)
-    total_price = await get_today_transactions_price(user_telegram_id=user_id)
-    if transactions:    
-        for i, transaction in enumerate(transactions, 1):
-            idx = i
-            name = transaction["name"]
-            price = transaction["price"]
-            date = transaction["created_at"]
-            kb = edit_delete_inline_kb(transaction_id=transaction["id"])
-            await message.answer(f"{idx}. Трата: {name}. Цена: {price} рублей. Дата: {date}", reply_markup=kb)
-        await message.answer(f"Общие траты за сегодня - {total_price:.2f} рублей.")
-    else:
-        await message.answer("Вы пока не добавляли никаких трат сегодня.")
+    text, kb = await build_transactions_page(user_id=message.from_user.id, period="t")
+    outbox.send(message.chat.id, text, reply_markup=kb)
+
+
+@transactions_router.callback_query(CallbackOf(PageCallback))
+async def show_transactions_page(callback: CallbackQuery, payload: PageCallback):
+    """Переключает страницу трат, редактируя то же сообщение."""
+    if payload.period not in PERIODS:
+        await callback.answer()
+        return
+    text, kb = await build_transactions_page(user_id=callback.from_user.id,
+                                             period=payload.period,
+                                             page=payload.page,
+                                             after=payload.cursor if payload.direction == "n" else None,
+                                             before=payload.cursor if payload.direction == "p" else None)
+    try:
+        await callback.message.edit_text(text, reply_markup=kb)
+    except TelegramBadRequest as e:
+        # Повторное нажатие перерисовывает то же содержимое, и Telegram отвечает ошибкой.
+        if "message is not modified" not in str(e):
+            logger.warning("Не удалось обновить страницу трат: %s", e)
+    await callback.answer()
 
 
 @transactions_router.message(F.text == "Добавить трату")
-async def start_adding_transaction(message: Message, state: FSMContext):
+async def start_adding_transaction(message: Message, state: FSMContext, outbox: Outbox):
     """
     Начинает процесс добавления новой траты.
     Устанавливает состояние для ввода названия траты.
     """
     await state.set_state(NewTransaction.name)
-    await message.answer("Введите название траты.")
+    outbox.send(message.chat.id, "Введите название траты.")
     
 
 
 @transactions_router.message(NewTransaction.name)
-async def process_transaction_name(message: Message, state: FSMContext):
+async def process_transaction_name(message: Message, state: FSMContext, outbox: Outbox):
     """Обрабатывает ввод названия траты и запрашивает цену."""
     await state.update_data(name=message.text)
     await state.set_state(NewTransaction.price)
-    await message.answer("Введите цену траты в виде '120.00'.")
+    outbox.send(message.chat.id, "Введите цену траты в виде '120.00'.")
 
 
 @transactions_router.message(NewTransaction.price)
-async def process_transaction_price(message: Message, state: FSMContext):
+async def process_transaction_price(message: Message, state: FSMContext, outbox: Outbox):
     """Обрабатывает ввод цены и запрашивает дату."""
     await state.update_data(price=message.text)
     await state.set_state(NewTransaction.date)
     kb = date_inline_kb()
-    await message.answer("Введите дату для этой траты.", reply_markup=kb)
+    outbox.send(message.chat.id, "Введите дату для этой траты.", reply_markup=kb)
 
 
 @transactions_router.callback_query(F.data == "today")
-async def process_transaction_today(callback: CallbackQuery, state: FSMContext):
+async def process_transaction_today(callback: CallbackQuery, state: FSMContext, outbox: Outbox):
     """Обрабатывает кнопку сегодняшней даты."""
-    await state.update_data(date=datetime.date.today())
+    await state.update_data(date=datetime.date.today().isoformat())
     data = await state.get_data()
     user_id = callback.from_user.id
     transaction = await create_transaction(user_telegram_id=user_id,
                                         name=data["name"],
                                         price=decimal.Decimal(data["price"]))
     if transaction:    
-        await callback.message.answer(f"Трата '{transaction}' успешно добавлена в ваши траты.")
+        outbox.send(callback.message.chat.id, f"Трата '{transaction}' успешно добавлена в ваши траты.")
+        send_budget_alerts(outbox, callback.message.chat.id, user_id)
     else:
-        await callback.message.answer("Вы ввели неправильные данные, попробуйте еще раз.")
+        outbox.send(callback.message.chat.id, "Вы ввели неправильные данные, попробуйте еще раз.")
     await callback.answer()
     await state.clear()
 
 
 @transactions_router.callback_query(F.data == "another_date")
-async def process_transaction_another_date(callback: CallbackQuery):
+async def process_transaction_another_date(callback: CallbackQuery, outbox: Outbox):
     """Обрабатывает кнопку для другой даты."""
-    await callback.message.answer("Ведите дату в виде '11.11.1111'")
+    outbox.send(callback.message.chat.id, "Ведите дату в виде '11.11.1111'")
     await callback.answer()
 
 
 @transactions_router.message(NewTransaction.date)
-async def process_transaction_date(message:Message, state: FSMContext):
+async def process_transaction_date(message:Message, state: FSMContext, outbox: Outbox):
     """
     Обрабатывает ввод даты траты. 
     Сохраняет транзакцию в БД.
@@ -124,35 +183,39 @@ async def process_transaction_date(message:Message, state: FSMContext):
                                             price=decimal.Decimal(data["price"]),
                                             created_at=datetime.date(year, month, day))
     if transaction:    
-        await message.answer(f"Трата '{transaction}' успешно добавлена в ваши траты.")
+        outbox.send(message.chat.id, f"Трата '{transaction}' успешно добавлена в ваши траты.")
+        send_budget_alerts(outbox, message.chat.id, user_id)
     else:
-        await message.answer("Вы ввели неправильные данные, попробуйте еще раз.")
+        outbox.send(message.chat.id, "Вы ввели неправильные данные, попробуйте еще раз.")
     await state.clear()
 
 
-@transactions_router.callback_query(F.data.startswith("edit"))
-async def start_edditing_transaction(callback: CallbackQuery, state: FSMContext):
+@transactions_router.callback_query(CallbackOf(EditCallback))
+async def start_edditing_transaction(callback: CallbackQuery,
+                                     payload: EditCallback,
+                                     state: FSMContext,
+                                     outbox: Outbox):
     """
     Начинает процесс изменения траты.
     Задает имя транзакции.
     """
     await state.set_state(EditTransaction.id)
-    await state.update_data(id=callback.data.split("_")[1])
+    await state.update_data(id=str(payload.transaction_id))
     await state.set_state(EditTransaction.name)
-    await callback.message.answer("Введите новое название траты.")
+    outbox.send(callback.message.chat.id, "Введите новое название траты.")
     await callback.answer()
 
 
 @transactions_router.message(EditTransaction.name)
-async def process_new_transaction_name(message: Message, state: FSMContext):
+async def process_new_transaction_name(message: Message, state: FSMContext, outbox: Outbox):
     """Обрабатывает ввод нового названия траты и запрашивает цену."""
     await state.update_data(name=message.text)
     await state.set_state(EditTransaction.price)
-    await message.answer("Введите новую цену траты в виде '120.00'.")
+    outbox.send(message.chat.id, "Введите новую цену траты в виде '120.00'.")
 
 
 @transactions_router.message(EditTransaction.price)
-async def process_new_transaction_price(message:Message, state: FSMContext):
+async def process_new_transaction_price(message:Message, state: FSMContext, outbox: Outbox):
     """
     Обрабатывает ввод новой цены траты. 
     Изменяет транзакцию в БД.
@@ -164,15 +227,16 @@ async def process_new_transaction_price(message:Message, state: FSMContext):
                                             name=data["name"],
                                             price=decimal.Decimal(data["price"]))
     if transaction:    
-        await message.answer(f"Трата '{data["name"]}' успешно добавлена в ваши траты.")
+        outbox.send(message.chat.id, f"Трата '{data["name"]}' успешно добавлена в ваши траты.")
+        send_budget_alerts(outbox, message.chat.id, message.from_user.id)
     else:
-        await message.answer("Вы ввели неправильные данные, попробуйте еще раз.")
+        outbox.send(message.chat.id, "Вы ввели неправильные данные, попробуйте еще раз.")
     await state.clear()
 
 
-@transactions_router.callback_query(F.data.startswith("delete"))
-async def delete_chosen_transaction(callback: CallbackQuery):
+@transactions_router.callback_query(CallbackOf(DeleteCallback))
+async def delete_chosen_transaction(callback: CallbackQuery, payload: DeleteCallback, outbox: Outbox):
     """Удаляет выбранную трату."""
-    await delete_transaction(transaction_id=callback.data.split("_")[1])
-    await callback.message.answer("Выбранная трата успешно удалена.")
+    await delete_transaction(transaction_id=str(payload.transaction_id))
+    outbox.send(callback.message.chat.id, "Выбранная трата успешно удалена.")
     await callback.answer()
\ No newline at end of file
@@ -1,14 +1,6 @@
 """Inline клавиатура для бота."""
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-
-
-def edit_delete_inline_kb(transaction_id: str) -> InlineKeyboardMarkup:
-    """Создает inline-клавиатуру для конкретной траты с кнопкой 'Удалить' и 'Изменить'."""
-    keyboard = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="Изменить", callback_data=f"edit_{transaction_id}"),
-         InlineKeyboardButton(text="Удалить", callback_data=f"delete_{transaction_id}")]
-    ])
-    return keyboard
+from src.bot_utils.callbacks import DeleteCallback, EditCallback, PageCallback, SearchCallback, encode_callback
 
 
 def date_inline_kb() -> InlineKeyboardMarkup:
@@ -17,4 +9,68 @@ def date_inline_kb() -> InlineKeyboardMarkup:
         [InlineKeyboardButton(text="Сегодня", callback_data=f"today"),
          InlineKeyboardButton(text="Другая дата", callback_data=f"another_date")]
     ])
-    return keyboard
\ No newline at end of file
+    return keyboard
+
+
+def _transaction_rows(transactions: list[dict], first_index: int) -> list[list[InlineKeyboardButton]]:
+    """Кнопки 'Изменить' и 'Удалить' для каждой траты страницы."""
+    rows = []
+    for idx, transaction in enumerate(transactions, first_index):
+        rows.append([
+            InlineKeyboardButton(text=f"Изменить {idx}", callback_data=encode_callback(EditCallback(transaction["id"]))),
+            InlineKeyboardButton(text=f"Удалить {idx}", callback_data=encode_callback(DeleteCallback(transaction["id"]))),
+        ])
+    return rows
+
+
+def transactions_page_inline_kb(transactions: list[dict],
+                                first_index: int,
+                                period: str,
+                                page: int,
+                                has_prev: bool,
+                                has_next: bool) -> InlineKeyboardMarkup:
+    """
+    Создает inline-клавиатуру для страницы трат.
+    Для каждой траты кнопки 'Изменить' и 'Удалить', внизу кнопки перехода по страницам.
+    Курсор страницы - (дата, id) первой или последней траты на ней.
+    """
+    rows = _transaction_rows(transactions, first_index)
+    navigation = []
+    if has_prev:
+        first = transactions[0]
+        navigation.append(InlineKeyboardButton(
+            text="◀️ Назад",
+            callback_data=encode_callback(PageCallback(period, page - 1, "p", (first["created_at"], first["id"])))))
+    if has_next:
+        last = transactions[-1]
+        navigation.append(InlineKeyboardButton(
+            text="Вперед ▶️",
+            callback_data=encode_callback(PageCallback(period, page + 1, "n", (last["created_at"], last["id"])))))
+    if navigation:
+        rows.append(navigation)
+    keyboard = InlineKeyboardMarkup(inline_keyboard=rows)
+    return keyboard
+
+
+def search_page_inline_kb(transactions: list[dict],
+                          first_index: int,
+                          tag: int,
+                          page: int,
+                          has_prev: bool,
+                          has_next: bool) -> InlineKeyboardMarkup:
+    """Создает inline-клавиатуру для страницы результатов поиска, траты на ней идут от новых к старым."""
+    rows = _transaction_rows(transactions, first_index)
+    navigation = []
+    if has_prev:
+        first = transactions[0]
+        navigation.append(InlineKeyboardButton(
+            text="◀️ Назад",
+            callback_data=encode_callback(SearchCallback(tag, page - 1, "p", (first["created_at"], first["id"])))))
+    if has_next:
+        last = transactions[-1]
+        navigation.append(InlineKeyboardButton(
+            text="Вперед ▶️",
+            callback_data=encode_callback(SearchCallback(tag, page + 1, "n", (last["created_at"], last["id"])))))
+    if navigation:
+        rows.append(navigation)
+    return InlineKeyboardMarkup(inline_keyboard=rows)
@@ -0,0 +1,53 @@
+"""Middleware для контекста логов и замера времени обработки обновлений."""
+import time
+from typing import Any, Awaitable, Callable
+from aiogram import BaseMiddleware, Router
+from aiogram.types import TelegramObject, Update
+from src.utils.logger import log_context
+from src.utils.metrics import update_duration
+
+
+HandlerCallback = Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]]
+
+
+class HandlerNameMiddleware(BaseMiddleware):
+    """
+    Внутренний middleware: запоминает имя хендлера, выбранного для обновления.
+    Имя хендлера известно только внутренним middleware, поэтому оно
+    передается внешнему через контекст логов.
+    """
+
+    async def __call__(self, handler: HandlerCallback, event: TelegramObject, data: dict[str, Any]) -> Any:
+        context = log_context.get()
+        handler_object = data.get("handler")
+        if context is not None and handler_object is not None:
+            context["handler"] = handler_object.callback.__name__
+        return await handler(event, data)
+
+
+class UpdateMetricsMiddleware(BaseMiddleware):
+    """
+    Внешний middleware: заполняет контекст логов обновления и замеряет
+    его обработку с меткой хендлера и состояния FSM.
+    """
+
+    async def __call__(self, handler: HandlerCallback, event: TelegramObject, data: dict[str, Any]) -> Any:
+        user = data.get("event_from_user")
+        context: dict[str, Any] = {"update_id": event.update_id if isinstance(event, Update) else None,
+                                   "user_id": user.id if user else None}
+        token = log_context.set(context)
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            log_context.reset(token)
+            update_duration.observe(time.perf_counter() - started,
+                                    context.get("handler", "unhandled"),
+                                    data.get("raw_state") or "none")
+
+
+def register_handler_names(router: Router) -> None:
+    """Подключает HandlerNameMiddleware ко всем типам событий роутера."""
+    for name, observer in router.observers.items():
+        if name != "update":
+            observer.middleware(HandlerNameMiddleware())
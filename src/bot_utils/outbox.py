@@ -0,0 +1,260 @@
+"""Очередь исходящих сообщений с ограничением частоты отправки."""
+import asyncio
+import heapq
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any
+from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.types import InputFile, Message
+from src.utils.cache import TTLCache
+from src.utils.logger import setup_module_logger
+
+
+logger = setup_module_logger(__name__)
+
+
+MAX_MESSAGE_LENGTH = 4096
+LATENCY_WINDOW = 1000
+
+
+class TokenBucket:
+    """Корзина токенов: не больше rate событий в секунду с запасом capacity."""
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now: float) -> float:
+        """Возвращает, сколько секунд ждать до появления токена."""
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def consume(self, now: float) -> None:
+        """Забирает один токен."""
+        self._refill(now)
+        self.tokens -= 1
+
+
+@dataclass
+class OutgoingMessage:
+    """Сообщение, ожидающее отправки."""
+    chat_id: int
+    text: str
+    kwargs: dict[str, Any]
+    coalesce: bool = True
+    method: str = "send_message"
+    enqueued_at: float = field(default_factory=time.monotonic)
+    future: asyncio.Future = field(default_factory=lambda: asyncio.get_running_loop().create_future())
+
+    def can_merge(self, other: "OutgoingMessage") -> bool:
+        """Можно ли дописать текст other в это сообщение."""
+        return (self.coalesce and other.coalesce
+                and self.method == other.method == "send_message"
+                and not self.kwargs.get("reply_markup") and self.kwargs == other.kwargs)
+
+
+class Outbox:
+    """
+    Планировщик исходящих сообщений вокруг Bot.
+    Соблюдает глобальный и поканальный лимиты частоты, склеивает подряд идущие
+    тексты в один чат и повторяет отправку после TelegramRetryAfter.
+    Хендлеры ставят сообщения в очередь и не ждут доставки.
+    """
+
+    def __init__(self,
+                 bot: Bot,
+                 global_rate: float = 30,
+                 chat_rate: float = 1,
+                 chat_burst: float = 1,
+                 max_concurrency: int = 30) -> None:
+        self.bot = bot
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self._global_bucket = TokenBucket(global_rate, global_rate)
+        self._chat_buckets = TTLCache(maxsize=100_000, ttl=max(60, chat_burst / chat_rate))
+        self._queues: dict[int, deque[OutgoingMessage]] = {}
+        self._retry_until: dict[int, float] = {}
+        self._heap: list[tuple[float, int]] = []
+        self._scheduled: set[int] = set()
+        self._in_flight: set[int] = set()
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._wakeup = asyncio.Event()
+        self._runner: asyncio.Task | None = None
+        self._tasks: set[asyncio.Task] = set()
+        self._latencies: deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self.sent = 0
+        self.coalesced = 0
+        self.retries = 0
+        self.failed = 0
+
+    async def start(self) -> None:
+        """Запускает планировщик отправки."""
+        if self._runner is None:
+            self._runner = asyncio.create_task(self._run())
+            logger.info("Очередь исходящих сообщений запущена.")
+
+    async def stop(self, timeout: float = 10) -> None:
+        """Дожидается отправки очереди (не дольше timeout) и останавливает планировщик."""
+        deadline = time.monotonic() + timeout
+        while (self._queues or self._tasks) and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        if self._runner is not None:
+            self._runner.cancel()
+            await asyncio.gather(self._runner, return_exceptions=True)
+            self._runner = None
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        logger.info("Очередь исходящих сообщений остановлена, не отправлено: %s.", self.queue_depth)
+
+    def send(self, chat_id: int, text: str, coalesce: bool = True, **kwargs: Any) -> asyncio.Future:
+        """
+        Ставит сообщение в очередь и сразу возвращает управление.
+        Возвращаемый future завершится отправленным Message или ошибкой отправки.
+        coalesce=False запрещает склейку, например для сообщений, которые потом редактируются.
+        """
+        return self._enqueue(OutgoingMessage(chat_id=chat_id, text=text, kwargs=kwargs, coalesce=coalesce))
+
+    def send_document(self, chat_id: int, document: InputFile|str, **kwargs: Any) -> asyncio.Future:
+        """Ставит в очередь отправку документа, лимиты те же, что у сообщений."""
+        return self._enqueue(OutgoingMessage(chat_id=chat_id, text="", kwargs={"document": document, **kwargs},
+                                             coalesce=False, method="send_document"))
+
+    def send_photo(self, chat_id: int, photo: InputFile|str, **kwargs: Any) -> asyncio.Future:
+        """Ставит в очередь отправку фото, например уже загруженного по file_id."""
+        return self._enqueue(OutgoingMessage(chat_id=chat_id, text="", kwargs={"photo": photo, **kwargs},
+                                             coalesce=False, method="send_photo"))
+
+    def _enqueue(self, message: OutgoingMessage) -> asyncio.Future:
+        message.future.add_done_callback(_mark_retrieved)
+        self._queues.setdefault(message.chat_id, deque()).append(message)
+        self._schedule(message.chat_id)
+        return message.future
+
+    @property
+    def queue_depth(self) -> int:
+        """Количество сообщений, ожидающих отправки."""
+        return sum(len(queue) for queue in self._queues.values())
+
+    def metrics(self) -> dict[str, float]:
+        """Возвращает метрики очереди: глубину, счетчики и задержку доставки."""
+        latencies = sorted(self._latencies)
+
+        def percentile(q: float) -> float:
+            return latencies[min(len(latencies) - 1, int(q * len(latencies)))] if latencies else 0.0
+
+        return {"queue_depth": self.queue_depth,
+                "chats_waiting": len(self._queues),
+                "in_flight": len(self._in_flight),
+                "sent": self.sent,
+                "coalesced": self.coalesced,
+                "retries": self.retries,
+                "failed": self.failed,
+                "latency_p50": percentile(0.5),
+                "latency_p95": percentile(0.95),
+                "latency_max": latencies[-1] if latencies else 0.0}
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id, count=False)
+        if bucket is None:
+            bucket = TokenBucket(self.chat_rate, self.chat_burst)
+        self._chat_buckets.set(chat_id, bucket)
+        return bucket
+
+    def _schedule(self, chat_id: int) -> None:
+        """Ставит чат в расписание, если у него есть сообщения и он не отправляет сейчас."""
+        if chat_id in self._scheduled or chat_id in self._in_flight or not self._queues.get(chat_id):
+            return
+        now = time.monotonic()
+        ready_at = max(now + self._chat_bucket(chat_id).delay(now),
+                       self._retry_until.get(chat_id, 0))
+        heapq.heappush(self._heap, (ready_at, chat_id))
+        self._scheduled.add(chat_id)
+        self._wakeup.set()
+
+    def _take_batch(self, chat_id: int) -> list[OutgoingMessage]:
+        """Забирает из очереди чата первое сообщение и склеиваемые с ним следующие."""
+        queue = self._queues[chat_id]
+        batch = [queue.popleft()]
+        length = len(batch[0].text)
+        while queue and batch[-1].can_merge(queue[0]) and length + len(queue[0].text) + 1 <= MAX_MESSAGE_LENGTH:
+            length += len(queue[0].text) + 1
+            batch.append(queue.popleft())
+        if not queue:
+            del self._queues[chat_id]
+        return batch
+
+    async def _run(self) -> None:
+        """Основной цикл: выбирает готовый чат и запускает отправку, соблюдая лимиты."""
+        while True:
+            if not self._heap:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            ready_at, chat_id = self._heap[0]
+            now = time.monotonic()
+            delay = max(ready_at - now, self._global_bucket.delay(now))
+            if delay > 0:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            heapq.heappop(self._heap)
+            self._scheduled.discard(chat_id)
+            await self._semaphore.acquire()
+            self._global_bucket.consume(now)
+            self._chat_bucket(chat_id).consume(now)
+            self._in_flight.add(chat_id)
+            task = asyncio.create_task(self._deliver(chat_id, self._take_batch(chat_id)))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _deliver(self, chat_id: int, batch: list[OutgoingMessage]) -> None:
+        """Отправляет пачку сообщений одним вызовом Bot API."""
+        try:
+            if batch[0].method == "send_message":
+                result: Message = await self.bot.send_message(chat_id=chat_id,
+                                                              text="\n".join(m.text for m in batch),
+                                                              **batch[-1].kwargs)
+            else:
+                result = await getattr(self.bot, batch[0].method)(chat_id=chat_id, **batch[0].kwargs)
+        except TelegramRetryAfter as e:
+            self.retries += 1
+            self._retry_until[chat_id] = time.monotonic() + e.retry_after
+            self._queues.setdefault(chat_id, deque()).extendleft(reversed(batch))
+            logger.warning("Превышен лимит Telegram для чата %s, повтор через %s с.", chat_id, e.retry_after)
+        except Exception as e:
+            self.failed += len(batch)
+            logger.error("Ошибка при отправке сообщения в чат %s: %s", chat_id, e, exc_info=True)
+            for message in batch:
+                if not message.future.done():
+                    message.future.set_exception(e)
+        else:
+            now = time.monotonic()
+            self.sent += 1
+            self.coalesced += len(batch) - 1
+            self._retry_until.pop(chat_id, None)
+            for message in batch:
+                self._latencies.append(now - message.enqueued_at)
+                if not message.future.done():
+                    message.future.set_result(result)
+        finally:
+            self._semaphore.release()
+            self._in_flight.discard(chat_id)
+            self._schedule(chat_id)
+
+
+def _mark_retrieved(future: asyncio.Future) -> None:
+    """Помечает ошибку как полученную: она уже записана в лог при отправке."""
+    if not future.cancelled():
+        future.exception()
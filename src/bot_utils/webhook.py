@@ -0,0 +1,218 @@
+"""Прием обновлений через webhook и их обработка в пуле процессов."""
+import asyncio
+import multiprocessing
+import queue
+import signal
+import time
+from typing import Any, Awaitable
+from aiohttp import web
+import settings
+from src.database.db_con import init_db_connection, close_db_connection
+from src.bot_utils.dispatcher import build_bot, build_dispatcher
+from src.bot_utils.outbox import Outbox
+from src.utils.logger import setup_module_logger
+from src.utils.metrics import GaugeGroup, registry, start_metrics_server
+
+
+logger = setup_module_logger(__name__)
+
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+WORKER_CONCURRENCY = 100
+# Сколько обновлений воркер берет из очереди, пока они не обработаны. Остальные ждут
+# в очереди, и при ее переполнении приемник отвечает Telegram 503.
+WORKER_MAX_PENDING = 1000
+WATCHDOG_INTERVAL = 1
+USER_UPDATE_TYPES = ("message", "edited_message", "callback_query", "inline_query",
+                     "chosen_inline_result", "shipping_query", "pre_checkout_query",
+                     "my_chat_member", "chat_member", "chat_join_request")
+
+
+def get_update_user_id(update: dict[str, Any]) -> int:
+    """Возвращает id пользователя, от которого пришло обновление, или update_id."""
+    for update_type in USER_UPDATE_TYPES:
+        event = update.get(update_type)
+        if event:
+            sender = event.get("from") or event.get("chat") or {}
+            if "id" in sender:
+                return sender["id"]
+    return update.get("update_id", 0)
+
+
+def get_shard(update: dict[str, Any], workers: int) -> int:
+    """Номер воркера для обновления: все обновления пользователя попадают в один воркер."""
+    return get_update_user_id(update) % workers
+
+
+def create_ingress_app(queues: list[multiprocessing.Queue],
+                       path: str,
+                       secret: str|None = None) -> web.Application:
+    """
+    Создает aiohttp-приложение, которое принимает обновления от Telegram,
+    сразу отвечает 200 и передает обновление воркеру по его пользователю.
+    """
+
+    async def handle_update(request: web.Request) -> web.Response:
+        if secret and request.headers.get(SECRET_HEADER) != secret:
+            return web.Response(status=401)
+        try:
+            update = await request.json()
+        except ValueError:
+            return web.Response(status=400)
+        if not isinstance(update, dict):
+            return web.Response(status=400)
+        shard = get_shard(update, len(queues))
+        try:
+            queues[shard].put_nowait(update)
+        except queue.Full:
+            logger.warning("Очередь воркера %s переполнена, Telegram повторит обновление.", shard)
+            return web.Response(status=503)
+        return web.Response()
+
+    app = web.Application()
+    app.router.add_post(path, handle_update)
+    return app
+
+
+class KeyedSerializer:
+    """
+    Выполняет корутины с одинаковым ключом строго по очереди, с разными - параллельно,
+    не больше concurrency одновременно. Если задан max_pending, перед каждым submit
+    нужно дождаться reserve: принятых и не завершенных корутин не больше max_pending.
+    """
+
+    def __init__(self, concurrency: int, max_pending: int|None = None) -> None:
+        self._tails: dict[int, asyncio.Task] = {}
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._pending = asyncio.BoundedSemaphore(max_pending) if max_pending else None
+
+    def __len__(self) -> int:
+        return len(self._tails)
+
+    async def reserve(self) -> None:
+        """Ждет места для следующей корутины, если число принятых корутин ограничено."""
+        if self._pending is not None:
+            await self._pending.acquire()
+
+    def submit(self, key: int, coro: Awaitable[Any]) -> asyncio.Task:
+        """Запускает корутину после завершения предыдущей с тем же ключом."""
+        task = asyncio.create_task(self._run_after(self._tails.get(key), coro))
+        self._tails[key] = task
+        task.add_done_callback(lambda done: self._forget(key, done))
+        return task
+
+    def _forget(self, key: int, task: asyncio.Task) -> None:
+        if self._pending is not None:
+            self._pending.release()
+        if self._tails.get(key) is task:
+            del self._tails[key]
+
+    async def _run_after(self, previous: asyncio.Task|None, coro: Awaitable[Any]) -> Any:
+        if previous is not None:
+            await asyncio.wait([previous])
+        async with self._semaphore:
+            return await coro
+
+    async def join(self) -> None:
+        """Дожидается завершения всех запущенных корутин."""
+        while self._tails:
+            await asyncio.wait(list(self._tails.values()))
+
+
+async def _run_worker(index: int, updates: multiprocessing.Queue) -> None:
+    """Обрабатывает обновления из очереди своего шарда."""
+    started = time.perf_counter()
+    await init_db_connection(db_config=settings.TORTOISE_ORM, timeout=settings.DB_STARTUP_TIMEOUT)
+    bot = build_bot(token=settings.BOT_TOKEN, api_url=settings.TELEGRAM_API_URL)
+    outbox = Outbox(bot)
+    dp = build_dispatcher(outbox)
+    serializer = KeyedSerializer(WORKER_CONCURRENCY, max_pending=WORKER_MAX_PENDING)
+    loop = asyncio.get_running_loop()
+    registry.register(GaugeGroup("bot_outbox", "Очередь исходящих сообщений", outbox.metrics))
+    metrics_port = settings.METRICS_PORT and settings.METRICS_PORT + 1 + index
+    metrics_runner = await start_metrics_server(settings.METRICS_HOST, metrics_port)
+    await outbox.start()
+    await dp.emit_startup(bot=bot)
+    logger.info("Воркер %s запущен за %.3f с.", index, time.perf_counter() - started)
+    try:
+        while True:
+            # Место берется до чтения очереди: занятый воркер оставляет обновления в ней.
+            await serializer.reserve()
+            update = await loop.run_in_executor(None, updates.get)
+            if update is None:
+                break
+            serializer.submit(get_update_user_id(update), dp.feed_raw_update(bot, update))
+        await serializer.join()
+    finally:
+        await dp.emit_shutdown(bot=bot)
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
+        await outbox.stop()
+        await bot.session.close()
+        await close_db_connection()
+        logger.info("Воркер %s остановлен.", index)
+
+
+def worker_main(index: int, updates: multiprocessing.Queue) -> None:
+    """Точка входа процесса-воркера."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    asyncio.run(_run_worker(index, updates))
+
+
+async def run_webhook(workers: int = settings.WEBHOOK_WORKERS) -> None:
+    """
+    Запускает webhook-режим: приемник обновлений в этом процессе
+    и workers процессов-обработчиков, шардированных по id пользователя.
+    """
+    # Проверяем базу до запуска воркеров, чтобы не принимать обновления без нее.
+    await init_db_connection(db_config=settings.TORTOISE_ORM, timeout=settings.DB_STARTUP_TIMEOUT)
+    await close_db_connection()
+    context = multiprocessing.get_context("spawn")
+    queues = [context.Queue(maxsize=settings.WEBHOOK_QUEUE_SIZE) for _ in range(workers)]
+    # Воркеры не демонические: у них свой пул процессов для графиков, а демоническим
+    # процессам нельзя запускать дочерние. При остановке воркеры получают None и завершаются.
+    processes = [context.Process(target=worker_main, args=(index, queues[index]))
+                 for index in range(workers)]
+    for process in processes:
+        process.start()
+
+    registry.register(GaugeGroup("bot_ingress", "Очереди воркеров",
+                                 lambda: {f"queue_{index}": updates.qsize() for index, updates in enumerate(queues)}))
+    metrics_runner = await start_metrics_server(settings.METRICS_HOST, settings.METRICS_PORT)
+    runner = web.AppRunner(create_ingress_app(queues, settings.WEBHOOK_PATH, settings.WEBHOOK_SECRET))
+    await runner.setup()
+    site = web.TCPSite(runner, settings.WEBHOOK_HOST, settings.WEBHOOK_PORT)
+    await site.start()
+    logger.info("Прием обновлений запущен на %s:%s%s, воркеров: %s.",
+                settings.WEBHOOK_HOST, settings.WEBHOOK_PORT, settings.WEBHOOK_PATH, workers)
+
+    if settings.WEBHOOK_URL:
+        bot = build_bot(token=settings.BOT_TOKEN, api_url=settings.TELEGRAM_API_URL)
+        await bot.set_webhook(url=settings.WEBHOOK_URL + settings.WEBHOOK_PATH,
+                              secret_token=settings.WEBHOOK_SECRET)
+        await bot.session.close()
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    try:
+        while not stop.is_set():
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=WATCHDOG_INTERVAL)
+            except asyncio.TimeoutError:
+                dead = [index for index, process in enumerate(processes) if not process.is_alive()]
+                if dead:
+                    logger.error("Воркеры %s завершились, webhook-режим останавливается.", dead)
+                    break
+    finally:
+        await runner.cleanup()
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
+        for updates, process in zip(queues, processes):
+            # Очередь завершившегося воркера может быть полна, и put ждал бы вечно.
+            if process.is_alive():
+                await loop.run_in_executor(None, updates.put, None)
+        for process in processes:
+            await loop.run_in_executor(None, process.join)
+        logger.info("Webhook-режим остановлен.")
@@ -0,0 +1,232 @@
+"""Статистика трат пользователя за произвольный период."""
+import datetime
+import decimal
+from dataclasses import dataclass
+import numpy as np
+from tortoise import connections
+from tortoise.exceptions import DoesNotExist
+from src.utils.cache import TTLCache
+from src.utils.logger import setup_module_logger
+from .services import get_period_total
+from .user_cache import get_cached_user
+from .versions import get_data_version
+
+
+logger = setup_module_logger(__name__)
+
+
+STATS_CACHE_SIZE = 1000
+STATS_CACHE_TTL = 600
+MAX_STATS_DAYS = 3660
+TOP_N = 5
+
+# Суммы считаются в копейках целыми числами, чтобы массивы NumPy не теряли точность.
+BUCKETS_SQL = """
+SELECT GROUPING("day", date_trunc('week', "day"::timestamp)) AS "level",
+       COALESCE("day", date_trunc('week', "day"::timestamp)::date,
+                date_trunc('month', "day"::timestamp)::date) AS "bucket",
+       SUM("count")::bigint AS "count",
+       (SUM("total") * 100)::bigint AS "cents"
+FROM "DailySpendings"
+WHERE "user_telegram_id_id" = $1 AND "day" >= $2 AND "day" < $3 AND "count" <> 0
+GROUP BY GROUPING SETS (("day"), (date_trunc('week', "day"::timestamp)), (date_trunc('month', "day"::timestamp)))
+ORDER BY 1, 2
+"""
+DAY_LEVEL, WEEK_LEVEL, MONTH_LEVEL = 1, 2, 3
+
+TOP_NAMES_SQL = """
+SELECT MIN("name") AS "name", COUNT(*)::bigint AS "count", (SUM("price") * 100)::bigint AS "cents"
+FROM "Transactions"
+WHERE "user_telegram_id_id" = $1 AND "created_at" >= $2 AND "created_at" < $3
+GROUP BY lower("name")
+ORDER BY 3 DESC, 2 DESC, 1
+LIMIT $4
+"""
+
+# В SQLite нет GROUPING SETS: уровни считаются отдельными группировками одного набора дней.
+# Неделя начинается с понедельника, как в date_trunc('week').
+BUCKETS_SQLITE_SQL = """
+WITH "days" AS (
+    SELECT "day", "count", "total"
+    FROM "DailySpendings"
+    WHERE "user_telegram_id_id" = $1 AND "day" >= $2 AND "day" < $3 AND "count" <> 0
+)
+SELECT 1 AS "level", "day" AS "bucket [date]", SUM("count") AS "count",
+       CAST(ROUND(SUM("total") * 100) AS INTEGER) AS "cents"
+FROM "days" GROUP BY 2
+UNION ALL
+SELECT 2, date("day", '-6 days', 'weekday 1'), SUM("count"), CAST(ROUND(SUM("total") * 100) AS INTEGER)
+FROM "days" GROUP BY 2
+UNION ALL
+SELECT 3, date("day", 'start of month'), SUM("count"), CAST(ROUND(SUM("total") * 100) AS INTEGER)
+FROM "days" GROUP BY 2
+ORDER BY 1, 2
+"""
+
+TOP_NAMES_SQLITE_SQL = """
+SELECT MIN("name") AS "name", COUNT(*) AS "count", CAST(ROUND(SUM("price") * 100) AS INTEGER) AS "cents"
+FROM "Transactions"
+WHERE "user_telegram_id_id" = $1 AND "created_at" >= $2 AND "created_at" < $3
+GROUP BY lower("name")
+ORDER BY 3 DESC, 2 DESC, 1
+LIMIT $4
+"""
+
+_CENT = decimal.Decimal("0.01")
+_stats_cache = TTLCache(maxsize=STATS_CACHE_SIZE, ttl=STATS_CACHE_TTL)
+
+
+@dataclass(frozen=True)
+class MonthTotal:
+    """Сумма трат за месяц и ее изменение относительно предыдущего месяца."""
+    month: datetime.date
+    total: decimal.Decimal
+    delta: decimal.Decimal|None
+    delta_percent: float|None
+
+
+@dataclass(frozen=True)
+class NameTotal:
+    """Сумма и количество трат с одним названием."""
+    name: str
+    count: int
+    total: decimal.Decimal
+
+
+@dataclass(frozen=True)
+class SpendingStats:
+    """Статистика трат за период [start_date, end_date)."""
+    start_date: datetime.date
+    end_date: datetime.date
+    total: decimal.Decimal
+    count: int
+    days: int
+    active_days: int
+    avg_per_day: decimal.Decimal
+    avg_per_active_day: decimal.Decimal
+    avg_per_transaction: decimal.Decimal
+    median_per_day: decimal.Decimal
+    max_day: tuple[datetime.date, decimal.Decimal]|None
+    daily: list[tuple[datetime.date, decimal.Decimal]]
+    weekly: list[tuple[datetime.date, decimal.Decimal]]
+    monthly: list[MonthTotal]
+    top: list[NameTotal]
+
+
+def _money(cents: float) -> decimal.Decimal:
+    """Переводит копейки в рубли с округлением до копейки."""
+    return (decimal.Decimal(repr(float(cents))) / 100).quantize(_CENT, rounding=decimal.ROUND_HALF_UP)
+
+
+def _spread(keys: np.ndarray, values: np.ndarray, grid: np.ndarray) -> np.ndarray:
+    """Раскладывает значения по сетке периодов, пустые периоды получают 0."""
+    result = np.zeros(len(grid), dtype=np.int64)
+    if len(keys):
+        result[np.searchsorted(grid, keys)] = values
+    return result
+
+
+def compute_stats(start_date: datetime.date,
+                  end_date: datetime.date,
+                  rows: list[dict],
+                  top_rows: list[dict],
+                  previous_month_total: decimal.Decimal|None) -> SpendingStats:
+    """
+    Считает статистику по итогам из базы на массивах NumPy.
+    previous_month_total - сумма за месяц перед периодом, если период начинается с первого числа,
+    иначе изменение первого месяца не считается: неполный месяц не сравнить с полным.
+    """
+    levels = np.fromiter((row["level"] for row in rows), dtype=np.int8, count=len(rows))
+    buckets = np.array([row["bucket"] for row in rows], dtype="datetime64[D]")
+    counts = np.fromiter((row["count"] for row in rows), dtype=np.int64, count=len(rows))
+    cents = np.fromiter((row["cents"] for row in rows), dtype=np.int64, count=len(rows))
+
+    start, end = np.datetime64(start_date, "D"), np.datetime64(end_date, "D")
+    days_grid = np.arange(start, end)
+    # date_trunc('week') начинает неделю с понедельника, 1970-01-01 был четвергом.
+    first_week = start - (start.astype(np.int64) + 3) % 7
+    weeks_grid = np.arange(first_week, end, 7)
+    months_grid = np.arange(start.astype("datetime64[M]"), (end - 1).astype("datetime64[M]") + 1)
+
+    day_mask, week_mask, month_mask = levels == DAY_LEVEL, levels == WEEK_LEVEL, levels == MONTH_LEVEL
+    daily = _spread(buckets[day_mask], cents[day_mask], days_grid)
+    weekly = _spread(buckets[week_mask], cents[week_mask], weeks_grid)
+    monthly = _spread(buckets[month_mask].astype("datetime64[M]"), cents[month_mask], months_grid)
+
+    total, count = int(daily.sum()), int(counts[day_mask].sum())
+    active_days = int(np.count_nonzero(daily))
+    previous = np.concatenate(([int((previous_month_total or 0) * 100)], monthly[:-1]))
+    deltas = monthly - previous
+    percents = np.divide(deltas * 100.0, previous, out=np.full(len(previous), np.nan), where=previous != 0)
+    known = np.ones(len(previous), dtype=bool)
+    known[0] = previous_month_total is not None
+    peak = int(np.argmax(daily)) if active_days else None
+
+    return SpendingStats(
+        start_date=start_date,
+        end_date=end_date,
+        total=_money(total),
+        count=count,
+        days=len(days_grid),
+        active_days=active_days,
+        avg_per_day=_money(total / len(days_grid)),
+        avg_per_active_day=_money(total / active_days if active_days else 0),
+        avg_per_transaction=_money(total / count if count else 0),
+        median_per_day=_money(np.median(daily)),
+        max_day=(days_grid[peak].item(), _money(daily[peak])) if peak is not None else None,
+        daily=list(zip(days_grid.tolist(), map(_money, daily.tolist()))),
+        weekly=list(zip(weeks_grid.tolist(), map(_money, weekly.tolist()))),
+        monthly=[MonthTotal(month=month,
+                            total=_money(value),
+                            delta=_money(delta) if has_delta else None,
+                            delta_percent=round(percent, 1) if has_delta and not np.isnan(percent) else None)
+                 for month, value, delta, percent, has_delta in zip(
+                     months_grid.astype("datetime64[D]").tolist(), monthly.tolist(),
+                     deltas.tolist(), percents.tolist(), known.tolist())],
+        top=[NameTotal(name=row["name"], count=row["count"], total=_money(row["cents"])) for row in top_rows],
+    )
+
+
+async def get_spending_stats(user_telegram_id: int,
+                             start_date: datetime.date,
+                             end_date: datetime.date,
+                             top_n: int = TOP_N) -> SpendingStats|None:
+    """
+    Возвращает статистику трат за период [start_date, end_date).
+    Итоги по дням, неделям и месяцам группируются в базе одним запросом по дневным итогам,
+    средние, медиана и изменения по месяцам считаются на массивах.
+    Результат кэшируется до следующего изменения трат пользователя.
+    """
+    try:
+        if not start_date < end_date or (end_date - start_date).days > MAX_STATS_DAYS:
+            raise ValueError(f"Период должен быть непустым и не длиннее {MAX_STATS_DAYS} дней.")
+        key = (user_telegram_id, start_date, end_date, top_n, get_data_version(user_telegram_id))
+        stats = _stats_cache.get(key)
+        if stats is not None:
+            return stats
+        await get_cached_user(user_telegram_id)
+        conn = connections.get("default")
+        if conn.capabilities.dialect == "postgres":
+            buckets_sql, top_names_sql = BUCKETS_SQL, TOP_NAMES_SQL
+        else:
+            buckets_sql, top_names_sql = BUCKETS_SQLITE_SQL, TOP_NAMES_SQLITE_SQL
+        rows = await conn.execute_query_dict(buckets_sql, [user_telegram_id, start_date, end_date])
+        top_rows = await conn.execute_query_dict(top_names_sql, [user_telegram_id, start_date, end_date, top_n])
+        previous_month_total = None
+        if start_date.day == 1:
+            previous_month_total = await get_period_total(
+                user_telegram_id, (start_date - datetime.timedelta(days=1)).replace(day=1), start_date)
+        stats = compute_stats(start_date, end_date, rows, top_rows, previous_month_total)
+        _stats_cache.set(key, stats)
+        logger.info("Статистика для пользователя %s за период %s - %s успешно посчитана.",
+                    user_telegram_id, start_date, end_date)
+        return stats
+    except DoesNotExist:
+        logger.error("Пользователь с telegram_id %s не найден.", user_telegram_id)
+        return None
+    except ValueError as e:
+        logger.error("Ошибка в периоде статистики: %s", e)
+        return None
+    except Exception as e:
+        logger.error("Ошибка при подсчете статистики: %s", e, exc_info=True)
+        return None
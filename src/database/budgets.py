@@ -0,0 +1,283 @@
+"""
+Бюджеты на месяц и траты по ним с начала месяца.
+Траты по бюджетам пользователя держатся в ограниченном кэше и меняются на сумму
+каждой записи, поэтому проверка порогов после траты не пересчитывает сумму за месяц.
+При промахе кэша состояние загружается из БД, периодическая сверка исправляет расхождения.
+Категория бюджета - название траты без учета регистра.
+"""
+import asyncio
+import contextlib
+import datetime
+import decimal
+import json
+from dataclasses import dataclass, field
+from tortoise import connections
+import settings
+from src.utils.cache import TTLCache
+from src.utils.helpers import get_current_month
+from src.utils.logger import setup_module_logger
+from src.utils.metrics import GaugeGroup, registry
+from .models import Budget
+
+
+logger = setup_module_logger(__name__)
+
+
+BUDGET_CACHE_SIZE = 10_000
+BUDGET_CACHE_TTL = 60 * 60
+# Ключ общего бюджета на месяц.
+TOTAL = ""
+# Доли бюджета, о достижении которых сообщается сразу после траты.
+THRESHOLDS = (decimal.Decimal("0.8"), decimal.Decimal("1"))
+MAX_AMOUNT = decimal.Decimal("9999999999.99")
+AMOUNT_QUANTUM = decimal.Decimal("0.01")
+MAX_CATEGORY_LENGTH = 300
+
+BUDGETS_SQL = """
+SELECT "user_telegram_id_id" AS "user_id", "category", "amount"
+FROM "Budgets"
+WHERE "user_telegram_id_id" = ANY($1::int[])
+"""
+
+# Суммы по названиям складываются в категории в Python, чтобы сравнение без учета
+# регистра не зависело от локали базы.
+SPENT_SQL = """
+SELECT "user_telegram_id_id" AS "user_id", "name", SUM("price") AS "total"
+FROM "Transactions"
+WHERE "user_telegram_id_id" = ANY($1::int[]) AND "created_at" >= $2 AND "created_at" < $3
+GROUP BY 1, 2
+"""
+
+# В SQLite список пользователей передается JSON-массивом.
+BUDGETS_SQLITE_SQL = """
+SELECT "user_telegram_id_id" AS "user_id", "category", "amount" AS "amount [decimal]"
+FROM "Budgets"
+WHERE "user_telegram_id_id" IN (SELECT "value" FROM json_each($1))
+"""
+
+SPENT_SQLITE_SQL = """
+SELECT "user_telegram_id_id" AS "user_id", "name", printf('%.2f', SUM("price")) AS "total [decimal]"
+FROM "Transactions"
+WHERE "user_telegram_id_id" IN (SELECT "value" FROM json_each($1)) AND "created_at" >= $2 AND "created_at" < $3
+GROUP BY 1, 2
+"""
+
+UPSERT_BUDGET_SQL = """
+INSERT INTO "Budgets" ("user_telegram_id_id", "category", "amount")
+VALUES ($1, $2, $3)
+ON CONFLICT ("user_telegram_id_id", "category") DO UPDATE SET "amount" = EXCLUDED."amount"
+"""
+
+Change = tuple[str, datetime.date, decimal.Decimal]
+
+
+@dataclass
+class BudgetState:
+    """Бюджеты пользователя и траты по ним за месяц. writes растет с каждой учтенной записью."""
+    month: datetime.date
+    limits: dict[str, decimal.Decimal]
+    spent: dict[str, decimal.Decimal]
+    writes: int = 0
+    alerts: list[str] = field(default_factory=list)
+
+
+@dataclass(frozen=True)
+class BudgetStatus:
+    """Бюджет и потраченная по нему сумма."""
+    category: str
+    amount: decimal.Decimal
+    spent: decimal.Decimal
+
+
+_states = TTLCache(maxsize=BUDGET_CACHE_SIZE, ttl=BUDGET_CACHE_TTL)
+registry.register(GaugeGroup("bot_budget_cache", "Кэш бюджетов", _states.stats))
+
+
+def category_of(name: str) -> str:
+    """Возвращает категорию траты: название в нижнем регистре без лишних пробелов."""
+    return " ".join(name.lower().split())
+
+
+def _nonzero(spent: dict[str, decimal.Decimal]) -> dict[str, decimal.Decimal]:
+    return {key: total for key, total in spent.items() if total}
+
+
+def _label(category: str) -> str:
+    return "на месяц" if category == TOTAL else f"на '{category}'"
+
+
+async def load_states(user_ids: list[int], month: tuple[datetime.date, datetime.date]) -> dict[int, BudgetState]:
+    """Загружает бюджеты и траты по ним за месяц для пачки пользователей двумя запросами."""
+    conn = connections.get("default")
+    if conn.capabilities.dialect == "postgres":
+        budgets_sql, spent_sql, encode = BUDGETS_SQL, SPENT_SQL, list
+    else:
+        budgets_sql, spent_sql, encode = BUDGETS_SQLITE_SQL, SPENT_SQLITE_SQL, json.dumps
+    start_date, end_date = month
+    states = {user_id: BudgetState(start_date, {}, {}) for user_id in user_ids}
+    for row in await conn.execute_query_dict(budgets_sql, [encode(user_ids)]):
+        states[row["user_id"]].limits[row["category"]] = row["amount"]
+    with_limits = [user_id for user_id, state in states.items() if state.limits]
+    if not with_limits:
+        return states
+    for row in await conn.execute_query_dict(spent_sql, [encode(with_limits), start_date, end_date]):
+        state = states[row["user_id"]]
+        for key in (TOTAL, category_of(row["name"])):
+            if key in state.limits:
+                state.spent[key] = state.spent.get(key, 0) + row["total"]
+    return states
+
+
+async def get_budget_state(user_telegram_id: int) -> BudgetState:
+    """Возвращает состояние бюджетов из кэша или загружает его из БД."""
+    month = get_current_month()
+    state = _states.get(user_telegram_id)
+    if state is None or state.month != month[0]:
+        state = (await load_states([user_telegram_id], month))[user_telegram_id]
+        _states.set(user_telegram_id, state)
+    return state
+
+
+def _net_deltas(changes: list[tuple[str, decimal.Decimal]]) -> dict[str, decimal.Decimal]:
+    """
+    Складывает изменения трат по ключам бюджетов: общему и категории каждой траты.
+    Правка траты приходит как снятие старой суммы и добавление новой, и пороги
+    должны проверяться по их итогу, а не после каждого изменения.
+    """
+    deltas: dict[str, decimal.Decimal] = {}
+    for name, delta in changes:
+        for key in {TOTAL, category_of(name)}:
+            deltas[key] = deltas.get(key, 0) + delta
+    return deltas
+
+
+def _apply(state: BudgetState, key: str, delta: decimal.Decimal, alert: bool) -> None:
+    """Меняет траты по бюджету key на delta и при пересечении порога добавляет предупреждение."""
+    amount = state.limits.get(key)
+    if amount is None or not delta:
+        return
+    before = state.spent.get(key, 0)
+    after = state.spent[key] = before + delta
+    if alert and delta > 0:
+        crossed = [threshold for threshold in THRESHOLDS if before < threshold * amount <= after]
+        if crossed and crossed[-1] >= 1:
+            state.alerts.append(f"Бюджет {_label(key)} превышен: потрачено {after} из {amount} рублей.")
+        elif crossed:
+            state.alerts.append(f"Потрачено {crossed[-1]:.0%} бюджета {_label(key)}: {after} из {amount} рублей.")
+
+
+async def track_spending(user_telegram_id: int, changes: list[Change]) -> None:
+    """
+    Учитывает записанные изменения трат (название, дата, сумма) в бюджетах пользователя.
+    Вызывается после фиксации транзакции. Если состояния не было в кэше, оно загружается
+    уже с этими изменениями, поэтому для проверки порогов они сначала вычитаются.
+    Ошибка учета не влияет на запись: состояние удаляется и будет загружено заново.
+    """
+    try:
+        cached = _states.get(user_telegram_id, count=False)
+        state = await get_budget_state(user_telegram_id)
+        if not state.limits:
+            return
+        deltas = _net_deltas([(name, delta) for name, day, delta in changes if state.month == day.replace(day=1)])
+        if state is not cached:
+            for key, delta in deltas.items():
+                _apply(state, key, -delta, alert=False)
+        for key, delta in deltas.items():
+            _apply(state, key, delta, alert=True)
+        state.writes += 1
+    except Exception as e:
+        _states.pop(user_telegram_id)
+        logger.error("Ошибка при учете трат в бюджетах: %s", e, exc_info=True)
+
+
+def take_budget_alerts(user_telegram_id: int) -> list[str]:
+    """Возвращает и очищает предупреждения о бюджетах пользователя."""
+    state = _states.get(user_telegram_id, count=False)
+    if state is None or not state.alerts:
+        return []
+    alerts, state.alerts = state.alerts, []
+    return alerts
+
+
+def forget_budget_state(user_telegram_id: int) -> None:
+    """Удаляет состояние бюджетов из кэша, например после импорта трат."""
+    _states.pop(user_telegram_id)
+
+
+async def set_budget(user_telegram_id: int, category: str, amount: decimal.Decimal) -> None:
+    """Задает бюджет на месяц, нулевая сумма удаляет бюджет. Вызывает ValueError для неверной суммы."""
+    if not amount.is_finite() or amount < 0 or amount > MAX_AMOUNT:
+        raise ValueError(f"Сумма бюджета должна быть от 0 до {MAX_AMOUNT}")
+    amount, category = amount.quantize(AMOUNT_QUANTUM), category_of(category)
+    if len(category) > MAX_CATEGORY_LENGTH:
+        raise ValueError(f"Категория должна содержать не больше {MAX_CATEGORY_LENGTH} символов")
+    if amount:
+        await connections.get("default").execute_query(UPSERT_BUDGET_SQL, [user_telegram_id, category, amount])
+    else:
+        await Budget.filter(user_telegram_id_id=user_telegram_id, category=category).delete()
+    forget_budget_state(user_telegram_id)
+
+
+async def get_budget_statuses(user_telegram_id: int) -> list[BudgetStatus]:
+    """Возвращает бюджеты пользователя с тратами по ним с начала месяца, общий бюджет первым."""
+    state = await get_budget_state(user_telegram_id)
+    return [BudgetStatus(category, amount, state.spent.get(category, decimal.Decimal(0)))
+            for category, amount in sorted(state.limits.items())]
+
+
+async def reconcile_budgets(batch_size: int = 500) -> int:
+    """
+    Сверяет траты по бюджетам в кэше с БД и исправляет расхождения.
+    Состояние, в которое за время сверки записали трату, пропускается до следующей сверки.
+    Возвращает количество исправленных состояний.
+    """
+    month = get_current_month()
+    user_ids = _states.keys()
+    corrected = 0
+    for offset in range(0, len(user_ids), batch_size):
+        batch = user_ids[offset:offset + batch_size]
+        writes = {user_id: state.writes for user_id in batch
+                  if (state := _states.get(user_id, count=False)) is not None}
+        fresh = await load_states(batch, month)
+        for user_id, loaded in fresh.items():
+            state = _states.get(user_id, count=False)
+            if state is None or state.writes != writes.get(user_id) or state.month != loaded.month:
+                continue
+            if state.limits != loaded.limits or _nonzero(state.spent) != _nonzero(loaded.spent):
+                logger.warning("Траты по бюджетам пользователя %s расходятся с БД: %s вместо %s.",
+                               user_id, state.spent, loaded.spent)
+                state.limits, state.spent = loaded.limits, loaded.spent
+                corrected += 1
+    return corrected
+
+
+class BudgetReconciler:
+    """Фоновая сверка трат по бюджетам в кэше с БД раз в interval секунд."""
+
+    def __init__(self, interval: float = settings.BUDGET_RECONCILE_INTERVAL) -> None:
+        self.interval = interval
+        self._task: asyncio.Task|None = None
+
+    async def start(self) -> None:
+        """Запускает сверку, если она не отключена."""
+        if not self.interval:
+            return
+        self._task = asyncio.create_task(self._run_forever())
+
+    async def stop(self) -> None:
+        """Останавливает сверку."""
+        if self._task is not None:
+            task, self._task = self._task, None
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+
+    async def _run_forever(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                corrected = await reconcile_budgets()
+                if corrected:
+                    logger.warning("Исправлено состояний бюджетов: %s.", corrected)
+            except Exception as e:
+                logger.error("Ошибка при сверке бюджетов: %s", e, exc_info=True)
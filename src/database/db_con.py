@@ -1,25 +1,126 @@
 """Управление подключением к базе данных"""
-from tortoise import Tortoise
+import asyncio
+import contextlib
+import copy
+import datetime
+import time
+from pathlib import Path
+from asyncpg import Connection
+from tortoise import Tortoise, connections
+from tortoise.exceptions import OperationalError
 from src.utils.logger import setup_module_logger
+from .fsm_states import GET_SQL, SET_STATE_SQL, SET_DATA_SQL
+from .instrumentation import InstrumentedConnection
+from .sqlite_schema import SchemaVersionError, ensure_sqlite_schema
+from .services import PERIOD_REPORT_FORWARD_SQL, PERIOD_REPORT_BACKWARD_SQL, ROLLUP_UPSERT_SQL, FIRST_CURSOR
 
 
 logger = setup_module_logger(__name__)
 
 
-async def init_db_connection(db_config: dict) -> None:
-    """Функция подключения к базе данных."""
+MIGRATIONS_DIR = Path(__file__).resolve().parents[2] / "migrations" / "models"
+MIGRATIONS_APP = "models"
+
+APPLIED_MIGRATIONS_SQL = 'SELECT "version" FROM "aerich" WHERE "app" = $1'
+
+# Чтения выполняются на несуществующем пользователе и попадают в кэш
+# подготовленных выражений соединения. Записи только готовятся:
+# так проверяется, что они совпадают со схемой.
+_ANY_DAY = datetime.date.min
+HOT_READS = (
+    (PERIOD_REPORT_FORWARD_SQL, (0, _ANY_DAY, _ANY_DAY, *FIRST_CURSOR, 1)),
+    (PERIOD_REPORT_BACKWARD_SQL, (0, _ANY_DAY, _ANY_DAY, *FIRST_CURSOR, 1)),
+    (GET_SQL, ("",)),
+)
+HOT_WRITES = (ROLLUP_UPSERT_SQL, SET_STATE_SQL, SET_DATA_SQL)
+
+
+class DatabaseNotReady(Exception):
+    """База данных недоступна или ее схема не соответствует миграциям."""
+
+
+async def prepare_connection(connection: Connection) -> None:
+    """Готовит горячие запросы на соединении asyncpg."""
+    for sql, args in HOT_READS:
+        await connection.fetch(sql, *args)
+    for sql in HOT_WRITES:
+        await connection.prepare(sql)
+
+
+async def check_migrations() -> None:
+    """Проверяет, что все миграции aerich применены к базе."""
+    files = {path.name for path in MIGRATIONS_DIR.glob("*.py")}
+    try:
+        rows = await connections.get("default").execute_query_dict(APPLIED_MIGRATIONS_SQL, [MIGRATIONS_APP])
+    except OperationalError as e:
+        raise DatabaseNotReady("Таблица миграций не найдена, выполните 'aerich upgrade'.") from e
+    pending = sorted(files - {row["version"] for row in rows}, key=lambda name: int(name.split("_")[0]))
+    if pending:
+        raise DatabaseNotReady(f"Не применены миграции: {', '.join(pending)}. Выполните 'aerich upgrade'.")
+
+
+async def check_schema(connection_name: str = "default") -> None:
+    """Проверяет миграции PostgreSQL или создает схему встроенной базы SQLite."""
+    if connections.get(connection_name).capabilities.dialect != "sqlite":
+        await check_migrations()
+        return
     try:
-        await Tortoise.init(config = db_config)
-        await Tortoise.generate_schemas()
-        logger.info("Подключение к базе данных успешно установленно.")
+        await ensure_sqlite_schema(connection_name)
+    except SchemaVersionError as e:
+        raise DatabaseNotReady(str(e)) from e
+
+
+async def warm_up_pool(connection_name: str = "default") -> int:
+    """
+    Открывает пул и готовит горячие запросы на каждом его соединении.
+    Соединения берутся из пула одновременно, поэтому все они разные.
+    Возвращает количество подготовленных соединений.
+    """
+    client = connections.get(connection_name)
+    if client.capabilities.dialect != "postgres":
+        await client.execute_query("SELECT 1")
+        return 1
+    async with contextlib.AsyncExitStack() as stack:
+        raw_connections = [await stack.enter_async_context(client.acquire_connection())
+                           for _ in range(client.pool_minsize)]
+        await asyncio.gather(*(prepare_connection(connection) for connection in raw_connections))
+    return len(raw_connections)
+
+
+def instrument_config(db_config: dict) -> dict:
+    """Возвращает копию конфигурации, в которой соединения asyncpg замеряют свои запросы."""
+    db_config = copy.deepcopy(db_config)
+    for connection in db_config.get("connections", {}).values():
+        if isinstance(connection, dict) and connection.get("engine") == "tortoise.backends.asyncpg":
+            connection.setdefault("credentials", {})["connection_class"] = InstrumentedConnection
+    return db_config
+
+
+async def init_db_connection(db_config: dict, timeout: float = 30) -> None:
+    """
+    Функция подключения к базе данных.
+    Проверяет схему и прогревает пул, при любой ошибке вызывает DatabaseNotReady,
+    чтобы бот не начинал работу без базы.
+    """
+    started = time.perf_counter()
+    try:
+        await Tortoise.init(config=instrument_config(db_config))
+        await asyncio.wait_for(check_schema(), timeout)
+        opened = await asyncio.wait_for(warm_up_pool(), timeout)
+    except DatabaseNotReady:
+        await Tortoise.close_connections()
+        raise
     except Exception as e:
-        logger.error("Ошибка при подключении к базе данных: %s", e, exc_info=True)
+        await Tortoise.close_connections()
+        raise DatabaseNotReady(f"Ошибка при подключении к базе данных: {e!r}") from e
+    logger.info("Подключение к базе данных успешно установленно за %.3f с, соединений в пуле: %s.",
+                time.perf_counter() - started, opened)
 
 
 async def close_db_connection() -> None:
     """Функци отключения от базы данных."""
-    try:    
+    try:
         await Tortoise.close_connections()
         logger.info("Подключение к базе данных успешно закрыто.")
     except Exception as e:
-        logger.error("Ошибка при отключении от базе данных: %s", e, exc_info=True)
\ No newline at end of file
+        logger.error("Ошибка при отключении от базе данных: %s", e, exc_info=True)
@@ -0,0 +1,131 @@
+"""Проверка планов выполнения горячих запросов."""
+import datetime
+import json
+from typing import Any
+from tortoise import connections
+from tortoise.functions import Sum
+from tortoise.transactions import in_transaction
+from src.utils.logger import setup_module_logger
+from src.utils.helpers import get_current_month
+from .models import Transaction, DailySpending
+
+
+logger = setup_module_logger(__name__)
+
+
+MONITORED_TABLES = (Transaction._meta.db_table, DailySpending._meta.db_table)
+PARTITIONED_TABLE = Transaction._meta.db_table
+
+
+class QueryPlanRegression(Exception):
+    """Запрос к таблице трат выполняется последовательным сканированием или читает несколько секций."""
+
+
+def _table_of(relation: str|None) -> str|None:
+    """Возвращает отслеживаемую таблицу узла плана, секции относятся к своей таблице."""
+    if relation in MONITORED_TABLES:
+        return relation
+    if relation and relation.startswith(f"{PARTITIONED_TABLE}_"):
+        return PARTITIONED_TABLE
+    return None
+
+
+def _hot_queries(user_telegram_id: int) -> dict[str, str]:
+    """Возвращает SQL, который генерируют сервисы чтения транзакций."""
+    start_date, end_date = get_current_month()
+    today = datetime.date.today()
+    month = Transaction.filter(user_telegram_id_id=user_telegram_id,
+                               created_at__gte=start_date,
+                               created_at__lt=end_date)
+    day = Transaction.filter(user_telegram_id_id=user_telegram_id,
+                             created_at=today)
+    month_rollup = DailySpending.filter(user_telegram_id_id=user_telegram_id,
+                                        day__gte=start_date,
+                                        day__lt=end_date)
+    day_rollup = DailySpending.filter(user_telegram_id_id=user_telegram_id,
+                                      day__gte=today,
+                                      day__lt=today + datetime.timedelta(days=1))
+    queries = {
+        "get_month_transactions": month.values("id", "name", "price", "created_at"),
+        "get_month_transactions_price": month_rollup.annotate(period_total=Sum("total")).values("period_total"),
+        "get_today_transactions": day.values("id", "name", "price", "created_at"),
+        "get_today_transactions_price": day_rollup.annotate(period_total=Sum("total")).values("period_total"),
+    }
+    return {name: query.sql(params_inline=True) for name, query in queries.items()}
+
+
+def _iter_plan_nodes(node: dict[str, Any]):
+    """Обходит все узлы плана EXPLAIN (FORMAT JSON)."""
+    yield node
+    for child in node.get("Plans", []):
+        yield from _iter_plan_nodes(child)
+
+
+async def explain_query(sql: str) -> dict[str, Any]:
+    """
+    Возвращает корневой узел плана запроса.
+    Последовательное сканирование запрещается на время транзакции,
+    поэтому на маленькой таблице план совпадает с планом на большой.
+    """
+    async with in_transaction() as conn:
+        await conn.execute_script("SET LOCAL enable_seqscan = off")
+        _, rows = await conn.execute_query(f"EXPLAIN (FORMAT JSON) {sql}")
+    plan = rows[0]["QUERY PLAN"]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]["Plan"]
+
+
+async def explain_sqlite_query(sql: str) -> list[str]:
+    """Возвращает строки плана EXPLAIN QUERY PLAN запроса к SQLite."""
+    _, rows = await connections.get("default").execute_query(f"EXPLAIN QUERY PLAN {sql}")
+    return [row["detail"] for row in rows]
+
+
+async def check_sqlite_query_plans(user_telegram_id: int = 0) -> dict[str, str]:
+    """
+    Проверяет, что горячие запросы к SQLite ищут строки по ключу (SEARCH),
+    а не перебирают таблицу или индекс целиком (SCAN).
+    Возвращает шаги плана по отслеживаемым таблицам для каждого запроса.
+    """
+    results = {}
+    regressions = []
+    for name, sql in _hot_queries(user_telegram_id).items():
+        steps = [detail for detail in await explain_sqlite_query(sql)
+                 if len(detail.split()) > 1 and detail.split()[1] in MONITORED_TABLES]
+        results[name] = ", ".join(steps)
+        if any(detail.startswith("SCAN ") for detail in steps):
+            regressions.append(name)
+        logger.info("План запроса %s: %s.", name, results[name])
+    if regressions:
+        raise QueryPlanRegression(f"Полный перебор таблицы в запросах: {', '.join(regressions)}")
+    return results
+
+
+async def check_transaction_query_plans(user_telegram_id: int = 0) -> dict[str, str]:
+    """
+    Проверяет, что горячие запросы используют индексы по (пользователь, дата)
+    и читают не больше одной секции таблицы трат.
+    Возвращает тип сканирования для каждого запроса.
+    """
+    if connections.get("default").capabilities.dialect == "sqlite":
+        return await check_sqlite_query_plans(user_telegram_id)
+    results = {}
+    regressions = []
+    for name, sql in _hot_queries(user_telegram_id).items():
+        plan = await explain_query(sql)
+        scans = [node for node in _iter_plan_nodes(plan)
+                 if _table_of(node.get("Relation Name")) is not None]
+        scan_types = ", ".join(node["Node Type"] for node in scans)
+        results[name] = scan_types
+        partitions = {node["Relation Name"] for node in scans
+                      if _table_of(node["Relation Name"]) == PARTITIONED_TABLE}
+        if any(node["Node Type"] == "Seq Scan" for node in scans):
+            regressions.append(name)
+        elif len(partitions) > 1:
+            regressions.append(f"{name} (секций: {len(partitions)})")
+        logger.info("План запроса %s: %s.", name, scan_types)
+    if regressions:
+        raise QueryPlanRegression(
+            f"Последовательное сканирование или чтение нескольких секций в запросах: {', '.join(regressions)}")
+    return results
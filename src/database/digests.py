@@ -0,0 +1,160 @@
+"""Итоги трат для рассылки и контрольные точки рассылок."""
+import datetime
+import decimal
+from dataclasses import dataclass
+from tortoise import connections
+from tortoise.backends.base.client import BaseDBAsyncClient
+
+
+# Итоги пачки пользователей за период и предыдущий период считаются одним запросом по дневным итогам.
+DIGEST_BATCH_SQL = """
+SELECT u."telegram_id" AS "user_id",
+       COALESCE(SUM(d."count") FILTER (WHERE d."day" >= $3), 0)::int AS "count",
+       COALESCE(SUM(d."total") FILTER (WHERE d."day" >= $3), 0) AS "total",
+       COALESCE(SUM(d."total") FILTER (WHERE d."day" < $3), 0) AS "previous_total"
+FROM (
+    SELECT "telegram_id" FROM "Users"
+    WHERE "telegram_id" > $1
+    ORDER BY "telegram_id"
+    LIMIT $2
+) u
+LEFT JOIN "DailySpendings" d
+    ON d."user_telegram_id_id" = u."telegram_id" AND d."day" >= $4 AND d."day" < $5
+GROUP BY u."telegram_id"
+ORDER BY u."telegram_id"
+"""
+
+# Рассылку ведет один процесс: он берет аренду, если рассылка не завершена
+# и ее аренда свободна или истекла, и продолжает с контрольной точки.
+CLAIM_RUN_SQL = """
+INSERT INTO "DigestRuns" ("kind", "period_start", "last_user_id", "sent", "failed", "owner", "lease_until")
+VALUES ($1, $2, 0, 0, 0, $3, now() + make_interval(secs => $4))
+ON CONFLICT ("kind", "period_start") DO UPDATE SET
+    "owner" = EXCLUDED."owner",
+    "lease_until" = EXCLUDED."lease_until"
+WHERE "DigestRuns"."finished_at" IS NULL
+  AND ("DigestRuns"."lease_until" IS NULL OR "DigestRuns"."lease_until" < now())
+RETURNING "id", "last_user_id", "sent", "failed"
+"""
+
+# execute_query возвращает число измененных строк, только если запрос начинается с UPDATE.
+CHECKPOINT_SQL = ('UPDATE "DigestRuns" '
+                  'SET "last_user_id" = $3, "sent" = $4, "failed" = $5, '
+                  '"lease_until" = now() + make_interval(secs => $6) '
+                  'WHERE "id" = $1 AND "owner" = $2')
+
+FINISH_RUN_SQL = ('UPDATE "DigestRuns" SET "finished_at" = now(), "lease_until" = NULL '
+                  'WHERE "id" = $1 AND "owner" = $2')
+
+RELEASE_RUN_SQL = 'UPDATE "DigestRuns" SET "lease_until" = NULL WHERE "id" = $1 AND "owner" = $2'
+
+# В SQLite время хранится текстом в UTC, срок аренды передается в секундах.
+DIGEST_BATCH_SQLITE_SQL = """
+SELECT u."telegram_id" AS "user_id",
+       COALESCE(SUM(d."count") FILTER (WHERE d."day" >= $3), 0) AS "count",
+       printf('%.2f', COALESCE(SUM(d."total") FILTER (WHERE d."day" >= $3), 0)) AS "total [decimal]",
+       printf('%.2f', COALESCE(SUM(d."total") FILTER (WHERE d."day" < $3), 0)) AS "previous_total [decimal]"
+FROM (
+    SELECT "telegram_id" FROM "Users"
+    WHERE "telegram_id" > $1
+    ORDER BY "telegram_id"
+    LIMIT $2
+) u
+LEFT JOIN "DailySpendings" d
+    ON d."user_telegram_id_id" = u."telegram_id" AND d."day" >= $4 AND d."day" < $5
+GROUP BY u."telegram_id"
+ORDER BY u."telegram_id"
+"""
+
+CLAIM_RUN_SQLITE_SQL = """
+INSERT INTO "DigestRuns" ("kind", "period_start", "last_user_id", "sent", "failed", "owner", "lease_until")
+VALUES ($1, $2, 0, 0, 0, $3, datetime('now', $4 || ' seconds'))
+ON CONFLICT ("kind", "period_start") DO UPDATE SET
+    "owner" = EXCLUDED."owner",
+    "lease_until" = EXCLUDED."lease_until"
+WHERE "DigestRuns"."finished_at" IS NULL
+  AND ("DigestRuns"."lease_until" IS NULL OR "DigestRuns"."lease_until" < datetime('now'))
+RETURNING "id", "last_user_id", "sent", "failed"
+"""
+
+CHECKPOINT_SQLITE_SQL = ('UPDATE "DigestRuns" '
+                         'SET "last_user_id" = $3, "sent" = $4, "failed" = $5, '
+                         '"lease_until" = datetime(\'now\', $6 || \' seconds\') '
+                         'WHERE "id" = $1 AND "owner" = $2')
+
+FINISH_RUN_SQLITE_SQL = ('UPDATE "DigestRuns" SET "finished_at" = datetime(\'now\'), "lease_until" = NULL '
+                         'WHERE "id" = $1 AND "owner" = $2')
+
+
+class LeaseLost(Exception):
+    """Аренду рассылки забрал другой процесс."""
+
+
+@dataclass
+class DigestRow:
+    """Итоги пользователя за период и за предыдущий период такой же длины."""
+    user_id: int
+    count: int
+    total: decimal.Decimal
+    previous_total: decimal.Decimal
+
+
+@dataclass
+class DigestCheckpoint:
+    """Состояние рассылки: последний пользователь, которому итоги доставлены, и счетчики."""
+    run_id: int
+    last_user_id: int
+    sent: int
+    failed: int
+
+
+def _postgres(conn: BaseDBAsyncClient) -> bool:
+    return conn.capabilities.dialect == "postgres"
+
+
+async def get_digest_batch(after_user_id: int,
+                           batch_size: int,
+                           previous_start: datetime.date,
+                           start_date: datetime.date,
+                           end_date: datetime.date) -> list[DigestRow]:
+    """Возвращает итоги следующих batch_size пользователей с id больше after_user_id."""
+    conn = connections.get("default")
+    rows = await conn.execute_query_dict(
+        DIGEST_BATCH_SQL if _postgres(conn) else DIGEST_BATCH_SQLITE_SQL,
+        [after_user_id, batch_size, start_date, previous_start, end_date])
+    return [DigestRow(**row) for row in rows]
+
+
+async def claim_run(kind: str, period_start: datetime.date, owner: str,
+                    lease: datetime.timedelta) -> DigestCheckpoint|None:
+    """Берет аренду рассылки. Возвращает контрольную точку или None, если рассылка занята или завершена."""
+    conn = connections.get("default")
+    rows = await conn.execute_query_dict(CLAIM_RUN_SQL if _postgres(conn) else CLAIM_RUN_SQLITE_SQL,
+                                         [kind, period_start, owner, lease.total_seconds()])
+    if not rows:
+        return None
+    row = rows[0]
+    return DigestCheckpoint(row["id"], row["last_user_id"], row["sent"], row["failed"])
+
+
+async def save_checkpoint(checkpoint: DigestCheckpoint, owner: str, lease: datetime.timedelta) -> None:
+    """Сохраняет контрольную точку и продлевает аренду. Вызывает LeaseLost, если аренда потеряна."""
+    conn = connections.get("default")
+    updated, _ = await conn.execute_query(
+        CHECKPOINT_SQL if _postgres(conn) else CHECKPOINT_SQLITE_SQL,
+        [checkpoint.run_id, owner, checkpoint.last_user_id, checkpoint.sent, checkpoint.failed,
+         lease.total_seconds()])
+    if not updated:
+        raise LeaseLost(f"Аренда рассылки {checkpoint.run_id} потеряна.")
+
+
+async def finish_run(checkpoint: DigestCheckpoint, owner: str) -> None:
+    """Отмечает рассылку завершенной."""
+    conn = connections.get("default")
+    await conn.execute_query(FINISH_RUN_SQL if _postgres(conn) else FINISH_RUN_SQLITE_SQL,
+                             [checkpoint.run_id, owner])
+
+
+async def release_run(checkpoint: DigestCheckpoint, owner: str) -> None:
+    """Освобождает аренду, чтобы рассылку сразу продолжил следующий запуск."""
+    await connections.get("default").execute_query(RELEASE_RUN_SQL, [checkpoint.run_id, owner])
@@ -0,0 +1,125 @@
+"""Потоковая выгрузка истории трат пользователя в файл."""
+import asyncio
+import csv
+import datetime
+import io
+from typing import Any, AsyncIterator
+import aiofiles
+from openpyxl import Workbook
+from tortoise import connections
+from tortoise.transactions import in_transaction
+from src.utils.logger import setup_module_logger
+from .user_cache import get_cached_user
+
+
+logger = setup_module_logger(__name__)
+
+
+BATCH_SIZE = 5000
+EXPORT_FORMATS = ("csv", "xlsx")
+# Заголовки совпадают с колонками, которые понимает импорт.
+EXPORT_HEADER = ("created_at", "name", "price")
+
+# Траты из архива выгружаются вместе с остальными.
+EXPORT_SQL = """
+SELECT "created_at", "name", "price"
+FROM (
+    SELECT "created_at", "id", "name", "price"
+    FROM "Transactions"
+    WHERE "user_telegram_id_id" = $1
+    UNION ALL
+    SELECT r."created_at", r."id", r."name", r."price"
+    FROM "TransactionsArchive" a
+    CROSS JOIN LATERAL unnest(a."days", a."ids", a."names", a."prices") AS r("created_at", "id", "name", "price")
+    WHERE a."user_telegram_id_id" = $1
+) t
+ORDER BY "created_at", "id"
+"""
+
+# В SQLite нет серверных курсоров: пачки читаются по ключу (created_at, id) после последней строки.
+EXPORT_BATCH_SQLITE_SQL = """
+SELECT "created_at" AS "created_at [date]", "id", "name", "price" AS "price [decimal]"
+FROM "Transactions"
+WHERE "user_telegram_id_id" = $1 AND ("created_at", "id") > ($2, $3)
+ORDER BY "created_at", "id"
+LIMIT $4
+"""
+
+
+async def iter_transaction_batches(user_telegram_id: int,
+                                   batch_size: int = BATCH_SIZE) -> AsyncIterator[list[tuple[Any, ...]]]:
+    """
+    Отдает траты пользователя пачками по batch_size строк.
+    Строки читаются серверным курсором внутри одной транзакции,
+    поэтому в памяти одновременно находится только одна пачка.
+    В SQLite каждая пачка читается отдельным запросом, чтобы между пачками
+    соединение было свободно для других запросов.
+    """
+    conn = connections.get("default")
+    if conn.capabilities.dialect != "postgres":
+        last = (datetime.date.min, "")
+        while rows := await conn.execute_query_dict(EXPORT_BATCH_SQLITE_SQL,
+                                                    [user_telegram_id, *last, batch_size]):
+            yield [(row["created_at"], row["name"], row["price"]) for row in rows]
+            last = (rows[-1]["created_at"], rows[-1]["id"])
+        return
+    async with in_transaction() as conn:
+        async with conn.acquire_connection() as connection:
+            cursor = await connection.cursor(EXPORT_SQL, user_telegram_id)
+            while rows := await cursor.fetch(batch_size):
+                yield [tuple(row) for row in rows]
+
+
+def format_csv(rows: list[tuple[Any, ...]]) -> str:
+    """Форматирует пачку строк в текст CSV."""
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue()
+
+
+def append_rows(sheet: Any, rows: list[tuple[Any, ...]]) -> None:
+    """Добавляет пачку строк на лист XLSX."""
+    for row in rows:
+        sheet.append(row)
+
+
+async def write_csv(user_telegram_id: int, path: str) -> int:
+    """Пишет траты в CSV-файл пачками, форматируя их вне цикла событий."""
+    count = 0
+    async with aiofiles.open(path, "w", encoding="utf-8-sig", newline="") as file:
+        await file.write(format_csv([EXPORT_HEADER]))
+        async for rows in iter_transaction_batches(user_telegram_id):
+            await file.write(await asyncio.to_thread(format_csv, rows))
+            count += len(rows)
+    return count
+
+
+async def write_xlsx(user_telegram_id: int, path: str) -> int:
+    """
+    Пишет траты в XLSX-файл.
+    Книга открывается в режиме write_only: openpyxl сбрасывает строки
+    во временный файл и не держит лист в памяти.
+    """
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Траты")
+    sheet.append(EXPORT_HEADER)
+    count = 0
+    async for rows in iter_transaction_batches(user_telegram_id):
+        await asyncio.to_thread(append_rows, sheet, rows)
+        count += len(rows)
+    await asyncio.to_thread(workbook.save, path)
+    return count
+
+
+async def export_transactions(user_telegram_id: int, path: str, file_format: str = "csv") -> int:
+    """
+    Выгружает все траты пользователя в файл path и возвращает их количество.
+    Вызывает DoesNotExist, если пользователя нет.
+    """
+    if file_format not in EXPORT_FORMATS:
+        raise ValueError(f"Неизвестный формат выгрузки {file_format!r}")
+    user = await get_cached_user(user_telegram_id)
+    writer = write_xlsx if file_format == "xlsx" else write_csv
+    count = await writer(user_telegram_id, path)
+    logger.info("Выгрузка трат пользователя %s в %s: %s шт.", user.name, file_format, count)
+    return count
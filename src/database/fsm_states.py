@@ -0,0 +1,78 @@
+"""
+Запросы хранилища FSM к таблице FSMStates для PostgreSQL и SQLite.
+Хранилище выбирает набор запросов по диалекту соединения, а подключение к базе
+заранее готовит запросы PostgreSQL на каждом соединении пула.
+"""
+from typing import NamedTuple
+
+
+GET_SQL = """
+SELECT "state", "data" FROM "FSMStates"
+WHERE "key" = $1 AND ("expires_at" IS NULL OR "expires_at" > now())
+"""
+
+SET_STATE_SQL = """
+INSERT INTO "FSMStates" ("key", "state", "data", "expires_at")
+VALUES ($1, $2, '{}', now() + make_interval(secs => $3))
+ON CONFLICT ("key") DO UPDATE SET
+    "state" = EXCLUDED."state",
+    "data" = CASE WHEN "FSMStates"."expires_at" < now() THEN '{}' ELSE "FSMStates"."data" END,
+    "expires_at" = EXCLUDED."expires_at"
+RETURNING "state", "data"
+"""
+
+SET_DATA_SQL = """
+INSERT INTO "FSMStates" ("key", "state", "data", "expires_at")
+VALUES ($1, NULL, $2::jsonb, now() + make_interval(secs => $3))
+ON CONFLICT ("key") DO UPDATE SET
+    "state" = CASE WHEN "FSMStates"."expires_at" < now() THEN NULL ELSE "FSMStates"."state" END,
+    "data" = EXCLUDED."data",
+    "expires_at" = EXCLUDED."expires_at"
+RETURNING "state", "data"
+"""
+
+SWEEP_SQL = ('DELETE FROM "FSMStates" '
+             'WHERE "expires_at" < now() OR ("state" IS NULL AND "data" = \'{}\'::jsonb)')
+
+# В SQLite время хранится текстом в UTC, данные - текстом JSON.
+GET_SQLITE_SQL = """
+SELECT "state", "data" FROM "FSMStates"
+WHERE "key" = $1 AND ("expires_at" IS NULL OR "expires_at" > datetime('now'))
+"""
+
+SET_STATE_SQLITE_SQL = """
+INSERT INTO "FSMStates" ("key", "state", "data", "expires_at")
+VALUES ($1, $2, '{}', datetime('now', $3 || ' seconds'))
+ON CONFLICT ("key") DO UPDATE SET
+    "state" = EXCLUDED."state",
+    "data" = CASE WHEN "FSMStates"."expires_at" < datetime('now') THEN '{}' ELSE "FSMStates"."data" END,
+    "expires_at" = EXCLUDED."expires_at"
+RETURNING "state", "data"
+"""
+
+SET_DATA_SQLITE_SQL = """
+INSERT INTO "FSMStates" ("key", "state", "data", "expires_at")
+VALUES ($1, NULL, $2, datetime('now', $3 || ' seconds'))
+ON CONFLICT ("key") DO UPDATE SET
+    "state" = CASE WHEN "FSMStates"."expires_at" < datetime('now') THEN NULL ELSE "FSMStates"."state" END,
+    "data" = EXCLUDED."data",
+    "expires_at" = EXCLUDED."expires_at"
+RETURNING "state", "data"
+"""
+
+SWEEP_SQLITE_SQL = ('DELETE FROM "FSMStates" '
+                    'WHERE "expires_at" < datetime(\'now\') OR ("state" IS NULL AND "data" = \'{}\')')
+
+
+class Queries(NamedTuple):
+    """Запросы хранилища для одного диалекта."""
+    get: str
+    set_state: str
+    set_data: str
+    sweep: str
+
+
+QUERIES = {
+    "postgres": Queries(GET_SQL, SET_STATE_SQL, SET_DATA_SQL, SWEEP_SQL),
+    "sqlite": Queries(GET_SQLITE_SQL, SET_STATE_SQLITE_SQL, SET_DATA_SQLITE_SQL, SWEEP_SQLITE_SQL),
+}
@@ -0,0 +1,299 @@
+"""Потоковый импорт трат из CSV-файлов и банковских выписок."""
+import asyncio
+import codecs
+import csv
+import dataclasses
+import datetime
+import decimal
+import itertools
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Iterator, TextIO
+from tortoise.transactions import in_transaction
+from src.utils.logger import setup_module_logger
+from src.utils.ids import uuid7
+from .models import Transaction
+from .services import rollup_upsert_sql, validate_transaction
+from .user_cache import get_cached_user
+from .versions import bump_data_version
+from .budgets import forget_budget_state
+
+
+logger = setup_module_logger(__name__)
+
+
+CHUNK_SIZE = 2000
+SAMPLE_SIZE = 64 * 1024
+MAX_REPORTED_ERRORS = 20
+
+# Названия колонок в порядке предпочтения: в выписках бывает несколько дат и сумм.
+NAME_COLUMNS = ("name", "название", "описание", "description", "назначение платежа", "категория")
+PRICE_COLUMNS = ("price", "amount", "цена", "сумма", "сумма операции", "сумма платежа",
+                 "сумма в валюте счета")
+DATE_COLUMNS = ("created_at", "date", "дата", "дата операции", "дата платежа")
+# В этих колонках записаны цены трат, как в выгрузке бота. В остальных колонках суммы
+# может быть выписка, где траты и поступления различаются знаком.
+EXPENSE_PRICE_COLUMNS = ("price", "цена")
+# Доля ненулевых сумм одного знака, по которой файл считается списком трат или выпиской.
+SIGN_MAJORITY = 0.75
+DATE_FORMATS = ("%Y-%m-%d", "%d.%m.%Y", "%d.%m.%y", "%d/%m/%Y")
+
+TRANSACTION_COLUMNS = ("id", "user_telegram_id_id", "name", "price", "created_at")
+
+Row = tuple[str, decimal.Decimal, datetime.date]
+ProgressCallback = Callable[["ImportResult"], Awaitable[None]]
+
+
+class ImportFormatError(Exception):
+    """Файл не удалось разобрать как таблицу трат."""
+
+
+@dataclass
+class ImportResult:
+    """Итог импорта: сколько строк прочитано, добавлено, отклонено и пропущено как поступления."""
+    processed: int = 0
+    imported: int = 0
+    rejected: int = 0
+    skipped: int = 0
+    errors: list[str] = field(default_factory=list)
+
+    def reject(self, line: int, reason: str) -> None:
+        """Учитывает отклоненную строку, сохраняя только первые ошибки."""
+        self.rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(f"Строка {line}: {reason}")
+
+
+@dataclass(frozen=True)
+class ColumnMap:
+    """
+    Номера колонок с названием, суммой и датой траты.
+    expense_sign - знак трат: 1 в списке трат, -1 в выписке, где траты записаны с минусом,
+    None, если по файлу знак определить нельзя.
+    """
+    name: int
+    price: int
+    date: int
+    expense_sign: int|None = 1
+
+
+def detect_encoding(sample: bytes) -> str:
+    """Определяет кодировку файла: UTF-8 (с BOM или без) или cp1251 из банковских выгрузок."""
+    if sample.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+    except UnicodeDecodeError:
+        return "cp1251"
+    return "utf-8"
+
+
+def detect_dialect(sample: str) -> type[csv.Dialect] | csv.Dialect:
+    """Определяет разделитель колонок по началу файла."""
+    try:
+        return csv.Sniffer().sniff(sample, delimiters=",;\t")
+    except csv.Error:
+        return csv.excel
+
+
+def find_columns(header: list[str]) -> ColumnMap:
+    """Находит нужные колонки по заголовку файла."""
+    normalized = [column.strip().lower() for column in header]
+
+    def find(aliases: tuple[str, ...]) -> int:
+        for alias in aliases:
+            if alias in normalized:
+                return normalized.index(alias)
+        raise ImportFormatError(f"В заголовке нет колонки {aliases[0]!r} или ее аналогов: "
+                                f"{', '.join(aliases[1:])}.")
+
+    return ColumnMap(name=find(NAME_COLUMNS), price=find(PRICE_COLUMNS), date=find(DATE_COLUMNS))
+
+
+def is_expense_price_column(header: list[str], columns: ColumnMap) -> bool:
+    """Проверяет, что колонка суммы - цена траты, а не сумма операции со знаком."""
+    return header[columns.price].strip().lower() in EXPENSE_PRICE_COLUMNS
+
+
+def parse_price(value: str) -> decimal.Decimal:
+    """Разбирает сумму вида '1 234,56' или '-1234.56'."""
+    cleaned = value.replace("\xa0", "").replace(" ", "").replace(",", ".")
+    try:
+        return decimal.Decimal(cleaned)
+    except decimal.InvalidOperation:
+        raise ValueError(f"Некорректная сумма {value!r}") from None
+
+
+def parse_date(value: str) -> datetime.date:
+    """Разбирает дату, отбрасывая время операции, если оно указано."""
+    day = value.strip().replace("T", " ").split(" ")[0]
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.datetime.strptime(day, date_format).date()
+        except ValueError:
+            continue
+    raise ValueError(f"Некорректная дата {value!r}")
+
+
+def parse_row(row: list[str], columns: ColumnMap) -> Row|None:
+    """
+    Разбирает строку файла в название, цену и дату траты.
+    В выписке траты записаны с минусом, для поступлений возвращается None.
+    Вызывает ValueError для строки, которую нельзя считать тратой.
+    """
+    try:
+        name, price, date = row[columns.name], row[columns.price], row[columns.date]
+    except IndexError:
+        raise ValueError("Не хватает колонок") from None
+    price = parse_price(price)
+    if columns.expense_sign is None:
+        raise ValueError("В файле нет явного большинства сумм одного знака, нельзя определить, какие из них траты")
+    if columns.expense_sign < 0:
+        if price > 0:
+            return None
+        price = -price
+    elif price < 0:
+        raise ValueError("Отрицательная сумма: возвраты и поступления не импортируются")
+    return name.strip(), price, parse_date(date)
+
+
+def detect_expense_sign(path: str,
+                        encoding: str,
+                        dialect: type[csv.Dialect] | csv.Dialect,
+                        column: int) -> int|None:
+    """
+    Определяет знак трат по ненулевым суммам файла: 1, если явное большинство сумм
+    положительно, -1, если отрицательно (банковская выписка), иначе None.
+    """
+    negative = positive = 0
+    with open(path, encoding=encoding, newline="") as file:
+        reader = csv.reader(file, dialect)
+        next(reader, None)
+        for row in reader:
+            try:
+                price = parse_price(row[column])
+            except (IndexError, ValueError):
+                continue
+            negative += price < 0
+            positive += price > 0
+    if negative <= (1 - SIGN_MAJORITY) * (negative + positive):
+        return 1
+    if negative >= SIGN_MAJORITY * (negative + positive):
+        return -1
+    return None
+
+
+def open_table(path: str) -> tuple[TextIO, Iterator[list[str]], ColumnMap]:
+    """
+    Открывает файл как поток строк CSV.
+    Кодировка и разделитель определяются по первым SAMPLE_SIZE байтам,
+    первая строка считается заголовком. Колонка цены ('price', 'цена') - список трат,
+    в колонке суммы знак трат определяется по явному большинству строк файла.
+    """
+    with open(path, "rb") as raw:
+        sample = raw.read(SAMPLE_SIZE)
+    encoding = detect_encoding(sample)
+    text_sample = sample.decode(encoding, errors="ignore")
+    dialect = detect_dialect(text_sample)
+    file = open(path, encoding=encoding, newline="")
+    reader = csv.reader(file, dialect)
+    try:
+        header = next(reader)
+    except (StopIteration, csv.Error) as e:
+        file.close()
+        raise ImportFormatError("Файл пуст или не является CSV.") from e
+    try:
+        columns = find_columns(header)
+        if not is_expense_price_column(header, columns):
+            columns = dataclasses.replace(
+                columns, expense_sign=detect_expense_sign(path, encoding, dialect, columns.price))
+    except csv.Error as e:
+        file.close()
+        raise ImportFormatError(f"Ошибка разбора CSV: {e}") from e
+    except ImportFormatError:
+        file.close()
+        raise
+    return file, reader, columns
+
+
+def read_chunk(reader: Iterator[list[str]], size: int) -> list[tuple[int, list[str]]]:
+    """Читает следующие size непустых строк вместе с их номерами в файле."""
+    chunk = []
+    for row in itertools.islice(reader, size):
+        if any(cell.strip() for cell in row):
+            chunk.append((reader.line_num, row))
+    return chunk
+
+
+async def write_rows(user_telegram_id: int, rows: list[Row]) -> None:
+    """
+    Добавляет пачку трат и их дневные итоги одной транзакцией.
+    В Postgres строки передаются через COPY, в остальных базах - через bulk_create.
+    """
+    days: dict[datetime.date, tuple[int, decimal.Decimal]] = {}
+    for _, price, created_at in rows:
+        count, total = days.get(created_at, (0, decimal.Decimal(0)))
+        days[created_at] = (count + 1, total + price)
+    async with in_transaction() as conn:
+        if conn.capabilities.dialect == "postgres":
+            records = [(uuid7(), user_telegram_id, name, price, created_at)
+                       for name, price, created_at in rows]
+            async with conn.acquire_connection() as connection:
+                await connection.copy_records_to_table(Transaction._meta.db_table,
+                                                       records=records,
+                                                       columns=TRANSACTION_COLUMNS)
+        else:
+            await Transaction.bulk_create([Transaction(id=uuid7(),
+                                                       user_telegram_id_id=user_telegram_id,
+                                                       name=name,
+                                                       price=price,
+                                                       created_at=created_at)
+                                           for name, price, created_at in rows],
+                                          using_db=conn)
+        await conn.execute_many(rollup_upsert_sql(conn), [[user_telegram_id, day, count, total]
+                                                          for day, (count, total) in days.items()])
+    bump_data_version(user_telegram_id)
+    forget_budget_state(user_telegram_id)
+
+
+async def import_transactions(user_telegram_id: int,
+                              path: str,
+                              on_progress: ProgressCallback|None = None,
+                              chunk_size: int = CHUNK_SIZE) -> ImportResult:
+    """
+    Импортирует траты пользователя из CSV-файла.
+    Файл читается и проверяется пачками по chunk_size строк по тем же правилам,
+    что и при добавлении одной траты, поэтому память не зависит от размера файла.
+    Поступления из выписки пропускаются, возвраты в списке трат отклоняются.
+    Каждая пачка записывается отдельной транзакцией, после нее вызывается on_progress.
+    Вызывает DoesNotExist, если пользователя нет, и ImportFormatError, если файл не разобран.
+    """
+    user = await get_cached_user(user_telegram_id)
+    file, reader, columns = await asyncio.to_thread(open_table, path)
+    result = ImportResult()
+    try:
+        while chunk := await asyncio.to_thread(read_chunk, reader, chunk_size):
+            rows = []
+            for line, raw_row in chunk:
+                try:
+                    row = parse_row(raw_row, columns)
+                    if row is None:
+                        result.skipped += 1
+                        continue
+                    validate_transaction(user.created_at, *row)
+                except ValueError as e:
+                    result.reject(line, str(e))
+                else:
+                    rows.append(row)
+            if rows:
+                await write_rows(user_telegram_id, rows)
+            result.processed += len(chunk)
+            result.imported += len(rows)
+            if on_progress is not None:
+                await on_progress(result)
+    except csv.Error as e:
+        raise ImportFormatError(f"Ошибка разбора CSV в строке {reader.line_num}: {e}") from e
+    finally:
+        file.close()
+    logger.info("Импорт пользователя %s: добавлено %s, отклонено %s, пропущено поступлений %s.",
+                user.name, result.imported, result.rejected, result.skipped)
+    return result
@@ -0,0 +1,14 @@
+"""Дополнительные индексы для моделей."""
+from tortoise.contrib.postgres.indexes import PostgreSQLIndex
+
+
+class CoveringIndex(PostgreSQLIndex):
+    """B-tree индекс с INCLUDE-колонками для index-only сканов."""
+
+    def __init__(self,
+                 fields: tuple[str, ...],
+                 include: tuple[str, ...],
+                 name: str | None = None) -> None:
+        super().__init__(fields=fields, name=name)
+        self.include = include
+        self.extra = " INCLUDE ({})".format(", ".join(f'"{column}"' for column in include))
@@ -0,0 +1,105 @@
+"""Замер времени и количества строк запросов к PostgreSQL."""
+import re
+import sys
+import time
+from typing import Any
+from asyncpg import Connection
+import settings
+from src.utils.logger import setup_module_logger
+from src.utils.metrics import query_duration, query_rows, slow_queries
+
+
+logger = setup_module_logger(__name__)
+
+
+OPERATION_RE = re.compile(r"\s*([A-Za-z]+)")
+MAX_LOGGED_QUERY_LENGTH = 500
+
+
+def find_caller() -> str:
+    """
+    Возвращает функцию проекта, из которой выполняется запрос, в виде 'services.create_transaction'.
+    Пока корутина запроса выполняется, стек содержит всю цепочку await,
+    поэтому вызывающая функция находится обходом кадров.
+    """
+    frame = sys._getframe(2)
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "")
+        if module.startswith("src.") and module != __name__:
+            return f"{module.rsplit('.', 1)[-1]}.{frame.f_code.co_name}"
+        frame = frame.f_back
+    return "unknown"
+
+
+def _status_rows(status: str) -> int:
+    """Количество строк из статуса команды, например 'DELETE 3' или 'INSERT 0 1'."""
+    last = status.rsplit(" ", 1)[-1] if status else ""
+    return int(last) if last.isdigit() else 0
+
+
+def record_query(query: str, caller: str, elapsed: float, rows: int) -> None:
+    """Записывает метрики запроса и логирует его, если он медленнее порога."""
+    match = OPERATION_RE.match(query)
+    operation = match.group(1).upper() if match else "UNKNOWN"
+    query_duration.observe(elapsed, caller, operation)
+    query_rows.observe(rows, caller, operation)
+    if settings.SLOW_QUERY_MS and elapsed * 1000 >= settings.SLOW_QUERY_MS:
+        slow_queries.inc(1, caller)
+        logger.warning("Медленный запрос %.1f мс из %s, строк: %s: %s",
+                       elapsed * 1000, caller, rows, " ".join(query.split())[:MAX_LOGGED_QUERY_LENGTH])
+
+
+class InstrumentedConnection(Connection):
+    """
+    Соединение asyncpg, которое замеряет каждый запрос.
+    Подключается через параметр пула connection_class.
+    """
+
+    async def fetch(self, query: str, *args: Any, **kwargs: Any) -> list:
+        caller, started, rows = find_caller(), time.perf_counter(), []
+        try:
+            rows = await super().fetch(query, *args, **kwargs)
+            return rows
+        finally:
+            record_query(query, caller, time.perf_counter() - started, len(rows))
+
+    async def fetchrow(self, query: str, *args: Any, **kwargs: Any) -> Any:
+        caller, started, row = find_caller(), time.perf_counter(), None
+        try:
+            row = await super().fetchrow(query, *args, **kwargs)
+            return row
+        finally:
+            record_query(query, caller, time.perf_counter() - started, int(row is not None))
+
+    async def fetchval(self, query: str, *args: Any, **kwargs: Any) -> Any:
+        caller, started = find_caller(), time.perf_counter()
+        try:
+            return await super().fetchval(query, *args, **kwargs)
+        finally:
+            record_query(query, caller, time.perf_counter() - started, 1)
+
+    async def execute(self, query: str, *args: Any, **kwargs: Any) -> str:
+        # Сброс соединения при возврате в пул не относится к запросам проекта.
+        if not args and query == self.get_reset_query():
+            return await super().execute(query, **kwargs)
+        caller, started, status = find_caller(), time.perf_counter(), ""
+        try:
+            status = await super().execute(query, *args, **kwargs)
+            return status
+        finally:
+            record_query(query, caller, time.perf_counter() - started, _status_rows(status))
+
+    async def executemany(self, command: str, args: Any, **kwargs: Any) -> None:
+        caller, started, args = find_caller(), time.perf_counter(), list(args)
+        try:
+            return await super().executemany(command, args, **kwargs)
+        finally:
+            record_query(command, caller, time.perf_counter() - started, len(args))
+
+    async def copy_records_to_table(self, table_name: str, **kwargs: Any) -> str:
+        caller, started, status = find_caller(), time.perf_counter(), ""
+        try:
+            status = await super().copy_records_to_table(table_name, **kwargs)
+            return status
+        finally:
+            record_query(f"COPY {table_name}", caller, time.perf_counter() - started, _status_rows(status))
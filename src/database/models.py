@@ -1,6 +1,29 @@
 """Модели для Telegram бота."""
+import decimal
+from typing import Any
 from tortoise.models import Model
 from tortoise import fields
+from tortoise.contrib.postgres.fields import ArrayField
+from .indexes import CoveringIndex
+
+
+class MoneyField(fields.DecimalField):
+    """
+    Сумма с копейками. DecimalField приводит значение к виду без лишних нулей (4.5E+2),
+    а SQLite хранит его текстом как есть, поэтому сумма при чтении и записи
+    только округляется до копеек.
+    """
+
+    def to_python_value(self, value: Any) -> decimal.Decimal|None:
+        if value is not None:
+            value = decimal.Decimal(value).quantize(self.quant)
+        return value
+
+    def to_db_value(self, value: Any, instance: Any) -> decimal.Decimal|None:
+        value = super().to_db_value(value, instance)
+        if value is not None:
+            value = value.quantize(self.quant)
+        return value
 
 
 class User(Model):
@@ -19,9 +42,90 @@ class Transaction(Model):
     id = fields.UUIDField(primary_key=True)
     user_telegram_id = fields.ForeignKeyField(model_name="models.User")
     name = fields.TextField(max_length=300)
-    price = fields.DecimalField(max_digits=10, decimal_places=2)
+    price = MoneyField(max_digits=10, decimal_places=2)
     created_at = fields.DateField()
 
 
     class Meta:
+        # Таблица секционирована по месяцам created_at, секциями управляет src/database/partitions.py.
+        # GIN-индекс поиска по названию создается миграцией по выражению SEARCH_VECTOR из services.py.
         table = "Transactions"
+        indexes = (
+            CoveringIndex(fields=("user_telegram_id_id", "created_at", "id"),
+                          include=("price",),
+                          name="idx_transactions_user_created"),
+        )
+
+
+class TransactionArchive(Model):
+    """Модель для архива трат пользователя за месяц: по массиву на каждую колонку."""
+    id = fields.IntField(primary_key=True)
+    user_telegram_id = fields.ForeignKeyField(model_name="models.User")
+    month = fields.DateField()
+    ids = ArrayField(element_type="uuid")
+    names = ArrayField(element_type="text")
+    prices = ArrayField(element_type="decimal(10,2)")
+    days = ArrayField(element_type="date")
+
+
+    class Meta:
+        table = "TransactionsArchive"
+        unique_together = (("user_telegram_id", "month"),)
+
+
+class DailySpending(Model):
+    """Модель для количества и суммы трат пользователя за день."""
+    id = fields.IntField(primary_key=True)
+    user_telegram_id = fields.ForeignKeyField(model_name="models.User")
+    day = fields.DateField()
+    count = fields.IntField(default=0)
+    total = MoneyField(max_digits=14, decimal_places=2, default=0)
+
+
+    class Meta:
+        table = "DailySpendings"
+        unique_together = (("user_telegram_id", "day"),)
+
+
+class Budget(Model):
+    """Модель для бюджета пользователя на месяц: общего или по названию траты."""
+    id = fields.IntField(primary_key=True)
+    user_telegram_id = fields.ForeignKeyField(model_name="models.User")
+    # Пустая категория - бюджет на все траты месяца.
+    category = fields.CharField(max_length=300, default="")
+    amount = MoneyField(max_digits=12, decimal_places=2)
+
+
+    class Meta:
+        table = "Budgets"
+        unique_together = (("user_telegram_id", "category"),)
+
+
+class DigestRun(Model):
+    """Модель для рассылки итогов за период и ее контрольной точки."""
+    id = fields.IntField(primary_key=True)
+    kind = fields.CharField(max_length=16)
+    period_start = fields.DateField()
+    last_user_id = fields.IntField(default=0)
+    sent = fields.IntField(default=0)
+    failed = fields.IntField(default=0)
+    owner = fields.CharField(max_length=64, null=True)
+    lease_until = fields.DatetimeField(null=True)
+    finished_at = fields.DatetimeField(null=True)
+
+
+    class Meta:
+        table = "DigestRuns"
+        unique_together = (("kind", "period_start"),)
+
+
+class FSMRecord(Model):
+    """Модель для состояния и данных FSM по ключу чата и пользователя."""
+    key = fields.CharField(max_length=255, primary_key=True)
+    state = fields.CharField(max_length=255, null=True)
+    data = fields.JSONField(default=dict)
+    expires_at = fields.DatetimeField(null=True, db_index=True)
+
+
+    class Meta:
+        table = "FSMStates"
@@ -0,0 +1,265 @@
+"""
+Секционирование таблицы трат по месяцам created_at.
+Запросы за месяц или день читают одну секцию, а VACUUM и обслуживание индексов
+идут по небольшим таблицам. Траты с датами вне созданных секций попадают в секцию
+по умолчанию и переносятся в свою секцию, когда она создается.
+Старые секции сжимаются в архив (по строке с массивами на пользователя и месяц)
+или отсоединяются от таблицы, дневные итоги при этом не меняются.
+"""
+import asyncio
+import contextlib
+import datetime
+import re
+from dataclasses import dataclass
+from tortoise import connections
+from tortoise.backends.base.client import BaseDBAsyncClient
+from tortoise.transactions import in_transaction
+import settings
+from src.utils.helpers import shift_month
+from src.utils.logger import setup_module_logger
+from .models import Transaction, TransactionArchive
+
+
+logger = setup_module_logger(__name__)
+
+
+TABLE = Transaction._meta.db_table
+ARCHIVE_TABLE = TransactionArchive._meta.db_table
+DEFAULT_PARTITION = f"{TABLE}_default"
+# Секция, отсоединенная для архивации, но еще не перенесенная в архив.
+PENDING_PREFIX = f"{ARCHIVE_TABLE}_pending_"
+RETENTION_MODES = ("archive", "detach")
+COLUMNS = '"id", "user_telegram_id_id", "name", "price", "created_at"'
+# Обслуживание секций из нескольких процессов выполняется по очереди.
+MAINTENANCE_LOCK_ID = 7_301_019
+
+LIST_PARTITIONS_SQL = """
+SELECT c."relname" AS "name", pg_get_expr(c."relpartbound", c."oid") AS "bound",
+       GREATEST(c."reltuples", 0)::bigint AS "rows"
+FROM pg_inherits i
+JOIN pg_class c ON c."oid" = i."inhrelid"
+WHERE i."inhparent" = to_regclass($1)
+ORDER BY 1
+"""
+
+LIST_PENDING_SQL = """
+SELECT "relname" AS "name" FROM pg_class
+WHERE "relkind" = 'r' AND starts_with("relname", $1)
+ORDER BY 1
+"""
+
+LOCK_SQL = "SELECT pg_advisory_xact_lock($1)"
+
+# Строки секции сжимаются в одну строку архива на пользователя и месяц.
+ARCHIVE_SQL_TEMPLATE = """
+WITH "moved" AS (
+    {source}
+)
+INSERT INTO "TransactionsArchive" ("user_telegram_id_id", "month", "ids", "names", "prices", "days")
+SELECT "user_telegram_id_id", date_trunc('month', "created_at")::date,
+       array_agg("id" ORDER BY "created_at", "id"), array_agg("name" ORDER BY "created_at", "id"),
+       array_agg("price" ORDER BY "created_at", "id"), array_agg("created_at" ORDER BY "created_at", "id")
+FROM "moved"
+GROUP BY 1, 2
+ON CONFLICT ("user_telegram_id_id", "month") DO UPDATE SET
+    "ids" = "TransactionsArchive"."ids" || EXCLUDED."ids",
+    "names" = "TransactionsArchive"."names" || EXCLUDED."names",
+    "prices" = "TransactionsArchive"."prices" || EXCLUDED."prices",
+    "days" = "TransactionsArchive"."days" || EXCLUDED."days"
+"""
+
+BOUND_RE = re.compile(r"FROM \('([\d-]+)'\) TO \('([\d-]+)'\)")
+
+
+@dataclass
+class Partition:
+    """Секция таблицы трат: [start, end) или секция по умолчанию без границ."""
+    name: str
+    start: datetime.date|None
+    end: datetime.date|None
+    rows: int
+
+
+def quote(name: str) -> str:
+    """Экранирует имя таблицы для DDL, где нельзя передать параметр."""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def partition_name(month: datetime.date) -> str:
+    """Возвращает имя секции месяца, например 'Transactions_y2026m10'."""
+    return f"{TABLE}_y{month:%Y}m{month:%m}"
+
+
+async def list_partitions(conn: BaseDBAsyncClient|None = None) -> list[Partition]:
+    """Возвращает секции таблицы трат с примерным числом строк по статистике."""
+    conn = conn or connections.get("default")
+    rows = await conn.execute_query_dict(LIST_PARTITIONS_SQL, [quote(TABLE)])
+    partitions = []
+    for row in rows:
+        bound = BOUND_RE.search(row["bound"])
+        start = datetime.date.fromisoformat(bound[1]) if bound else None
+        end = datetime.date.fromisoformat(bound[2]) if bound else None
+        partitions.append(Partition(row["name"], start, end, row["rows"]))
+    return partitions
+
+
+async def create_partition(conn: BaseDBAsyncClient, month: datetime.date) -> str:
+    """
+    Создает секцию месяца в рамках транзакции conn.
+    Траты этого месяца из секции по умолчанию переносятся в новую секцию,
+    иначе присоединение секции завершилось бы ошибкой.
+    """
+    start, end = shift_month(month, 0), shift_month(month, 1)
+    name, table = quote(partition_name(start)), quote(TABLE)
+    await conn.execute_script(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+    await conn.execute_query(f'WITH "moved" AS (DELETE FROM {quote(DEFAULT_PARTITION)} '
+                             f'WHERE "created_at" >= $1 AND "created_at" < $2 RETURNING {COLUMNS}) '
+                             f'INSERT INTO {name} ({COLUMNS}) SELECT {COLUMNS} FROM "moved"', [start, end])
+    await conn.execute_script(f"ALTER TABLE {table} ATTACH PARTITION {name} "
+                              f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')")
+    return partition_name(start)
+
+
+async def ensure_partitions(months_ahead: int = settings.PARTITION_MONTHS_AHEAD,
+                            months_back: int = 0,
+                            today: datetime.date|None = None) -> list[str]:
+    """
+    Создает секции текущего месяца, months_ahead следующих и months_back предыдущих.
+    Возвращает имена созданных секций.
+    """
+    today = today or datetime.date.today()
+    created = []
+    for shift in range(-months_back, months_ahead + 1):
+        month = shift_month(today, shift)
+        async with in_transaction() as conn:
+            await conn.execute_query(LOCK_SQL, [MAINTENANCE_LOCK_ID])
+            if any(partition.start == month for partition in await list_partitions(conn)):
+                continue
+            created.append(await create_partition(conn, month))
+        logger.info("Создана секция трат %s.", created[-1])
+    return created
+
+
+async def _is_attached(conn: BaseDBAsyncClient, name: str) -> bool:
+    """Проверяет, что секция все еще присоединена: ее мог отсоединить другой процесс."""
+    return any(partition.name == name for partition in await list_partitions(conn))
+
+
+async def _archive_pending(name: str) -> None:
+    """Переносит строки отсоединенной секции в архив и удаляет ее, если ее не перенес другой процесс."""
+    async with in_transaction() as conn:
+        await conn.execute_query(LOCK_SQL, [MAINTENANCE_LOCK_ID])
+        rows = await conn.execute_query_dict(LIST_PENDING_SQL, [PENDING_PREFIX])
+        if all(row["name"] != name for row in rows):
+            return
+        await conn.execute_query(ARCHIVE_SQL_TEMPLATE.format(source=f"SELECT {COLUMNS} FROM {quote(name)}"))
+        await conn.execute_script(f"DROP TABLE {quote(name)}")
+    logger.info("Секция трат %s перенесена в архив.", name)
+
+
+async def archive_partitions(before: datetime.date) -> list[str]:
+    """
+    Сжимает в архив секции, которые целиком раньше before, и траты раньше before
+    из секции по умолчанию. Секция сначала отсоединяется короткой транзакцией,
+    поэтому запись в таблицу трат не ждет переноса строк в архив. Секции,
+    отсоединенные до сбоя, переносятся при следующем запуске. Секции, которые
+    успел отсоединить другой процесс, пропускаются.
+    Возвращает имена отсоединенных этим вызовом секций.
+    """
+    archived = []
+    for partition in await list_partitions():
+        if partition.end is None or partition.end > before:
+            continue
+        pending = PENDING_PREFIX + partition.name.removeprefix(f"{TABLE}_")
+        async with in_transaction() as conn:
+            await conn.execute_query(LOCK_SQL, [MAINTENANCE_LOCK_ID])
+            if not await _is_attached(conn, partition.name):
+                continue
+            await conn.execute_script(f"ALTER TABLE {quote(TABLE)} DETACH PARTITION {quote(partition.name)}; "
+                                      f"ALTER TABLE {quote(partition.name)} RENAME TO {quote(pending)}")
+        archived.append(partition.name)
+    rows = await connections.get("default").execute_query_dict(LIST_PENDING_SQL, [PENDING_PREFIX])
+    for row in rows:
+        await _archive_pending(row["name"])
+    async with in_transaction() as conn:
+        source = f'DELETE FROM {quote(DEFAULT_PARTITION)} WHERE "created_at" < $1 RETURNING {COLUMNS}'
+        await conn.execute_query(ARCHIVE_SQL_TEMPLATE.format(source=source), [before])
+    return archived
+
+
+async def detach_partitions(before: datetime.date) -> list[str]:
+    """
+    Отсоединяет секции, которые целиком раньше before, и оставляет их отдельными таблицами,
+    например для выгрузки в холодное хранилище. Дневные итоги этих месяцев сохраняются,
+    поэтому 'rollups verify' покажет расхождения, пока секции не присоединены обратно.
+    Секции, которые успел отсоединить другой процесс, пропускаются.
+    Возвращает имена отсоединенных этим вызовом секций.
+    """
+    detached = []
+    for partition in await list_partitions():
+        if partition.end is None or partition.end > before:
+            continue
+        async with in_transaction() as conn:
+            await conn.execute_query(LOCK_SQL, [MAINTENANCE_LOCK_ID])
+            if not await _is_attached(conn, partition.name):
+                continue
+            await conn.execute_script(f"ALTER TABLE {quote(TABLE)} DETACH PARTITION {quote(partition.name)}")
+        detached.append(partition.name)
+        logger.info("Секция трат %s отсоединена.", partition.name)
+    return detached
+
+
+class PartitionMaintainer:
+    """
+    Фоновая задача обслуживания секций: создает секции на months_ahead месяцев вперед
+    и, если задан retention_months, архивирует или отсоединяет более старые секции.
+    """
+
+    def __init__(self,
+                 months_ahead: int = settings.PARTITION_MONTHS_AHEAD,
+                 retention_months: int = settings.PARTITION_RETENTION_MONTHS,
+                 retention_mode: str = settings.PARTITION_RETENTION_MODE,
+                 interval: float = settings.PARTITION_CHECK_INTERVAL,
+                 connection_name: str = "default") -> None:
+        if retention_mode not in RETENTION_MODES:
+            raise ValueError(f"Неизвестный режим хранения секций: {retention_mode!r}")
+        self.months_ahead = months_ahead
+        self.retention_months = retention_months
+        self.retention_mode = retention_mode
+        self.interval = interval
+        self.connection_name = connection_name
+        self._task: asyncio.Task|None = None
+
+    async def start(self) -> None:
+        """Запускает обслуживание секций, если база данных - PostgreSQL."""
+        if connections.get(self.connection_name).capabilities.dialect != "postgres":
+            return
+        self._task = asyncio.create_task(self._run_forever())
+
+    async def stop(self) -> None:
+        """Останавливает обслуживание секций."""
+        if self._task is not None:
+            task, self._task = self._task, None
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+
+    async def _run_forever(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error("Ошибка при обслуживании секций трат: %s", e, exc_info=True)
+            await asyncio.sleep(self.interval)
+
+    async def run_once(self, today: datetime.date|None = None) -> None:
+        """Создает будущие секции и убирает устаревшие."""
+        today = today or datetime.date.today()
+        await ensure_partitions(self.months_ahead, today=today)
+        if self.retention_months <= 0:
+            return
+        before = shift_month(today, -self.retention_months)
+        if self.retention_mode == "archive":
+            await archive_partitions(before)
+        else:
+            await detach_partitions(before)
@@ -0,0 +1,164 @@
+"""Пересчет и проверка дневных итогов трат."""
+import datetime
+import decimal
+import json
+from dataclasses import dataclass
+from tortoise import connections
+from tortoise.transactions import in_transaction
+from src.utils.logger import setup_module_logger
+
+
+logger = setup_module_logger(__name__)
+
+
+USERS_BATCH_SQL = """
+SELECT "telegram_id" FROM "Users"
+WHERE "telegram_id" > $1
+ORDER BY "telegram_id"
+LIMIT $2
+"""
+
+# Траты пачки пользователей вместе с перенесенными в архив.
+SOURCE_SQL = """
+SELECT "user_telegram_id_id", "created_at", "price"
+FROM "Transactions"
+WHERE "user_telegram_id_id" = ANY($1::int[])
+UNION ALL
+SELECT a."user_telegram_id_id", r."created_at", r."price"
+FROM "TransactionsArchive" a
+CROSS JOIN LATERAL unnest(a."days", a."prices") AS r("created_at", "price")
+WHERE a."user_telegram_id_id" = ANY($1::int[])
+"""
+
+REBUILD_BATCH_SQL = """
+INSERT INTO "DailySpendings" ("user_telegram_id_id", "day", "count", "total")
+SELECT "user_telegram_id_id", "created_at", COUNT(*), SUM("price")
+FROM ({source}) t
+GROUP BY "user_telegram_id_id", "created_at"
+""".format(source=SOURCE_SQL)
+
+VERIFY_BATCH_SQL = """
+SELECT COALESCE(r."user_telegram_id_id", t."user_telegram_id_id") AS "user_id",
+       COALESCE(r."day", t."day") AS "day",
+       COALESCE(t."count", 0) AS "expected_count", COALESCE(t."total", 0) AS "expected_total",
+       COALESCE(r."count", 0) AS "actual_count", COALESCE(r."total", 0) AS "actual_total"
+FROM (
+    SELECT "user_telegram_id_id", "day", "count", "total"
+    FROM "DailySpendings"
+    WHERE "user_telegram_id_id" = ANY($1::int[]) AND "count" <> 0
+) r
+FULL OUTER JOIN (
+    SELECT "user_telegram_id_id", "created_at" AS "day", COUNT(*) AS "count", SUM("price") AS "total"
+    FROM ({source}) s
+    GROUP BY "user_telegram_id_id", "created_at"
+) t ON r."user_telegram_id_id" = t."user_telegram_id_id" AND r."day" = t."day"
+WHERE r."count" IS DISTINCT FROM t."count" OR r."total" IS DISTINCT FROM t."total"
+ORDER BY 1, 2
+""".format(source=SOURCE_SQL)
+
+DELETE_BATCH_SQL = 'DELETE FROM "DailySpendings" WHERE "user_telegram_id_id" = ANY($1::int[])'
+
+# В SQLite нет архива трат, список пользователей передается JSON-массивом.
+# Суммы сравниваются округленными до копеек: SQLite складывает их как числа с плавающей точкой.
+SOURCE_SQLITE_SQL = """
+SELECT "user_telegram_id_id", "created_at", "price"
+FROM "Transactions"
+WHERE "user_telegram_id_id" IN (SELECT "value" FROM json_each($1))
+"""
+
+REBUILD_BATCH_SQLITE_SQL = """
+INSERT INTO "DailySpendings" ("user_telegram_id_id", "day", "count", "total")
+SELECT "user_telegram_id_id", "created_at", COUNT(*), printf('%.2f', SUM("price"))
+FROM ({source}) t
+GROUP BY "user_telegram_id_id", "created_at"
+""".format(source=SOURCE_SQLITE_SQL)
+
+VERIFY_BATCH_SQLITE_SQL = """
+SELECT COALESCE(r."user_telegram_id_id", t."user_telegram_id_id") AS "user_id",
+       COALESCE(r."day", t."day") AS "day [date]",
+       COALESCE(t."count", 0) AS "expected_count",
+       printf('%.2f', COALESCE(t."total", 0)) AS "expected_total [decimal]",
+       COALESCE(r."count", 0) AS "actual_count",
+       printf('%.2f', COALESCE(r."total", 0)) AS "actual_total [decimal]"
+FROM (
+    SELECT "user_telegram_id_id", "day", "count", ROUND("total", 2) AS "total"
+    FROM "DailySpendings"
+    WHERE "user_telegram_id_id" IN (SELECT "value" FROM json_each($1)) AND "count" <> 0
+) r
+FULL OUTER JOIN (
+    SELECT "user_telegram_id_id", "created_at" AS "day", COUNT(*) AS "count", ROUND(SUM("price"), 2) AS "total"
+    FROM ({source}) s
+    GROUP BY "user_telegram_id_id", "created_at"
+) t ON r."user_telegram_id_id" = t."user_telegram_id_id" AND r."day" = t."day"
+WHERE r."count" IS DISTINCT FROM t."count" OR r."total" IS DISTINCT FROM t."total"
+ORDER BY 1, 2
+""".format(source=SOURCE_SQLITE_SQL)
+
+DELETE_BATCH_SQLITE_SQL = """
+DELETE FROM "DailySpendings" WHERE "user_telegram_id_id" IN (SELECT "value" FROM json_each($1))
+"""
+
+
+@dataclass
+class RollupDrift:
+    """Расхождение дневного итога с исходными транзакциями."""
+    user_id: int
+    day: datetime.date
+    expected_count: int
+    expected_total: decimal.Decimal
+    actual_count: int
+    actual_total: decimal.Decimal
+
+
+async def iter_user_batches(batch_size: int):
+    """Перебирает id пользователей пачками по возрастанию id."""
+    conn = connections.get("default")
+    last_id = 0
+    while True:
+        rows = await conn.execute_query_dict(USERS_BATCH_SQL, [last_id, batch_size])
+        if not rows:
+            return
+        user_ids = [row["telegram_id"] for row in rows]
+        yield user_ids
+        last_id = user_ids[-1]
+
+
+async def rebuild_rollups(batch_size: int = 500) -> int:
+    """
+    Пересчитывает дневные итоги из транзакций и архива пачками пользователей.
+    Каждая пачка пересчитывается в своей транзакции под блокировкой таблицы итогов,
+    поэтому одновременные записи трат применяются уже поверх пересчитанных итогов.
+    В SQLite транзакция сама блокирует запись во всю базу.
+    Возвращает количество обработанных пользователей.
+    """
+    processed = 0
+    async for user_ids in iter_user_batches(batch_size):
+        async with in_transaction() as conn:
+            if conn.capabilities.dialect == "postgres":
+                await conn.execute_script('LOCK TABLE "DailySpendings" IN SHARE ROW EXCLUSIVE MODE')
+                await conn.execute_query(DELETE_BATCH_SQL, [user_ids])
+                await conn.execute_query(REBUILD_BATCH_SQL, [user_ids])
+            else:
+                await conn.execute_query(DELETE_BATCH_SQLITE_SQL, [json.dumps(user_ids)])
+                await conn.execute_query(REBUILD_BATCH_SQLITE_SQL, [json.dumps(user_ids)])
+        processed += len(user_ids)
+        logger.info("Дневные итоги пересчитаны для %s пользователей.", processed)
+    return processed
+
+
+async def verify_rollups(batch_size: int = 500) -> list[RollupDrift]:
+    """Сравнивает дневные итоги с транзакциями и возвращает найденные расхождения."""
+    conn = connections.get("default")
+    if conn.capabilities.dialect == "postgres":
+        verify_sql, encode = VERIFY_BATCH_SQL, list
+    else:
+        verify_sql, encode = VERIFY_BATCH_SQLITE_SQL, json.dumps
+    drifts = []
+    async for user_ids in iter_user_batches(batch_size):
+        rows = await conn.execute_query_dict(verify_sql, [encode(user_ids)])
+        drifts.extend(RollupDrift(**row) for row in rows)
+    if drifts:
+        logger.warning("Найдено %s расхождений дневных итогов.", len(drifts))
+    else:
+        logger.info("Дневные итоги совпадают с транзакциями.")
+    return drifts
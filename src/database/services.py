@@ -1,18 +1,215 @@
 """CRUD и работа с базой данных."""
 import datetime
 import decimal
+import json
+import re
 import uuid
+from dataclasses import dataclass
 from typing import Any
+from tortoise import connections
+from tortoise.backends.base.client import BaseDBAsyncClient
 from tortoise.functions import Sum
 from tortoise.exceptions import DoesNotExist, ParamsError
+from tortoise.transactions import in_transaction
 from src.utils.logger import setup_module_logger
-from src.utils.helpers import get_current_month
-from .models import User, Transaction
+from src.utils.ids import uuid7
+from src.utils.helpers import get_current_month, get_today_range
+from .models import User, Transaction, DailySpending
+from .user_cache import get_cached_user, remember_user, forget_user
+from .versions import bump_data_version
+from .budgets import track_spending, forget_budget_state
 
 
 logger = setup_module_logger(__name__)
 
 
+_PERIOD_REPORT_SQL_TEMPLATE = """
+SELECT u."telegram_id" AS "user_id", agg."count", agg."total",
+       t."id", t."name", t."price", t."created_at"
+FROM "Users" u
+CROSS JOIN (
+    SELECT COALESCE(SUM("count"), 0) AS "count", COALESCE(SUM("total"), 0) AS "total"
+    FROM "DailySpendings"
+    WHERE "user_telegram_id_id" = $1 AND "day" >= $2 AND "day" < $3
+) agg
+LEFT JOIN (
+    SELECT "id", "name", "price", "created_at"
+    FROM "Transactions"
+    WHERE "user_telegram_id_id" = $1 AND "created_at" >= $2 AND "created_at" < $3
+      AND ("created_at", "id") {op} ($4, $5)
+    ORDER BY "created_at" {order}, "id" {order}
+    LIMIT $6
+) t ON TRUE
+WHERE u."telegram_id" = $1
+ORDER BY t."created_at" {order}, t."id" {order}
+"""
+PERIOD_REPORT_FORWARD_SQL = _PERIOD_REPORT_SQL_TEMPLATE.format(op=">", order="ASC")
+PERIOD_REPORT_BACKWARD_SQL = _PERIOD_REPORT_SQL_TEMPLATE.format(op="<", order="DESC")
+
+# В SQLite LIMIT -1 снимает ограничение, а типы колонок результата задаются в псевдонимах.
+_PERIOD_REPORT_SQLITE_SQL_TEMPLATE = """
+SELECT u."telegram_id" AS "user_id", agg."count", agg."total" AS "total [decimal]",
+       t."id" AS "id [uuid]", t."name", t."price" AS "price [decimal]", t."created_at" AS "created_at [date]"
+FROM "Users" u
+CROSS JOIN (
+    SELECT COALESCE(SUM("count"), 0) AS "count", printf('%.2f', COALESCE(SUM("total"), 0)) AS "total"
+    FROM "DailySpendings"
+    WHERE "user_telegram_id_id" = $1 AND "day" >= $2 AND "day" < $3
+) agg
+LEFT JOIN (
+    SELECT "id", "name", "price", "created_at"
+    FROM "Transactions"
+    WHERE "user_telegram_id_id" = $1 AND "created_at" >= $2 AND "created_at" < $3
+      AND ("created_at", "id") {op} ($4, $5)
+    ORDER BY "created_at" {order}, "id" {order}
+    LIMIT COALESCE($6, -1)
+) t ON TRUE
+WHERE u."telegram_id" = $1
+ORDER BY t."created_at" {order}, t."id" {order}
+"""
+PERIOD_REPORT_FORWARD_SQLITE_SQL = _PERIOD_REPORT_SQLITE_SQL_TEMPLATE.format(op=">", order="ASC")
+PERIOD_REPORT_BACKWARD_SQLITE_SQL = _PERIOD_REPORT_SQLITE_SQL_TEMPLATE.format(op="<", order="DESC")
+
+# Поиск по названию идет по GIN-индексу idx_transactions_search. В вектор добавлена
+# лексема пользователя 'u<id>', поэтому индекс сразу пересекает траты пользователя
+# со словами запроса, а не перебирает совпадения всех пользователей.
+# Выражение должно совпадать с выражением индекса в миграции.
+SEARCH_VECTOR = """(to_tsvector('simple', 'u' || "user_telegram_id_id"::text) || to_tsvector('russian', "name"))"""
+
+# Траты в результатах поиска идут от новых к старым.
+_SEARCH_SQL_TEMPLATE = """
+WITH "matched" AS MATERIALIZED (
+    SELECT "id", "name", "price", "created_at"
+    FROM "Transactions"
+    WHERE {vector} @@ (to_tsquery('simple', 'u' || $1::int::text) && to_tsquery('russian', $2))
+      AND numnode(to_tsquery('russian', $2)) > 0
+      AND "user_telegram_id_id" = $1 AND "created_at" >= $3 AND "created_at" < $4
+)
+SELECT agg."count", agg."total", t."id", t."name", t."price", t."created_at"
+FROM (SELECT COUNT(*) AS "count", COALESCE(SUM("price"), 0) AS "total" FROM "matched") agg
+LEFT JOIN (
+    SELECT "id", "name", "price", "created_at"
+    FROM "matched"
+    WHERE ("created_at", "id") {op} ($5, $6)
+    ORDER BY "created_at" {order}, "id" {order}
+    LIMIT $7
+) t ON TRUE
+ORDER BY t."created_at" {order}, t."id" {order}
+"""
+SEARCH_FORWARD_SQL = _SEARCH_SQL_TEMPLATE.format(vector=SEARCH_VECTOR, op="<", order="DESC")
+SEARCH_BACKWARD_SQL = _SEARCH_SQL_TEMPLATE.format(vector=SEARCH_VECTOR, op=">", order="ASC")
+
+# В SQLite поиск перебирает траты пользователя за период по первичному ключу и ищет
+# в названии каждое слово из JSON-массива $2 как подстроку, без учета словоформ.
+_SEARCH_SQLITE_SQL_TEMPLATE = """
+WITH "matched" AS MATERIALIZED (
+    SELECT "id", "name", "price", "created_at"
+    FROM "Transactions" t
+    WHERE "user_telegram_id_id" = $1 AND "created_at" >= $3 AND "created_at" < $4
+      AND NOT EXISTS (SELECT 1 FROM json_each($2) WHERE instr(lower(t."name"), "value") = 0)
+)
+SELECT agg."count", agg."total" AS "total [decimal]", t."id" AS "id [uuid]", t."name",
+       t."price" AS "price [decimal]", t."created_at" AS "created_at [date]"
+FROM (SELECT COUNT(*) AS "count", printf('%.2f', COALESCE(SUM("price"), 0)) AS "total" FROM "matched") agg
+LEFT JOIN (
+    SELECT "id", "name", "price", "created_at"
+    FROM "matched"
+    WHERE ("created_at", "id") {op} ($5, $6)
+    ORDER BY "created_at" {order}, "id" {order}
+    LIMIT $7
+) t ON TRUE
+ORDER BY t."created_at" {order}, t."id" {order}
+"""
+SEARCH_FORWARD_SQLITE_SQL = _SEARCH_SQLITE_SQL_TEMPLATE.format(op="<", order="DESC")
+SEARCH_BACKWARD_SQLITE_SQL = _SEARCH_SQLITE_SQL_TEMPLATE.format(op=">", order="ASC")
+
+ROLLUP_UPSERT_SQL = """
+INSERT INTO "DailySpendings" ("user_telegram_id_id", "day", "count", "total")
+VALUES ($1, $2, $3, $4)
+ON CONFLICT ("user_telegram_id_id", "day")
+DO UPDATE SET "count" = "DailySpendings"."count" + EXCLUDED."count",
+              "total" = "DailySpendings"."total" + EXCLUDED."total"
+"""
+
+# SQLite складывает текстовые суммы как числа с плавающей точкой,
+# поэтому итог округляется до копеек при каждом изменении.
+ROLLUP_UPSERT_SQLITE_SQL = """
+INSERT INTO "DailySpendings" ("user_telegram_id_id", "day", "count", "total")
+VALUES ($1, $2, $3, printf('%.2f', $4))
+ON CONFLICT ("user_telegram_id_id", "day")
+DO UPDATE SET "count" = "DailySpendings"."count" + EXCLUDED."count",
+              "total" = printf('%.2f', "DailySpendings"."total" + EXCLUDED."total")
+"""
+
+# Пачка трат и их дневные итоги записываются одним запросом.
+BATCH_INSERT_SQL = """
+WITH "inserted" AS (
+    INSERT INTO "Transactions" ("id", "user_telegram_id_id", "name", "price", "created_at")
+    SELECT "id", $1, "name", "price", "created_at"
+    FROM unnest($2::uuid[], $3::text[], $4::numeric[], $5::date[]) AS t("id", "name", "price", "created_at")
+    RETURNING "price", "created_at"
+)
+INSERT INTO "DailySpendings" ("user_telegram_id_id", "day", "count", "total")
+SELECT $1, "created_at", COUNT(*), SUM("price") FROM "inserted" GROUP BY "created_at"
+ON CONFLICT ("user_telegram_id_id", "day")
+DO UPDATE SET "count" = "DailySpendings"."count" + EXCLUDED."count",
+              "total" = "DailySpendings"."total" + EXCLUDED."total"
+"""
+
+MAX_PRICE = decimal.Decimal("99999999.99")
+PRICE_QUANTUM = decimal.Decimal("0.01")
+MAX_NAME_LENGTH = 300
+MAX_SEARCH_TERMS = 10
+SEARCH_TERM_RE = re.compile(r"\w+")
+
+FIRST_CURSOR = (datetime.date.min, uuid.UUID(int=0))
+LAST_CURSOR = (datetime.date.max, uuid.UUID(int=2**128 - 1))
+
+
+@dataclass
+class PeriodReport:
+    """Траты пользователя за период (или страница трат) и итог за весь период."""
+    transactions: list[dict[str, Any]]
+    count: int
+    total: decimal.Decimal
+    has_prev: bool = False
+    has_next: bool = False
+
+
+def rollup_upsert_sql(conn: BaseDBAsyncClient) -> str:
+    """Возвращает запрос изменения дневного итога для диалекта соединения conn."""
+    return ROLLUP_UPSERT_SQL if conn.capabilities.dialect == "postgres" else ROLLUP_UPSERT_SQLITE_SQL
+
+
+def validate_transaction(user_created_at: datetime.date,
+                         name: str,
+                         price: decimal.Decimal,
+                         created_at: datetime.date) -> None:
+    """Проверяет данные новой траты. Вызывает ValueError с описанием ошибки."""
+    validate_name_and_price(name, price)
+    if created_at < user_created_at:
+        raise ValueError("Дата транзакции не может быть раньше даты создания пользователя")
+
+
+def validate_name_and_price(name: str, price: decimal.Decimal) -> None:
+    """Проверяет название и цену траты. Вызывает ValueError с описанием ошибки."""
+    if not name or len(name) > MAX_NAME_LENGTH:
+        raise ValueError(f"Название траты должно содержать от 1 до {MAX_NAME_LENGTH} символов")
+    if not price.is_finite() or price <= 0 or price > MAX_PRICE:
+        raise ValueError(f"Цена траты должна быть больше 0 и не больше {MAX_PRICE}")
+    if price != price.quantize(PRICE_QUANTUM):
+        raise ValueError("Цена траты должна содержать не больше двух знаков после запятой")
+
+
+async def apply_rollup_delta(conn: BaseDBAsyncClient,
+                             user_telegram_id: int,
+                             day: datetime.date,
+                             count: int,
+                             total: decimal.Decimal) -> None:
+    """Изменяет количество и сумму трат пользователя за день в рамках транзакции conn."""
+    await conn.execute_query(rollup_upsert_sql(conn), [user_telegram_id, day, count, total])
+
+
 async def get_or_create_user(telegram_id: int,
                              name: str) -> tuple[User|None, bool]:
     """Создает или получает пользователя."""
@@ -26,28 +223,53 @@ async def get_or_create_user(telegram_id: int,
         )
         if created:
             logger.info("Новый пользователь %s успешно добавлен в базу данных.", user.name)
+        remember_user(user)
         return user, created
     except Exception as e:
         logger.error("Ошибка при создании или получении пользователя: %s", e, exc_info=True)
         return None, False
 
 
+async def delete_user(telegram_id: int) -> bool:
+    """Удаляет пользователя вместе с его тратами."""
+    try:
+        deleted = await User.filter(telegram_id=telegram_id).delete()
+        forget_user(telegram_id)
+        forget_budget_state(telegram_id)
+        bump_data_version(telegram_id)
+        if not deleted:
+            raise DoesNotExist(User)
+        logger.info("Пользователь %s успешно удален.", telegram_id)
+        return True
+    except DoesNotExist:
+        logger.error("Пользователь с telegram_id %s не найден.", telegram_id)
+        return False
+    except Exception as e:
+        logger.error("Ошибка при удалении пользователя: %s", e, exc_info=True)
+        return False
+
+
 async def create_transaction(user_telegram_id: int,
                              name: str,
                              price: decimal.Decimal,
-                             created_at: datetime.date = datetime.date.today()) -> str|None:
-    """Создание транзакции."""
+                             created_at: datetime.date|None = None) -> str|None:
+    """Создание транзакции. Без created_at трата записывается на сегодняшний день."""
+    created_at = created_at or datetime.date.today()
     try:
-        user = await User.get(telegram_id=user_telegram_id)
-        if created_at < user.created_at:
-            raise ValueError("Дата транзакции не может быть раньше даты создания пользователя")
-        transaction = await Transaction.create(
-            id=uuid.uuid4(),
-            user_telegram_id=user,
-            name=name,
-            price=price,
-            created_at=created_at,
-        )
+        user = await get_cached_user(user_telegram_id)
+        validate_transaction(user.created_at, name, price, created_at)
+        async with in_transaction() as conn:
+            transaction = await Transaction.create(
+                id=uuid7(),
+                user_telegram_id_id=user_telegram_id,
+                name=name,
+                price=price,
+                created_at=created_at,
+                using_db=conn,
+            )
+            await apply_rollup_delta(conn, user_telegram_id, created_at, 1, price)
+        bump_data_version(user_telegram_id)
+        await track_spending(user_telegram_id, [(name, created_at, price)])
         logger.info("Новая транзакция пользователя %s - %s успешно добавлена.", 
                    user.name, transaction.name)
         return transaction.name
@@ -58,22 +280,78 @@ async def create_transaction(user_telegram_id: int,
         logger.error("Ошибка в переданных аргументах: %s", e, exc_info=True)
         return None
     except ValueError as e:
-        logger.error("Ошибка валидации даты: %s", e, exc_info=True)
+        logger.error("Ошибка валидации транзакции: %s", e, exc_info=True)
         return None
     except Exception as e:
         logger.error("Ошибка при добавлении транзакции: %s", e, exc_info=True)
         return None
 
 
+async def create_transactions(user_telegram_id: int,
+                              rows: list[tuple[str, decimal.Decimal, datetime.date]]
+                              ) -> tuple[int, dict[int, str]]|None:
+    """
+    Создает несколько трат одной транзакцией и одним запросом вместе с дневными итогами.
+    Каждая строка проверяется как при добавлении одной траты, строки с ошибками пропускаются.
+    Возвращает количество добавленных трат и ошибки по индексам строк.
+    """
+    try:
+        user = await get_cached_user(user_telegram_id)
+        valid, errors = [], {}
+        for index, (name, price, created_at) in enumerate(rows):
+            try:
+                validate_transaction(user.created_at, name, price, created_at)
+            except ValueError as e:
+                errors[index] = str(e)
+            else:
+                valid.append((uuid7(), name, price, created_at))
+        if not valid:
+            return 0, errors
+        async with in_transaction() as conn:
+            if conn.capabilities.dialect == "postgres":
+                ids, names, prices, days = map(list, zip(*valid))
+                await conn.execute_query(BATCH_INSERT_SQL, [user_telegram_id, ids, names, prices, days])
+            else:
+                await Transaction.bulk_create([Transaction(id=transaction_id,
+                                                           user_telegram_id_id=user_telegram_id,
+                                                           name=name,
+                                                           price=price,
+                                                           created_at=created_at)
+                                               for transaction_id, name, price, created_at in valid],
+                                              using_db=conn)
+                for _, _, price, created_at in valid:
+                    await apply_rollup_delta(conn, user_telegram_id, created_at, 1, price)
+        bump_data_version(user_telegram_id)
+        await track_spending(user_telegram_id, [(name, created_at, price) for _, name, price, created_at in valid])
+        logger.info("Пользователь %s добавил %s трат одним сообщением.", user.name, len(valid))
+        return len(valid), errors
+    except DoesNotExist:
+        logger.error("Пользователь с telegram_id %s не найден.", user_telegram_id)
+        return None
+    except Exception as e:
+        logger.error("Ошибка при добавлении трат: %s", e, exc_info=True)
+        return None
+
+
 async def edit_transaction(transaction_id: str,
-                           name: str|None = None,
-                           price: decimal.Decimal|None = None) -> bool:
-    """Редактирует транзакцию."""
+                           name: str,
+                           price: decimal.Decimal) -> bool:
+    """Редактирует транзакцию. Новые название и цена проверяются как при добавлении траты."""
     try:
-        transaction = await Transaction.get(id=transaction_id)
-        transaction.name = name
-        transaction.price = price
-        await transaction.save()
+        validate_name_and_price(name, price)
+        price = price.quantize(PRICE_QUANTUM)
+        async with in_transaction() as conn:
+            transaction = await Transaction.select_for_update().using_db(conn).get(id=transaction_id)
+            delta = price - transaction.price
+            changes = [(transaction.name, transaction.created_at, -transaction.price),
+                       (name, transaction.created_at, price)]
+            transaction.name = name
+            transaction.price = price
+            await transaction.save(using_db=conn)
+            await apply_rollup_delta(conn, transaction.user_telegram_id_id,
+                                     transaction.created_at, 0, delta)
+        bump_data_version(transaction.user_telegram_id_id)
+        await track_spending(transaction.user_telegram_id_id, changes)
         logger.info("Транзакция %s успешно отредактирована.", transaction_id)
         return True
     except DoesNotExist:
@@ -82,6 +360,9 @@ async def edit_transaction(transaction_id: str,
     except ParamsError as e:
         logger.error("Ошибка в переданных аргументах: %s", e, exc_info=True)
         return False
+    except ValueError as e:
+        logger.error("Ошибка валидации транзакции: %s", e, exc_info=True)
+        return False
     except Exception as e:
         logger.error("Ошибка при редактировании транзакции: %s", e, exc_info=True)
         return False
@@ -90,8 +371,14 @@ async def edit_transaction(transaction_id: str,
 async def delete_transaction(transaction_id: str) -> bool:
     """Удаляет транзакцию."""
     try:
-        transaction = await Transaction.get(id=transaction_id)
-        await transaction.delete()
+        async with in_transaction() as conn:
+            transaction = await Transaction.select_for_update().using_db(conn).get(id=transaction_id)
+            await transaction.delete(using_db=conn)
+            await apply_rollup_delta(conn, transaction.user_telegram_id_id,
+                                     transaction.created_at, -1, -transaction.price)
+        bump_data_version(transaction.user_telegram_id_id)
+        await track_spending(transaction.user_telegram_id_id,
+                             [(transaction.name, transaction.created_at, -transaction.price)])
         logger.info("Транзакция %s успешно удалена.", transaction_id)
         return True
     except DoesNotExist:
@@ -105,10 +392,10 @@ async def delete_transaction(transaction_id: str) -> bool:
 async def get_month_transactions(user_telegram_id: int) -> list[dict[str, Any]]|None:
     """Возвращает список транзакций за текущий месяц для данного пользователя."""
     try:
-        user =  await User.get(telegram_id=user_telegram_id)
+        user = await get_cached_user(user_telegram_id)
         start_date, end_date = get_current_month()
         transactions = await Transaction.filter(
-            user_telegram_id=user,
+            user_telegram_id_id=user_telegram_id,
             created_at__gte=start_date,
             created_at__lt=end_date).values("id", "name", "price", "created_at")
         logger.info("Транзакции для пользователя %s за месяц %s успешно получены.",
@@ -123,17 +410,25 @@ async def get_month_transactions(user_telegram_id: int) -> list[dict[str, Any]]|
 
 
 
+async def get_period_total(user_telegram_id: int,
+                           start_date: datetime.date,
+                           end_date: datetime.date) -> decimal.Decimal:
+    """Возвращает сумму трат за период [start_date, end_date) по дневным итогам."""
+    result = await DailySpending.filter(
+        user_telegram_id_id=user_telegram_id,
+        day__gte=start_date,
+        day__lt=end_date
+    ).annotate(period_total=Sum("total")).values("period_total")
+    total = result[0]["period_total"] if result else None
+    return decimal.Decimal(str(total)) if total is not None else decimal.Decimal("0")
+
+
 async def get_month_transactions_price(user_telegram_id: int) -> decimal.Decimal|None:
     """Возвращает общие траты за месяц."""
     try:
-        user =  await User.get(telegram_id=user_telegram_id)
+        user = await get_cached_user(user_telegram_id)
         start_date, end_date = get_current_month()
-        result = await Transaction.filter(
-            user_telegram_id=user,
-            created_at__gte=start_date,
-            created_at__lt=end_date
-        ).annotate(total = Sum("price")).values("total")
-        total_price = result[0]['total'] if result else decimal.Decimal('0')
+        total_price = await get_period_total(user_telegram_id, start_date, end_date)
         logger.info("Успешно посчитаны общие расходы пользователя %s за месяц %s.",
                     user.name, start_date.month)
         return total_price
@@ -149,9 +444,9 @@ async def get_today_transactions(user_telegram_id: int) -> list[dict[str, Any]]|
     """Возвращает список трат за текущий день для данного пользователя."""
     try:
         today = datetime.date.today()
-        user = await User.get(telegram_id=user_telegram_id)
+        user = await get_cached_user(user_telegram_id)
         transactions = await Transaction.filter(
-            user_telegram_id=user,
+            user_telegram_id_id=user_telegram_id,
             created_at=today
         ).values("id", "name", "price", "created_at")
         logger.info("Транзакции для пользователя %s за текущий день %s успешно получены.",
@@ -165,14 +460,9 @@ async def get_today_transactions(user_telegram_id: int) -> list[dict[str, Any]]|
 async def get_today_transactions_price(user_telegram_id: int) -> decimal.Decimal|None:
     """Возвращает общие траты за день."""
     try:
-        today = datetime.date.today()
-        user =  await User.get(telegram_id=user_telegram_id)
-        start_date, end_date = get_current_month()
-        result = await Transaction.filter(
-            user_telegram_id=user,
-            created_at=today
-        ).annotate(total = Sum("price")).values("total")
-        total_price = result[0]['total'] if result else decimal.Decimal('0')
+        user = await get_cached_user(user_telegram_id)
+        today, tomorrow = get_today_range()
+        total_price = await get_period_total(user_telegram_id, today, tomorrow)
         logger.info("Успешно посчитаны общие расходы пользователя %s за день %s.",
                     user.name, today)
         return total_price
@@ -182,3 +472,110 @@ async def get_today_transactions_price(user_telegram_id: int) -> decimal.Decimal
     except Exception as e:
         logger.error("Ошибка при вычислении общих расходов за день: %s", e, exc_info=True)
         return None
+
+
+async def get_period_report(user_telegram_id: int,
+                            start_date: datetime.date,
+                            end_date: datetime.date,
+                            limit: int|None = None,
+                            after: tuple[datetime.date, uuid.UUID]|None = None,
+                            before: tuple[datetime.date, uuid.UUID]|None = None) -> PeriodReport|None:
+    """
+    Возвращает траты за период [start_date, end_date) и их количество и сумму.
+    Все данные, включая проверку пользователя, получаются одним запросом.
+    При заданном limit возвращает одну страницу трат, упорядоченных по (created_at, id):
+    следующую за курсором after или предыдущую перед курсором before.
+    """
+    try:
+        conn = connections.get("default")
+        postgres = conn.capabilities.dialect == "postgres"
+        backward = before is not None
+        if backward:
+            sql, cursor = PERIOD_REPORT_BACKWARD_SQL if postgres else PERIOD_REPORT_BACKWARD_SQLITE_SQL, before
+        else:
+            sql = PERIOD_REPORT_FORWARD_SQL if postgres else PERIOD_REPORT_FORWARD_SQLITE_SQL
+            cursor = after or FIRST_CURSOR
+        rows = await conn.execute_query_dict(
+            sql, [user_telegram_id, start_date, end_date, *cursor,
+                  limit + 1 if limit is not None else None])
+        if not rows:
+            raise DoesNotExist(User)
+        transactions = [{"id": row["id"],
+                         "name": row["name"],
+                         "price": decimal.Decimal(str(row["price"])),
+                         "created_at": row["created_at"]}
+                        for row in rows if row["id"] is not None]
+        has_more = limit is not None and len(transactions) > limit
+        transactions = transactions[:limit]
+        if backward:
+            transactions.reverse()
+        report = PeriodReport(transactions=transactions,
+                              count=rows[0]["count"],
+                              total=decimal.Decimal(str(rows[0]["total"])),
+                              has_prev=has_more if backward else after is not None,
+                              has_next=True if backward else has_more)
+        logger.info("Отчет для пользователя %s за период %s - %s успешно получен.",
+                    user_telegram_id, start_date, end_date)
+        return report
+    except DoesNotExist:
+        logger.error("Пользователь с telegram_id %s не найден.", user_telegram_id)
+        return None
+    except Exception as e:
+        logger.error("Ошибка при получении отчета за период: %s", e, exc_info=True)
+        return None
+
+
+def search_terms(text: str) -> list[str]:
+    """Возвращает слова поискового запроса без знаков препинания, не больше MAX_SEARCH_TERMS."""
+    return SEARCH_TERM_RE.findall(text.lower())[:MAX_SEARCH_TERMS]
+
+
+async def search_transactions(user_telegram_id: int,
+                              terms: list[str],
+                              start_date: datetime.date,
+                              end_date: datetime.date,
+                              limit: int,
+                              after: tuple[datetime.date, uuid.UUID]|None = None,
+                              before: tuple[datetime.date, uuid.UUID]|None = None) -> PeriodReport|None:
+    """
+    Ищет траты за период [start_date, end_date), в названии которых есть все слова terms
+    с учетом словоформ или слова, которые с них начинаются.
+    Возвращает страницу трат от новых к старым после курсора after или перед курсором before
+    и количество и сумму всех найденных трат. Траты, перенесенные в архив, не ищутся.
+    В SQLite слова ищутся в названии как подстроки, без учета словоформ.
+    """
+    try:
+        conn = connections.get("default")
+        postgres = conn.capabilities.dialect == "postgres"
+        if postgres:
+            query = " & ".join(f"{term}:*" for term in terms)
+            forward_sql, backward_sql = SEARCH_FORWARD_SQL, SEARCH_BACKWARD_SQL
+        else:
+            query = json.dumps(terms, ensure_ascii=False)
+            forward_sql, backward_sql = SEARCH_FORWARD_SQLITE_SQL, SEARCH_BACKWARD_SQLITE_SQL
+        backward = before is not None
+        if backward:
+            sql, cursor = backward_sql, before
+        else:
+            sql, cursor = forward_sql, after or LAST_CURSOR
+        rows = await conn.execute_query_dict(
+            sql, [user_telegram_id, query, start_date, end_date, *cursor, limit + 1])
+        transactions = [{"id": row["id"],
+                         "name": row["name"],
+                         "price": decimal.Decimal(str(row["price"])),
+                         "created_at": row["created_at"]}
+                        for row in rows if row["id"] is not None]
+        has_more = len(transactions) > limit
+        transactions = transactions[:limit]
+        if backward:
+            transactions.reverse()
+        report = PeriodReport(transactions=transactions,
+                              count=rows[0]["count"],
+                              total=decimal.Decimal(str(rows[0]["total"])),
+                              has_prev=has_more if backward else after is not None,
+                              has_next=True if backward else has_more)
+        logger.info("Поиск трат пользователя %s выполнен, найдено %s.", user_telegram_id, report.count)
+        return report
+    except Exception as e:
+        logger.error("Ошибка при поиске трат: %s", e, exc_info=True)
+        return None
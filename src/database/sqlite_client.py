@@ -0,0 +1,179 @@
+"""
+Клиент встроенной базы SQLite для одного узла и тестов.
+Запросы проекта написаны с параметрами $1, $2 в стиле PostgreSQL: клиент заменяет их
+параметрами SQLite ? и расставляет значения в порядке их появления в запросе.
+Типы колонок результата задаются в псевдониме запроса, например "day [date]":
+SQLite хранит даты, id и суммы текстом, а сервисы ожидают date, UUID и Decimal.
+Запросы замеряются так же, как запросы к PostgreSQL: без ожидания единственного
+соединения, которое занято другими запросами.
+"""
+import contextlib
+import contextvars
+import datetime
+import decimal
+import functools
+import re
+import sqlite3
+import time
+import uuid
+from typing import Any
+import aiosqlite
+from tortoise.backends.base.client import ConnectionWrapper, NestedTransactionContext, TransactionContext
+from tortoise.backends.sqlite import client
+from tortoise.exceptions import TransactionManagementError
+from .instrumentation import find_caller, record_query
+
+
+PARAM_RE = re.compile(r"\$(\d+)")
+
+# Момент, когда запрос получил соединение: замер начинается с него, а не с ожидания блокировки.
+_acquired_at = contextvars.ContextVar("sqlite_acquired_at", default=0.0)
+
+
+def _to_date(value: bytes) -> datetime.date:
+    return datetime.date.fromisoformat(value.decode())
+
+
+def _to_uuid(value: bytes) -> uuid.UUID:
+    return uuid.UUID(value.decode())
+
+
+def _to_decimal(value: bytes) -> decimal.Decimal:
+    return decimal.Decimal(value.decode())
+
+
+# Decimal и даты Tortoise передает строками сам, UUID в сырых запросах - нет.
+sqlite3.register_adapter(uuid.UUID, str)
+sqlite3.register_converter("date", _to_date)
+sqlite3.register_converter("uuid", _to_uuid)
+sqlite3.register_converter("decimal", _to_decimal)
+
+
+def _lower(value: Any) -> Any:
+    """lower() для любых букв: встроенная функция SQLite меняет регистр только латиницы."""
+    return value.lower() if isinstance(value, str) else value
+
+
+@functools.lru_cache(maxsize=256)
+def _positional(query: str) -> tuple[str, tuple[int, ...]|None]:
+    if "$" not in query:
+        return query, None
+    return PARAM_RE.sub("?", query), tuple(int(number) - 1 for number in PARAM_RE.findall(query))
+
+
+def bind(query: str, values: list|None) -> tuple[str, list|None]:
+    """Заменяет параметры $1, $2 на ? и возвращает значения в порядке параметров запроса."""
+    query, order = _positional(query)
+    if order is None or values is None:
+        return query, values
+    return query, [values[index] for index in order]
+
+
+def _elapsed() -> float:
+    return time.perf_counter() - _acquired_at.get()
+
+
+class _TimedConnectionWrapper(ConnectionWrapper):
+    """Доступ к соединению под блокировкой, который отмечает момент ее получения."""
+
+    async def __aenter__(self) -> aiosqlite.Connection:
+        connection = await super().__aenter__()
+        _acquired_at.set(time.perf_counter())
+        return connection
+
+
+class _InstrumentedQueries:
+    """Перевод параметров и замер запросов, общий для клиента и его транзакций."""
+
+    def acquire_connection(self) -> ConnectionWrapper:
+        return _TimedConnectionWrapper(self._lock, self)
+
+    async def execute_insert(self, query: str, values: list) -> int:
+        caller = find_caller()
+        _acquired_at.set(time.perf_counter())
+        try:
+            return await super().execute_insert(*bind(query, values))
+        finally:
+            record_query(query, caller, _elapsed(), 1)
+
+    async def execute_many(self, query: str, values: list[list]) -> None:
+        caller = find_caller()
+        _acquired_at.set(time.perf_counter())
+        try:
+            sql, order = _positional(query)
+            if order is not None:
+                values = [[row[index] for index in order] for row in values]
+            return await super().execute_many(sql, values)
+        finally:
+            record_query(query, caller, _elapsed(), len(values))
+
+    async def execute_query(self, query: str, values: list|None = None) -> tuple[int, list]:
+        caller, rows = find_caller(), 0
+        _acquired_at.set(time.perf_counter())
+        try:
+            rows, result = await super().execute_query(*bind(query, values))
+            return rows, result
+        finally:
+            record_query(query, caller, _elapsed(), rows)
+
+    async def execute_query_dict(self, query: str, values: list|None = None) -> list[dict]:
+        caller, rows = find_caller(), []
+        _acquired_at.set(time.perf_counter())
+        try:
+            rows = await super().execute_query_dict(*bind(query, values))
+            return rows
+        finally:
+            record_query(query, caller, _elapsed(), len(rows))
+
+
+class SqliteTransactionWrapper(_InstrumentedQueries, client.SqliteTransactionWrapper):
+    """Транзакция SQLite, которая сразу берет блокировку записи."""
+
+    def _in_transaction(self) -> TransactionContext:
+        return NestedTransactionContext(SqliteTransactionWrapper(self))
+
+    async def begin(self) -> None:
+        # Отложенная транзакция получает блокировку при первой записи и при занятой базе
+        # сразу завершается ошибкой. BEGIN IMMEDIATE ждет блокировку busy_timeout
+        # миллисекунд, поэтому процессы, пишущие в один файл, выполняются по очереди.
+        try:
+            await self._connection.commit()
+            await self._connection.execute("BEGIN IMMEDIATE")
+        except sqlite3.OperationalError as e:
+            raise TransactionManagementError(e)
+
+
+class SqliteClient(_InstrumentedQueries, client.SqliteClient):
+    """
+    Клиент SQLite: одно соединение, PRAGMA из настроек выполняются при его открытии.
+    lower() заменяется функцией Python, чтобы группировка без учета регистра
+    совпадала с PostgreSQL и для кириллицы.
+    """
+
+    async def create_connection(self, with_db: bool) -> None:
+        if self._connection:
+            return
+        self._connection = aiosqlite.connect(self.filename, isolation_level=None,
+                                             detect_types=sqlite3.PARSE_COLNAMES)
+        self._connection.start()
+        await self._connection._connect()
+        self._connection._conn.row_factory = sqlite3.Row
+        await self._connection.create_function("lower", 1, _lower, deterministic=True)
+        for pragma, value in self.pragmas.items():
+            cursor = await self._connection.execute(f"PRAGMA {pragma}={value}")
+            await cursor.close()
+        self.log.debug("Created connection %s with params: filename=%s %s", self._connection, self.filename,
+                       " ".join(f"{key}={value}" for key, value in self.pragmas.items()))
+
+    async def close(self) -> None:
+        # Перед закрытием SQLite обновляет статистику индексов, по которой выбирает планы.
+        if self._connection:
+            with contextlib.suppress(sqlite3.Error):
+                await self._connection.execute("PRAGMA optimize")
+        await super().close()
+
+    def _in_transaction(self) -> TransactionContext:
+        return client.SqliteTransactionContext(SqliteTransactionWrapper(self), self._lock)
+
+
+client_class = SqliteClient
@@ -0,0 +1,90 @@
+"""
+Схема встроенной базы SQLite.
+Миграции aerich написаны для PostgreSQL, поэтому схема SQLite создается при подключении
+и отмечается версией в PRAGMA user_version. Типы колонок совпадают с типами,
+которые Tortoise использует для SQLite: суммы хранятся текстом, чтобы не терять копейки.
+Секций и архива трат в SQLite нет.
+"""
+from tortoise import connections
+from src.utils.logger import setup_module_logger
+
+
+logger = setup_module_logger(__name__)
+
+
+SCHEMA_VERSION = 1
+
+# Траты хранятся без rowid, упорядоченными по (пользователь, дата, id): это аналог
+# покрывающего индекса idx_transactions_user_created, запросы за период читают
+# один непрерывный участок таблицы. Поиск по id идет по отдельному уникальному индексу.
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS "Users" (
+    "telegram_id" INTEGER NOT NULL PRIMARY KEY,
+    "name" VARCHAR(150) NOT NULL,
+    "created_at" DATE NOT NULL
+);
+CREATE TABLE IF NOT EXISTS "Transactions" (
+    "id" CHAR(36) NOT NULL,
+    "user_telegram_id_id" INT NOT NULL REFERENCES "Users" ("telegram_id") ON DELETE CASCADE,
+    "name" TEXT NOT NULL,
+    "price" VARCHAR(40) NOT NULL,
+    "created_at" DATE NOT NULL,
+    PRIMARY KEY ("user_telegram_id_id", "created_at", "id")
+) WITHOUT ROWID;
+CREATE UNIQUE INDEX IF NOT EXISTS "uid_transactions_id" ON "Transactions" ("id");
+CREATE TABLE IF NOT EXISTS "DailySpendings" (
+    "id" INTEGER NOT NULL PRIMARY KEY,
+    "user_telegram_id_id" INT NOT NULL REFERENCES "Users" ("telegram_id") ON DELETE CASCADE,
+    "day" DATE NOT NULL,
+    "count" INT NOT NULL DEFAULT 0,
+    "total" VARCHAR(40) NOT NULL DEFAULT '0.00',
+    CONSTRAINT "uid_dailyspendings_user_day" UNIQUE ("user_telegram_id_id", "day")
+);
+CREATE TABLE IF NOT EXISTS "Budgets" (
+    "id" INTEGER NOT NULL PRIMARY KEY,
+    "user_telegram_id_id" INT NOT NULL REFERENCES "Users" ("telegram_id") ON DELETE CASCADE,
+    "category" VARCHAR(300) NOT NULL DEFAULT '',
+    "amount" VARCHAR(40) NOT NULL,
+    CONSTRAINT "uid_budgets_user_category" UNIQUE ("user_telegram_id_id", "category")
+);
+CREATE TABLE IF NOT EXISTS "DigestRuns" (
+    "id" INTEGER NOT NULL PRIMARY KEY,
+    "kind" VARCHAR(16) NOT NULL,
+    "period_start" DATE NOT NULL,
+    "last_user_id" INT NOT NULL DEFAULT 0,
+    "sent" INT NOT NULL DEFAULT 0,
+    "failed" INT NOT NULL DEFAULT 0,
+    "owner" VARCHAR(64),
+    "lease_until" TIMESTAMP,
+    "finished_at" TIMESTAMP,
+    CONSTRAINT "uid_digestruns_kind_period" UNIQUE ("kind", "period_start")
+);
+CREATE TABLE IF NOT EXISTS "FSMStates" (
+    "key" VARCHAR(255) NOT NULL PRIMARY KEY,
+    "state" VARCHAR(255),
+    "data" JSON NOT NULL,
+    "expires_at" TIMESTAMP
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS "idx_fsmstates_expires_at" ON "FSMStates" ("expires_at");
+"""
+
+
+class SchemaVersionError(Exception):
+    """Файл базы создан более новой версией бота."""
+
+
+async def ensure_sqlite_schema(connection_name: str = "default") -> bool:
+    """
+    Создает схему в пустой базе SQLite. Возвращает True, если схема была создана.
+    Вызывает SchemaVersionError, если версия схемы в файле новее SCHEMA_VERSION.
+    """
+    conn = connections.get(connection_name)
+    rows = await conn.execute_query_dict("PRAGMA user_version")
+    version = rows[0]["user_version"]
+    if version > SCHEMA_VERSION:
+        raise SchemaVersionError(f"Версия схемы SQLite {version} новее поддерживаемой {SCHEMA_VERSION}.")
+    if version == SCHEMA_VERSION:
+        return False
+    await conn.execute_script(f"BEGIN;\n{SCHEMA_SQL}\nPRAGMA user_version = {SCHEMA_VERSION};\nCOMMIT;")
+    logger.info("Создана схема SQLite версии %s.", SCHEMA_VERSION)
+    return True
@@ -0,0 +1,51 @@
+"""Кэш данных пользователей."""
+import datetime
+from dataclasses import dataclass
+from tortoise.exceptions import DoesNotExist
+from src.utils.cache import TTLCache
+from src.utils.metrics import GaugeGroup, registry
+from .models import User
+
+
+USER_CACHE_SIZE = 10_000
+USER_CACHE_TTL = 300
+
+
+@dataclass(frozen=True)
+class CachedUser:
+    """Данные пользователя, нужные сервисам."""
+    telegram_id: int
+    name: str
+    created_at: datetime.date
+
+
+user_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+registry.register(GaugeGroup("bot_user_cache", "Кэш пользователей", user_cache.stats))
+
+
+def remember_user(user: User) -> CachedUser:
+    """Сохраняет пользователя в кэш."""
+    cached = CachedUser(telegram_id=user.telegram_id, name=user.name, created_at=user.created_at)
+    user_cache.set(user.telegram_id, cached)
+    return cached
+
+
+def forget_user(telegram_id: int) -> None:
+    """Удаляет пользователя из кэша."""
+    user_cache.pop(telegram_id)
+
+
+async def get_cached_user(telegram_id: int) -> CachedUser:
+    """
+    Возвращает пользователя из кэша или загружает его из БД.
+    Вызывает DoesNotExist, если пользователя нет.
+    """
+    cached = user_cache.get(telegram_id)
+    if cached is not None:
+        return cached
+    rows = await User.filter(telegram_id=telegram_id).values("telegram_id", "name", "created_at")
+    if not rows:
+        raise DoesNotExist(User)
+    cached = CachedUser(**rows[0])
+    user_cache.set(telegram_id, cached)
+    return cached
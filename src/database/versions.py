@@ -0,0 +1,29 @@
+"""Версии данных пользователей для инвалидации кэшей."""
+import itertools
+from src.utils.cache import TTLCache
+
+
+VERSIONS_CACHE_SIZE = 100_000
+VERSIONS_TTL = 24 * 60 * 60
+
+# Версии берутся из общего счетчика процесса. Если версия пользователя
+# вытеснена, он получает новое значение, которое не совпадет ни с одним
+# ключом в кэшах, поэтому устаревшие записи никогда не вернутся.
+_counter = itertools.count(1)
+_versions = TTLCache(maxsize=VERSIONS_CACHE_SIZE, ttl=VERSIONS_TTL)
+
+
+def get_data_version(telegram_id: int) -> int:
+    """Возвращает текущую версию трат пользователя."""
+    version = _versions.get(telegram_id, count=False)
+    if version is None:
+        version = next(_counter)
+        _versions.set(telegram_id, version)
+    return version
+
+
+def bump_data_version(telegram_id: int) -> int:
+    """Отмечает изменение трат пользователя: все кэши по старой версии становятся недействительными."""
+    version = next(_counter)
+    _versions.set(telegram_id, version)
+    return version
@@ -0,0 +1,70 @@
+"""Кэширование в памяти процесса."""
+import time
+from collections import OrderedDict
+from typing import Any, Hashable
+
+
+_MISSING = object()
+
+
+class TTLCache:
+    """LRU-кэш с ограничением размера и временем жизни записей."""
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, _MISSING, count=False) is not _MISSING
+
+    def get(self, key: Hashable, default: Any = None, count: bool = True) -> Any:
+        """Возвращает значение по ключу или default, если записи нет или она устарела."""
+        item = self._data.get(key)
+        if item is not None:
+            expires_at, value = item
+            if expires_at > time.monotonic():
+                self._data.move_to_end(key)
+                if count:
+                    self.hits += 1
+                return value
+            del self._data[key]
+        if count:
+            self.misses += 1
+        return default
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Сохраняет значение, вытесняя самые давно использованные записи."""
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """Удаляет запись и возвращает ее значение."""
+        item = self._data.pop(key, None)
+        return item[1] if item is not None else default
+
+    def keys(self) -> list[Hashable]:
+        """Возвращает ключи неустаревших записей."""
+        now = time.monotonic()
+        return [key for key, (expires_at, _) in self._data.items() if expires_at > now]
+
+    def clear(self) -> None:
+        """Удаляет все записи."""
+        self._data.clear()
+
+    def stats(self) -> dict[str, int]:
+        """Возвращает счетчики попаданий, промахов и вытеснений."""
+        return {"size": len(self._data),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions}
+
@@ -1,5 +1,6 @@
 """Вспомогательные функции."""
 import datetime
+import decimal
 
 
 def get_current_month() -> tuple[datetime.date, datetime.date]:
@@ -13,4 +14,72 @@ def get_current_month() -> tuple[datetime.date, datetime.date]:
     else:
         end_date = datetime.date(current_year, current_month + 1, 1)
 
-    return start_date, end_date
\ No newline at end of file
+    return start_date, end_date
+
+
+def shift_month(day: datetime.date, months: int) -> datetime.date:
+    """Возвращает первое число месяца, отстоящего от месяца day на months месяцев."""
+    index = day.year * 12 + day.month - 1 + months
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def get_today_range() -> tuple[datetime.date, datetime.date]:
+    """Возвращает начальную и конечную дату для текущего дня."""
+    today = datetime.date.today()
+    return today, today + datetime.timedelta(days=1)
+
+
+DATE_FORMATS = ("%d.%m.%Y", "%d.%m.%y", "%Y-%m-%d")
+
+
+def parse_date(value: str) -> datetime.date:
+    """Разбирает дату в виде '11.11.2025', '11.11.25' или '2025-11-11'."""
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.datetime.strptime(value.strip(), date_format).date()
+        except ValueError:
+            continue
+    raise ValueError(f"Не удалось разобрать дату: {value!r}")
+
+
+CURRENCY_SUFFIXES = ("руб.", "руб", "р.", "р", "₽")
+
+
+def parse_price(token: str) -> decimal.Decimal:
+    """Разбирает цену вида '450.50', '450,50' или '120р'."""
+    for suffix in CURRENCY_SUFFIXES:
+        if token.lower().endswith(suffix) and len(token) > len(suffix):
+            token = token[:-len(suffix)]
+            break
+    try:
+        price = decimal.Decimal(token.replace(",", "."))
+    except decimal.InvalidOperation:
+        raise ValueError("Не найдена цена: строка должна выглядеть как 'кофе 120' или 'обед 450.50 12.10.2026'")
+    if not price.is_finite():
+        raise ValueError("Цена должна быть числом")
+    return price
+
+
+def parse_period(text: str|None) -> tuple[datetime.date, datetime.date]:
+    """
+    Разбирает период для статистики и возвращает его как [start_date, end_date).
+    Понимает 'неделя', 'месяц', 'год' и две даты включительно: '01.09.2025 30.09.2025'.
+    Пустой текст означает текущий месяц.
+    """
+    text = (text or "").strip().lower()
+    today = datetime.date.today()
+    if text in ("", "месяц", "month"):
+        return get_current_month()
+    if text in ("неделя", "week"):
+        return today - datetime.timedelta(days=6), today + datetime.timedelta(days=1)
+    if text in ("год", "year"):
+        return datetime.date(today.year, 1, 1), datetime.date(today.year + 1, 1, 1)
+    parts = text.replace(" - ", " ").replace("—", " ").split()
+    if len(parts) == 1 and parts[0].count("-") == 1:
+        parts = parts[0].split("-")
+    if len(parts) != 2:
+        raise ValueError(f"Не удалось разобрать период: {text!r}")
+    start_date, last_date = parse_date(parts[0]), parse_date(parts[1])
+    if last_date < start_date:
+        raise ValueError("Конец периода раньше его начала.")
+    return start_date, last_date + datetime.timedelta(days=1)
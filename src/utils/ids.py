@@ -0,0 +1,32 @@
+"""Идентификаторы записей."""
+import os
+import threading
+import time
+import uuid
+
+
+_lock = threading.Lock()
+_last_ms = 0
+_sequence = 0
+SEQUENCE_BITS = 12
+
+
+def uuid7() -> uuid.UUID:
+    """
+    Создает UUID версии 7 (RFC 9562): 48 бит времени в миллисекундах, затем случайные биты.
+    Новые ключи растут со временем, поэтому вставки идут в правый край индекса, а не
+    в случайные страницы. Внутри одной миллисекунды порядок держит 12-битный счетчик.
+    """
+    global _last_ms, _sequence
+    with _lock:
+        now_ms = time.time_ns() // 1_000_000
+        if now_ms > _last_ms:
+            _last_ms, _sequence = now_ms, int.from_bytes(os.urandom(2)) & 0x1FF
+        else:
+            _sequence += 1
+            if _sequence >> SEQUENCE_BITS:
+                _last_ms, _sequence = _last_ms + 1, 0
+        timestamp, sequence = _last_ms, _sequence
+    random_bits = int.from_bytes(os.urandom(8)) & ((1 << 62) - 1)
+    value = (timestamp << 80) | (0x7 << 76) | (sequence << 64) | (0b10 << 62) | random_bits
+    return uuid.UUID(int=value)
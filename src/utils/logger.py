@@ -1,14 +1,170 @@
-"""Логгирование."""
+"""
+Логгирование.
+Записи из event loop только кладутся в ограниченную очередь, а форматирование,
+трассировки исключений и запись в stderr выполняются в фоновом потоке.
+"""
+import atexit
+import contextvars
+import datetime
+import json
 import logging
+import queue
+import sys
+import threading
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any
+import settings
+from src.utils.metrics import Counter, registry
+
+
+TEXT_FORMAT = "%(asctime)s %(name)s %(levelname)s %(message)s"
+CONTEXT_FIELDS = ("user_id", "update_id", "handler")
+
+# Контекст обновления, который попадает в каждую запись: user_id, update_id, handler.
+log_context: contextvars.ContextVar[dict[str, Any]|None] = contextvars.ContextVar("log_context", default=None)
+
+dropped_records = registry.register(Counter(
+    "bot_log_records_dropped_total", "Записи лога, отброшенные из-за переполненной очереди.", ("level",)))
+sampled_records = registry.register(Counter(
+    "bot_log_records_sampled_total", "Записи лога, пропущенные выборкой.", ("level",)))
+
+
+def parse_sampling(value: str) -> dict[int, int]:
+    """Разбирает настройку вида 'INFO=10,DEBUG=100': для уровня пишется каждая N-я запись."""
+    rates = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        level, _, rate = item.partition("=")
+        rates[logging.getLevelName(level.strip().upper())] = max(1, int(rate))
+    return rates
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Пропускает каждую N-ю запись уровня из одного места вызова.
+    Первая запись из каждого места пишется всегда, WARNING и выше не выбираются.
+    """
+
+    def __init__(self, rates: dict[int, int]) -> None:
+        super().__init__()
+        self.rates = {level: rate for level, rate in rates.items() if level < logging.WARNING and rate > 1}
+        self._counters: dict[tuple[str, int], int] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = self.rates.get(record.levelno)
+        if rate is None:
+            return True
+        key = (record.pathname, record.lineno)
+        seen = self._counters.get(key, 0)
+        self._counters[key] = seen + 1
+        if seen % rate:
+            sampled_records.inc(1, record.levelname)
+            return False
+        return True
+
+
+class BoundedQueueHandler(QueueHandler):
+    """QueueHandler, который отбрасывает записи при переполненной очереди вместо ожидания."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Сообщение собирается сразу, пока аргументы не изменились, а трассировка
+        # остается объектом и форматируется в потоке записи.
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        context = log_context.get()
+        if context:
+            for field in CONTEXT_FIELDS:
+                if field in context:
+                    setattr(record, field, context[field])
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            dropped_records.inc(1, record.levelname)
+
+
+class DrainingQueueListener(QueueListener):
+    """QueueListener, который при остановке дожидается записи всех принятых записей."""
+
+    def enqueue_sentinel(self) -> None:
+        self.queue.put(self._sentinel)
+
+
+class JsonFormatter(logging.Formatter):
+    """Форматирует запись одной строкой JSON вместе с контекстом обновления."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "time": datetime.datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for field in CONTEXT_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                data[field] = value
+        if record.exc_info:
+            data["exc_info"] = self.formatException(record.exc_info)
+        if record.stack_info:
+            data["stack_info"] = self.formatStack(record.stack_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Текстовый формат, к которому добавляется контекст обновления."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        context = " ".join(f"{field}={getattr(record, field)}" for field in CONTEXT_FIELDS
+                           if getattr(record, field, None) is not None)
+        return f"{line} [{context}]" if context else line
+
+
+_lock = threading.Lock()
+_handler: BoundedQueueHandler|None = None
+_listener: DrainingQueueListener|None = None
+
+
+def setup_logging(level: str = settings.LOG_LEVEL,
+                  log_format: str = settings.LOG_FORMAT,
+                  queue_size: int = settings.LOG_QUEUE_SIZE,
+                  sampling: str = settings.LOG_SAMPLING) -> BoundedQueueHandler:
+    """
+    Создает общую очередь логов и поток, который пишет из нее в stderr.
+    Повторные вызовы возвращают уже созданный обработчик.
+    """
+    global _handler, _listener
+    with _lock:
+        if _handler is not None:
+            return _handler
+        stream = logging.StreamHandler(sys.stderr)
+        stream.setFormatter(JsonFormatter() if log_format == "json" else TextFormatter(TEXT_FORMAT))
+        records: queue.Queue = queue.Queue(maxsize=queue_size)
+        handler = BoundedQueueHandler(records)
+        handler.setLevel(level)
+        handler.addFilter(SamplingFilter(parse_sampling(sampling)))
+        _listener = DrainingQueueListener(records, stream, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown_logging)
+        _handler = handler
+        return handler
+
+
+def shutdown_logging() -> None:
+    """Дописывает оставшиеся в очереди записи и останавливает поток логов."""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
 
 
 def setup_module_logger(module_name) -> logging.Logger:
-    """Создает логгер."""
+    """Создает логгер, который пишет через общую очередь."""
     logger = logging.getLogger(module_name)
     if not logger.handlers:
-        logger.setLevel(logging.INFO)
-        handler = logging.StreamHandler()
-        formatter = logging.Formatter("%(asctime)s %(name)s %(levelname)s %(message)s")
-        handler.setFormatter(formatter)
-        logger.addHandler(handler)
-    return logger
\ No newline at end of file
+        logger.setLevel(settings.LOG_LEVEL)
+        logger.addHandler(setup_logging())
+    return logger
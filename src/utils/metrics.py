@@ -0,0 +1,144 @@
+"""Метрики в формате Prometheus и HTTP-сервер для их сбора."""
+import bisect
+import math
+from typing import Callable, Iterator
+from aiohttp import web
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+ROWS_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """Гистограмма с набором меток: количество наблюдений по корзинам, сумма и счетчик."""
+
+    def __init__(self,
+                 name: str,
+                 documentation: str,
+                 labelnames: tuple[str, ...] = (),
+                 buckets: tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        self._series: dict[tuple[str, ...], list[float]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        """Добавляет наблюдение для набора значений меток."""
+        series = self._series.get(labels)
+        if series is None:
+            # Счетчики корзин, затем +Inf, сумма.
+            series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} histogram"
+        for labels, series in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, math.inf), series):
+                cumulative += count
+                le = f'le="{_format_value(float(bound))}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(series[-1])}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}"
+
+
+class Counter:
+    """Монотонно растущий счетчик с набором меток."""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, *labels: str) -> None:
+        """Увеличивает счетчик для набора значений меток."""
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} counter"
+        for labels, value in sorted(self._values.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+
+
+class GaugeGroup:
+    """Набор gauge-метрик, значения которых берутся из callback в момент сбора."""
+
+    def __init__(self, prefix: str, documentation: str, callback: Callable[[], dict[str, float]]) -> None:
+        self.prefix = prefix
+        self.documentation = documentation
+        self.callback = callback
+
+    def render(self) -> Iterator[str]:
+        for key, value in sorted(self.callback().items()):
+            name = f"{self.prefix}_{key}"
+            yield f"# HELP {name} {self.documentation}: {key}"
+            yield f"# TYPE {name} gauge"
+            yield f"{name} {_format_value(value)}"
+
+
+class MetricsRegistry:
+    """Реестр метрик процесса."""
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, Histogram|Counter|GaugeGroup] = {}
+
+    def register(self, metric: Histogram|Counter|GaugeGroup) -> Histogram|Counter|GaugeGroup:
+        """Регистрирует метрику, заменяя метрику с тем же именем."""
+        self._metrics[getattr(metric, "name", None) or metric.prefix] = metric
+        return metric
+
+    def render(self) -> str:
+        """Возвращает все метрики в текстовом формате Prometheus."""
+        return "\n".join(line for metric in self._metrics.values() for line in metric.render()) + "\n"
+
+
+registry = MetricsRegistry()
+
+update_duration = registry.register(Histogram(
+    "bot_update_duration_seconds", "Время обработки обновления.", ("handler", "state")))
+query_duration = registry.register(Histogram(
+    "bot_db_query_duration_seconds", "Время выполнения запроса к БД.", ("caller", "operation")))
+query_rows = registry.register(Histogram(
+    "bot_db_query_rows", "Количество строк, возвращенных или измененных запросом.",
+    ("caller", "operation"), buckets=ROWS_BUCKETS))
+slow_queries = registry.register(Counter(
+    "bot_db_slow_queries_total", "Количество запросов дольше порога медленных запросов.", ("caller",)))
+
+
+async def start_metrics_server(host: str, port: int) -> web.AppRunner|None:
+    """Запускает HTTP-сервер, отдающий метрики по адресу /metrics. При port=0 сервер не запускается."""
+    if not port:
+        return None
+
+    async def handle_metrics(request: web.Request) -> web.Response:
+        return web.Response(body=registry.render().encode(), headers={"Content-Type": CONTENT_TYPE})
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle_metrics)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner